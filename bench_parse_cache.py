@@ -0,0 +1,53 @@
+"""
+Compare parse-cache load times: legacy JSON vs the compact binary format.
+
+    python bench_parse_cache.py path/to/paper.pdf [repeats]
+"""
+import sys
+import time
+from pathlib import Path
+
+from services.doc_codec import decode_document, encode_document
+from models.schemas import ParsedDocument
+from services.pdf_parser import parse_pdf
+
+
+def _best(fn, repeats: int) -> float:
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print(__doc__)
+        sys.exit(1)
+    pdf_path = Path(sys.argv[1])
+    repeats  = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+
+    doc      = parse_pdf(pdf_path)
+    as_json  = doc.model_dump_json().encode("utf-8")
+    as_bin   = encode_document(doc)
+    as_raw   = encode_document(doc, compress=False)
+
+    print(f"{pdf_path.name}: {doc.total_pages} pages, {len(doc.sections)} sections")
+    print(f"{'format':<24}{'bytes':>12}{'write ms':>12}{'load ms':>12}")
+    rows = [
+        ("json", as_json,
+         lambda: doc.model_dump_json().encode("utf-8"),
+         lambda: ParsedDocument.model_validate_json(as_json)),
+        ("compact", as_bin,
+         lambda: encode_document(doc),
+         lambda: decode_document(as_bin)),
+        ("compact + raw_text", as_bin,
+         lambda: encode_document(doc),
+         lambda: decode_document(as_bin).raw_text),
+        ("compact, uncompressed", as_raw,
+         lambda: encode_document(doc, compress=False),
+         lambda: decode_document(as_raw)),
+    ]
+    for name, data, write, load in rows:
+        print(f"{name:<24}{len(data):>12}{_best(write, repeats):>12.2f}{_best(load, repeats):>12.2f}")
@@ -0,0 +1,57 @@
+"""
+End-to-end pipeline throughput without the network: parsing, script
+generation on the offline "local" LLM provider, synthetic TTS and mixing.
+
+    python bench_pipeline.py path/to/paper.pdf [concurrent jobs]
+
+Latency, jitter and error rates of the local provider come from the
+LOCAL_LLM_* settings (see config.py), e.g. LOCAL_LLM_RATE_LIMIT_RATE=0.1.
+"""
+import asyncio
+import os
+import shutil
+import sys
+import time
+import uuid
+from pathlib import Path
+
+os.environ["LLM_PROVIDERS"]      = "local"
+os.environ["ELEVENLABS_API_KEY"] = ""      # synthetic TTS
+os.environ["LLM_CACHE_ENABLED"]  = "false"
+
+from config import get_settings
+from models.schemas import JobStatus, JobStatusResponse
+from routers.generate import _JOB_STORE, _run_pipeline
+from services.script_generator import get_llm_router
+
+
+async def _job(pdf_path: Path) -> tuple[str, float]:
+    settings = get_settings()
+    job_id   = uuid.uuid4().hex[:12]
+    job_pdf  = settings.upload_dir / f"{job_id}.pdf"
+    shutil.copy(pdf_path, job_pdf)
+    _JOB_STORE[job_id] = JobStatusResponse(job_id=job_id, status=JobStatus.PENDING, progress_pct=0, message="")
+
+    start = time.perf_counter()
+    await _run_pipeline(job_id, job_pdf, "FM", settings)
+    return job_id, time.perf_counter() - start
+
+
+async def main(pdf_path: Path, jobs: int) -> None:
+    start   = time.perf_counter()
+    results = await asyncio.gather(*(_job(pdf_path) for _ in range(jobs)))
+    wall    = time.perf_counter() - start
+
+    for job_id, seconds in results:
+        job = _JOB_STORE[job_id]
+        print(f"{job_id}  {job.status.value:<8} {seconds:8.2f}s  {job.message}")
+    done = sum(_JOB_STORE[j].status == JobStatus.DONE for j, _ in results)
+    print(f"\n{done}/{jobs} jobs done in {wall:.2f}s wall ({jobs / wall:.2f} jobs/s)")
+    print(f"local LLM: {get_llm_router().provider('local').stats()}")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print(__doc__)
+        sys.exit(1)
+    asyncio.run(main(Path(sys.argv[1]), int(sys.argv[2]) if len(sys.argv) > 2 else 4))
@@ -1,7 +1,10 @@
 from functools import lru_cache
 from pathlib import Path
+from typing import Literal
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
+from models.schemas import ParseMode
+
 
 class Settings(BaseSettings):
     model_config = SettingsConfigDict(env_file=".env", env_file_encoding="utf-8")
@@ -20,8 +23,94 @@ class Settings(BaseSettings):
     upload_dir: Path = Path("./uploads")
     output_dir: Path = Path("./outputs")
     audio_assets_dir: Path = Path("./audio_assets")
+    cache_dir: Path = Path("./cache")
 
     max_pdf_size_mb: int = 50
+
+    # PDF parsing: documents with at least this many pages are extracted in
+    # parallel worker processes (0 workers = one per CPU core)
+    parse_workers: int = 0
+    parse_parallel_min_pages: int = 80
+    parse_mode: ParseMode = ParseMode.DEEP  # default for uploads: fast | standard | deep
+    parse_cache_max_mb: int = 500   # shared content-addressed parse cache
+    parse_max_concurrency: int = 2  # parses running at once; further uploads queue
+    parse_word_budget: int = 0      # stop extracting after this many words (0 = whole document)
+    parse_strip_references: bool = False  # drop the references section from parsed text
+    parse_cache_compress: bool = True     # zlib-compress cached documents (smaller, slower to load)
+
+    # LLM response cache: identical (model, prompt, config) calls are served from disk
+    llm_cache_enabled: bool = True
+    llm_cache_max_mb: int = 200
+    llm_cache_ttl_hours: float = 168
+
+    # Process-wide ElevenLabs scheduler (concurrency adapts between 1 and the max; jobs take turns)
+    tts_max_concurrency: int = 10
+    tts_latency_target_s: float = 10.0
+
+    # TTS segment cache: ElevenLabs audio keyed by (voice, model, voice settings, normalised text)
+    tts_cache_enabled: bool = True
+    tts_cache_max_mb: int = 1000
+
+    # Shared HTTP connection pools (created once per app in main.lifespan)
+    gemini_pool_size: int = 20
+    elevenlabs_pool_size: int = 10
+    http_keepalive_seconds: float = 30.0
+    http2_enabled: bool = True      # used when the optional `h2` package is installed
+
+    # Process-wide Gemini limiter (quota per minute; concurrency adapts between 1 and the max)
+    gemini_rpm: int = 60
+    gemini_tpm: int = 1_000_000
+    gemini_max_concurrency: int = 8
+    gemini_latency_target_s: float = 20.0
+
+    # Stream dialogue from Gemini and parse lines as they arrive
+    script_streaming: bool = True
+
+    # LLM provider routing (providers without an API key are skipped)
+    llm_providers: str = "gemini,openai,anthropic,openrouter"   # preference order until latencies are known
+    openai_model: str = "gpt-4o-mini"
+    anthropic_model: str = "claude-3-5-haiku-latest"
+    openrouter_model: str = "google/gemini-2.5-flash"
+    llm_pool_size: int = 20               # shared pool for the OpenAI/Anthropic/OpenRouter HTTP APIs
+    llm_latency_window: int = 50          # recent calls per provider used for p50/p95
+    llm_hedging: bool = True              # duplicate a slow request to a second provider
+    llm_hedge_after_s: float = 30.0       # hedge delay until a provider has enough latency samples
+    llm_hedge_max_inflight: int = 2       # cap on concurrent hedged duplicates
+
+    # Offline "local" provider (LLM_PROVIDERS=local): canned schema-correct answers for load tests
+    local_llm_latency_s: float = 0.5
+    local_llm_jitter_s: float = 0.5       # extra uniform random latency per call
+    local_llm_error_rate: float = 0.0     # share of calls failing with a simulated server error
+    local_llm_rate_limit_rate: float = 0.0  # share of calls answered with a simulated 429
+    local_llm_retry_delay_s: float = 1.0  # retry delay hinted by those 429s
+    local_llm_seed: int = 0
+
+    # Structured output: answers are validated against the stage's schema; invalid ones get repair prompts
+    llm_repair_attempts: int = 2          # repair prompts per invalid answer before falling back to defaults
+
+    # Study guide and quiz are generated off the audio path: "background" starts them as soon as
+    # the script is done, "lazy" on the first quiz or chat request
+    study_materials_mode: Literal["background", "lazy"] = "background"
+
+    # Per-chapter context retrieval (BM25 over ~N-word passages of the parsed sections)
+    retrieval_passage_words: int = 120
+
+    # Long documents: sections are summarised in parallel before chapter planning (map-reduce)
+    mapreduce_min_words: int = 12000      # documents at least this long use map-reduce planning
+    summary_part_tokens: int = 1500       # section text per summary call
+    summary_concurrency: int = 6          # summary calls in flight per job
+    words_per_chapter: int = 2500         # chapter count scales with length (3 .. max_chapters)
+    max_chapters: int = 10
+
+    # Provider-side caching of the paper overview shared by the chapter, dialogue and study prompts
+    context_cache_enabled: bool = True
+    context_cache_min_tokens: int = 1024  # smaller overviews are sent inline (Gemini's caching minimum)
+    context_cache_ttl_s: int = 900        # deleted when the script is done; the TTL covers crashes
+
+    # Prompt context budgets per generation stage, in tokens (~4 characters each)
+    outline_context_tokens: int = 300     # section previews for chapter planning
+    chapter_context_tokens: int = 600     # retrieved passages for each chapter's dialogue
+    study_context_tokens: int = 1250      # paper excerpt for the study guide and quiz
     cors_origins: str = "http://localhost:3000,http://localhost:5173"
 
     @property
@@ -36,8 +125,23 @@ class Settings(BaseSettings):
         }
         return mapping.get(pair, mapping["FM"])
 
+    @property
+    def parse_cache_dir(self) -> Path:
+        return self.cache_dir / "parsed"
+
+    @property
+    def llm_cache_dir(self) -> Path:
+        return self.cache_dir / "llm"
+
+    @property
+    def tts_cache_dir(self) -> Path:
+        return self.cache_dir / "tts"
+
     def ensure_dirs(self):
-        for d in (self.upload_dir, self.output_dir, self.audio_assets_dir):
+        for d in (
+            self.upload_dir, self.output_dir, self.audio_assets_dir,
+            self.parse_cache_dir, self.llm_cache_dir, self.tts_cache_dir,
+        ):
             d.mkdir(parents=True, exist_ok=True)
 
 
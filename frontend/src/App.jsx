@@ -1,5 +1,5 @@
 import { useState, useRef, useEffect } from "react";
-import { uploadPDF, startGeneration, pollStatus, sendChat, submitQuiz, audioUrl, downloadUrl } from "./api.js";
+import { uploadPDF, startGeneration, pollStatus, sendChat, submitQuiz, getStudyGuide, audioUrl, downloadUrl } from "./api.js";
 import AuthPage from "./AuthPage.jsx";
 import HistoryPage from "./HistoryPage.jsx";
 import { onAuthChange, logOut, auth } from "./firebase.js";
@@ -465,12 +465,20 @@ function PlayerScreen({ jobId, podcastData, script, doc, user, setScreen }) {
   const [leaderboard, setLeaderboard] = useState([]);
   const [loadingLB, setLoadingLB] = useState(false);
   const [vttCues, setVttCues] = useState([]);
+  const [study, setStudy] = useState(null);
+
+  // Study guide and quiz are generated after the script; fetch them if they were not ready yet
+  useEffect(() => {
+    if (script && !script.quiz_questions?.length) {
+      getStudyGuide(jobId).then(setStudy).catch(console.error);
+    }
+  }, [jobId, script]);
 
   // Get real data
   const chapters = podcastData?.chapters || [];
   const dialogue = script?.dialogue || [];
-  const questions = script?.quiz_questions || [];
-  const studyGuide = script?.study_guide || "";
+  const questions = script?.quiz_questions?.length ? script.quiz_questions : study?.quiz_questions || [];
+  const studyGuide = script?.study_guide || study?.study_guide || "";
   const progress = duration > 0 ? (currentTime / duration) * 100 : 0;
 
   // Restore resume position
@@ -20,8 +20,11 @@ from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
 from config import get_settings
-from routers import generate, ingest, podcast
+from routers import generate, ingest, metrics, podcast
 from services.auth_service import get_current_user
+from services.clients import shutdown_clients, startup_clients
+from services.parse_jobs import shutdown_parse_executor
+from services.pdf_parser import shutdown_parse_pool
 from fastapi import Depends
 import firebase_admin
 from firebase_admin import credentials
@@ -57,8 +60,12 @@ async def lifespan(app: FastAPI):
     for directory in [settings.upload_dir, settings.output_dir, settings.audio_assets_dir]:
         os.makedirs(directory, exist_ok=True)
         
+    await startup_clients()
     logger.info("🚀 Paper to Podcast API starting up (Gemini Mode)")
     yield
+    await shutdown_clients()
+    shutdown_parse_executor()
+    shutdown_parse_pool()
     logger.info("👋 Paper to Podcast API shutting down")
 
 # ── App Initialization ──────────────────────────────────────────────────────
@@ -68,6 +75,10 @@ app = FastAPI(
     lifespan    = lifespan,
 )
 
+# ── Upload size guard ───────────────────────────────────────────────────────
+# Registered before CORS so CORS stays outermost and 413s still carry its headers
+app.add_middleware(ingest.UploadSizeLimit)
+
 # ── CORS Configuration (Crucial for Port 5173) ─────────────────────────────
 settings = get_settings()
 app.add_middleware(
@@ -83,6 +94,7 @@ app.add_middleware(
 app.include_router(ingest.router, prefix="/api", dependencies=[Depends(get_current_user)])
 app.include_router(generate.router, prefix="/api", dependencies=[Depends(get_current_user)])
 app.include_router(podcast.router, prefix="/api", dependencies=[Depends(get_current_user)])
+app.include_router(metrics.router, prefix="/api", dependencies=[Depends(get_current_user)])
 
 @app.get("/health")
 async def health():
@@ -3,8 +3,8 @@ models/schemas.py — All Pydantic models for the Paper-to-Podcast API.
 """
 from __future__ import annotations
 from enum import Enum
-from typing import Optional
-from pydantic import BaseModel, Field
+from typing import Any, Optional
+from pydantic import BaseModel, Field, model_serializer
 
 
 # ─── Enums ────────────────────────────────────────────────────────────────────
@@ -25,6 +25,12 @@ class JobStatus(str, Enum):
     ERROR      = "error"
 
 
+class ParseMode(str, Enum):
+    FAST     = "fast"       # single text pass, caption-only table hints
+    STANDARD = "standard"   # single text pass, table detection on captioned pages
+    DEEP     = "deep"       # full text + table detection on every page
+
+
 # ─── PDF Parsing ──────────────────────────────────────────────────────────────
 
 class ParsedSection(BaseModel):
@@ -37,6 +43,18 @@ class ParsedSection(BaseModel):
     has_equations: bool = False
 
 
+class ParsedTable(BaseModel):
+    """A table recovered from one page, rendered as Markdown for LLM prompts."""
+    page: int
+    markdown: str
+    rows: int
+    cols: int
+
+    @property
+    def cells(self) -> int:
+        return self.rows * self.cols
+
+
 class ParsedDocument(BaseModel):
     """Full structured output of the PDF parser."""
     job_id: str
@@ -46,6 +64,34 @@ class ParsedDocument(BaseModel):
     sections: list[ParsedSection]
     raw_text: str           # Full concatenated text for RAG indexing
     metadata: dict          # Author, title, year, DOI if available
+    parse_mode: ParseMode = ParseMode.DEEP  # mode that produced this document
+    content_key: Optional[str] = None       # shared parse-cache entry this document came from
+    is_partial: bool = False                # budgeted parse stopped before the last page
+    pages_parsed: Optional[int] = None      # pages extracted when partial
+    chars_removed: dict[str, int] = Field(default_factory=dict)  # cleanup stage → characters dropped
+    # page → tables; stored beside the parse cache, not in the document JSON
+    tables: dict[int, list[ParsedTable]] = Field(default_factory=dict, exclude=True)
+    # BM25 passage index (services.retrieval.PassageIndex); also stored beside the parse cache
+    retrieval: Optional[Any] = Field(default=None, exclude=True)
+
+    def __getattr__(self, name: str):
+        # Documents loaded from the compact parse cache derive raw_text on first use
+        if name == "raw_text":
+            raw_text = "\n\n".join(s.body for s in self.sections)
+            self.__dict__["raw_text"] = raw_text
+            return raw_text
+        return super().__getattr__(name)
+
+    def __eq__(self, other: Any) -> bool:
+        # pydantic compares __dict__: materialise a lazily derived raw_text on both sides first
+        if isinstance(other, ParsedDocument):
+            self.raw_text, other.raw_text
+        return super().__eq__(other)
+
+    @model_serializer(mode="wrap")
+    def _serialize(self, handler):
+        self.raw_text   # materialise a lazily derived raw_text before dumping
+        return handler(self)
 
 
 # ─── Script Generation ────────────────────────────────────────────────────────
@@ -74,8 +120,46 @@ class PodcastScript(BaseModel):
     total_estimated_duration_sec: int
     chapters: list[Chapter]
     dialogue: list[DialogueLine]
-    study_guide: str        # Markdown cheat sheet
-    quiz_questions: list[QuizQuestion]
+    study_guide: str = ""   # Markdown cheat sheet; filled in after the script (see generate_study_materials)
+    quiz_questions: list[QuizQuestion] = Field(default_factory=list)
+
+
+class LLMCall(BaseModel):
+    """Usage of one LLM call made while generating a script."""
+    stage: str              # summary | chapters | dialogue | study, ":repair" suffix for repair prompts
+    provider: str           # provider that answered, or "cache"
+    prompt_tokens: int
+    output_tokens: int
+    cached_tokens: int = 0  # prompt tokens read from a provider-side context cache
+    latency_ms: int
+    estimated: bool = False  # token counts estimated (~4 chars/token), not reported by the provider
+
+
+class LLMUsage(BaseModel):
+    """Per-job LLM usage: every call plus running totals."""
+    calls: list[LLMCall] = Field(default_factory=list)
+    prompt_tokens: int = 0
+    output_tokens: int = 0
+    cached_calls: int = 0
+    invalid_responses: dict[str, int] = Field(default_factory=dict)   # per stage, before repair
+
+    def add(self, call: LLMCall) -> None:
+        self.calls.append(call)
+        self.prompt_tokens += call.prompt_tokens
+        self.output_tokens += call.output_tokens
+        self.cached_calls  += call.provider == "cache"
+
+
+class TTSUsage(BaseModel):
+    """Per-job TTS segment cache lookups (synthetic fallback audio is not cached)."""
+    cache_hits: int = 0
+    cache_misses: int = 0
+    hit_rate: float = 0.0
+
+    def record(self, hit: bool) -> None:
+        self.cache_hits   += hit
+        self.cache_misses += not hit
+        self.hit_rate      = round(self.cache_hits / (self.cache_hits + self.cache_misses), 3)
 
 
 class QuizQuestion(BaseModel):
@@ -118,6 +202,37 @@ class IngestRequest(BaseModel):
     voice_pair: VoicePair = VoicePair.FM
 
 
+class ParseSummary(BaseModel):
+    """What a finished asynchronous parse found; the document itself stays in the parse cache."""
+    job_id: str
+    filename: str
+    total_pages: int
+    word_count: int
+    sections: list[str]     # section titles, in order
+    parse_mode: ParseMode
+    is_partial: bool = False
+
+    @classmethod
+    def of(cls, doc: ParsedDocument) -> "ParseSummary":
+        return cls(
+            job_id      = doc.job_id,
+            filename    = doc.filename,
+            total_pages = doc.total_pages,
+            word_count  = doc.word_count,
+            sections    = [s.title for s in doc.sections],
+            parse_mode  = doc.parse_mode,
+            is_partial  = doc.is_partial,
+        )
+
+
+class ParseJobStatus(BaseModel):
+    """State of an asynchronous /ingest parse (returned with 202 Accepted)."""
+    job_id: str
+    status: JobStatus       # PENDING → PARSING → DONE | ERROR
+    message: str = ""
+    result: Optional[ParseSummary] = None
+
+
 class JobStatusResponse(BaseModel):
     job_id: str
     status: JobStatus
@@ -125,6 +240,10 @@ class JobStatusResponse(BaseModel):
     message: str = ""
     result: Optional[PodcastAudio] = None
     script: Optional[PodcastScript] = None
+    dialogue_preview: list[DialogueLine] = Field(default_factory=list)  # lines streamed so far
+    llm_usage: Optional[LLMUsage] = None   # tokens and latency of every LLM call for this job
+    study_ready: bool = False              # script.study_guide and quiz_questions have been generated
+    tts_usage: Optional[TTSUsage] = None   # TTS segment cache hits for this job
 
 
 class ChatRequest(BaseModel):
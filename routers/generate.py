@@ -3,19 +3,25 @@ routers/generate.py — Pipeline management for script and audio generation.
 """
 from __future__ import annotations
 
+import asyncio
+import itertools
 import json
 import logging
+import time
 from pathlib import Path
+from typing import Optional
 
 from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException
 
 from config import Settings, get_settings
 from models.schemas import (
-    JobStatus, JobStatusResponse, PodcastAudio,
+    JobStatus, JobStatusResponse, LLMUsage, ParseMode, PodcastAudio, TTSUsage,
 )
 from services.audio_mixer import mix_podcast
-from services.script_generator import generate_script
-from services.tts_service import synthesise_script
+from services.script_generator import (
+    NO_LLM_KEY_ERROR, generate_script, generate_study_materials, llm_configured,
+)
+from services.tts_service import synthesise_lines
 
 logger = logging.getLogger(__name__)
 router = APIRouter(tags=["generate"])
@@ -23,6 +29,14 @@ router = APIRouter(tags=["generate"])
 # In-memory job store
 _JOB_STORE: dict[str, JobStatusResponse] = {}
 
+_STUDY_TTL_S = 24 * 3600       # study materials not generated by then are given up on
+
+# Study materials per job: the running (or finished) task, and how to reload the
+# parsed document from the parse cache until they have been generated
+_STUDY_TASKS: dict[str, asyncio.Task] = {}
+_STUDY_ARGS:  dict[str, tuple] = {}         # job_id -> (pdf_path, mode, sha256, budget)
+_STUDY_AT:    dict[str, float] = {}
+
 
 # ── Routes ────────────────────────────────────────────────────────────────────
 
@@ -30,6 +44,7 @@ _JOB_STORE: dict[str, JobStatusResponse] = {}
 async def start_generation(
     job_id:     str,
     background: BackgroundTasks,
+    parse_mode: Optional[ParseMode] = None,
     settings:   Settings = Depends(get_settings),
 ) -> JobStatusResponse:
     pdf_path  = settings.upload_dir / f"{job_id}.pdf"
@@ -44,6 +59,7 @@ async def start_generation(
 
     meta       = json.loads(meta_path.read_text(encoding="utf-8")) if meta_path.exists() else {}
     voice_pair = meta.get("voice_pair", "FM")
+    mode       = parse_mode or ParseMode(meta.get("parse_mode", settings.parse_mode))
 
     job = JobStatusResponse(
         job_id       = job_id,
@@ -53,7 +69,10 @@ async def start_generation(
     )
     _JOB_STORE[job_id] = job
 
-    background.add_task(_run_pipeline, job_id, pdf_path, voice_pair, settings)
+    background.add_task(
+        _run_pipeline, job_id, pdf_path, voice_pair, settings, mode,
+        meta.get("sha256"), meta.get("word_budget", settings.parse_word_budget),
+    )
     return job
 
 
@@ -70,6 +89,10 @@ async def get_status(job_id: str) -> JobStatusResponse:
         message      = job.message,
         result       = job.result,
         script       = job.script,
+        dialogue_preview = job.dialogue_preview,
+        llm_usage    = job.llm_usage,
+        study_ready  = job.study_ready,
+        tts_usage    = job.tts_usage,
     )
 
 
@@ -80,6 +103,9 @@ async def _run_pipeline(
     pdf_path:   Path,
     voice_pair: str,
     settings:   Settings,
+    parse_mode: ParseMode = ParseMode.DEEP,
+    sha256:     Optional[str] = None,
+    word_budget: int = 0,
 ) -> None:
 
     def update(status: JobStatus, pct: int, msg: str):
@@ -92,35 +118,81 @@ async def _run_pipeline(
     try:
         # ── Stage 1: Parse PDF ────────────────────────────────────────────────
         update(JobStatus.PARSING, 5, "Checking for cached analysis...")
+        # Per-job cache written by older versions; new jobs use the shared parse cache
         cache_path = settings.upload_dir / f"{job_id}.parsed.json"
         
-        from services.pdf_parser import parse_pdf
-        from models.schemas import ParsedDocument
+        from services.parse_jobs import run_parse
+        from services.pdf_parser import mode_satisfies
+        from services.doc_codec import load_document
         
+        doc = None
         if cache_path.exists():
-            logger.info(f"[{job_id}] Found cached PDF analysis. Skipping parse.")
-            doc = ParsedDocument.model_validate_json(cache_path.read_text(encoding="utf-8"))
-            update(JobStatus.PARSING, 15, "Resumed from cache. Skipping redundant scan.")
-        else:
+            doc = load_document(cache_path)
+            if mode_satisfies(doc.parse_mode, parse_mode):
+                logger.info(f"[{job_id}] Found cached PDF analysis ({doc.parse_mode.value}). Skipping parse.")
+                update(JobStatus.PARSING, 15, "Resumed from cache. Skipping redundant scan.")
+            else:
+                logger.info(f"[{job_id}] Cached analysis is {doc.parse_mode.value}; re-parsing in {parse_mode.value} mode.")
+                doc = None
+
+        if doc is None:
             update(JobStatus.PARSING, 10, "Parsing PDF (initial scan)...")
-            doc = parse_pdf(pdf_path, job_id=job_id)
-            update(JobStatus.PARSING, 15, f"Parsed {doc.total_pages} pages, {len(doc.sections)} sections.")
+            doc, hit = await run_parse(pdf_path, job_id, parse_mode, sha256=sha256, word_budget=word_budget)
+            if hit:
+                update(JobStatus.PARSING, 15, "Resumed from shared cache. Skipping redundant scan.")
+            else:
+                update(JobStatus.PARSING, 15, f"Parsed {doc.total_pages} pages, {len(doc.sections)} sections.")
 
-        if not settings.google_api_key:
-            raise RuntimeError("No GOOGLE_API_KEY set in .env file.")
+        if not llm_configured():
+            raise RuntimeError(NO_LLM_KEY_ERROR)
 
         # ── Stage 2: Generate script ──────────────────────────────────────────
-        update(JobStatus.SCRIPTING, 20, "Generating podcast script with Gemini...")
-        script = await generate_script(doc)
+        update(JobStatus.SCRIPTING, 20, "Generating podcast script...")
+
+        # Chapters are synthesised as soon as their dialogue is ready, overlapping
+        # TTS with generation of the remaining chapters
+        tts_tasks: dict[int, asyncio.Task] = {}
+        tts_usage = _JOB_STORE[job_id].tts_usage = TTSUsage()
+
+        def on_chapter(chapter_id: int, lines: list) -> None:
+            tts_tasks[chapter_id] = asyncio.create_task(
+                synthesise_lines(lines, voice_pair=voice_pair, job_id=job_id, usage=tts_usage)
+            )
+            logger.info(f"[{job_id}] Chapter {chapter_id} scripted; synthesising {len(lines)} lines early.")
+
+        def on_line(line) -> None:
+            # Streamed lines show up on the status endpoint before the script is complete
+            job = _JOB_STORE.get(job_id)
+            if job is not None:
+                job.dialogue_preview.append(line)
+                job.message = f"Writing dialogue: {len(job.dialogue_preview)} lines so far..."
+
+        usage = _JOB_STORE[job_id].llm_usage = LLMUsage()
+        try:
+            script = await generate_script(doc, on_line=on_line, on_chapter=on_chapter, usage=usage)
+        except BaseException:
+            for task in tts_tasks.values():
+                task.cancel()
+            raise
 
         # Save script to job store immediately so status endpoint returns it
         _JOB_STORE[job_id].script = script
+        _JOB_STORE[job_id].dialogue_preview = []
         update(JobStatus.SCRIPTING, 50, f"Script ready: {len(script.dialogue)} lines, {len(script.chapters)} chapters.")
 
+        # Study guide and quiz are not needed for audio: generated alongside TTS or on first use
+        _prune_study()
+        _STUDY_ARGS[job_id] = (pdf_path, doc.parse_mode, sha256, word_budget)
+        _STUDY_AT[job_id]   = time.monotonic()
+        _STUDY_TASKS.pop(job_id, None)
+        if settings.study_materials_mode == "background":
+            schedule_study_materials(job_id)
+
         # ── Stage 3: TTS Synthesis ────────────────────────────────────────────
         update(JobStatus.SYNTHESISING, 55, "Synthesising voices with ElevenLabs...")
-        synthesised = await synthesise_script(script, voice_pair=voice_pair)
-        update(JobStatus.SYNTHESISING, 80, f"Synthesis complete: {len(synthesised)} segments.")
+        synthesised = await _collect_synthesis(script, tts_tasks, voice_pair, job_id, tts_usage)
+        cached      = f" ({tts_usage.cache_hits} from cache)" if tts_usage.cache_hits else ""
+        update(JobStatus.SYNTHESISING, 80, f"Synthesis complete: {len(synthesised)} segments{cached}.")
 
        # ── Stage 4: Audio Mixing ─────────────────────────────────────────────
         update(JobStatus.MIXING, 80, "Mixing final audio...")
@@ -158,4 +230,90 @@ async def _run_pipeline(
 
     except Exception as e:
         logger.error(f"[{job_id}] Pipeline error: {e}", exc_info=True)
-        update(JobStatus.ERROR, 0, f"Error: {str(e)}")
\ No newline at end of file
+        update(JobStatus.ERROR, 0, f"Error: {str(e)}")
+
+
+async def _collect_synthesis(
+    script,
+    tts_tasks:  dict,
+    voice_pair: str,
+    job_id:     Optional[str] = None,
+    usage:      Optional[TTSUsage] = None,
+) -> list:
+    """
+    Segments for script.dialogue in order: chapters already being synthesised
+    are awaited, any dialogue not covered by an early task is synthesised now.
+    """
+    synthesised = []
+    try:
+        for chapter_id, group in itertools.groupby(script.dialogue, key=lambda line: line.chapter_id):
+            task = tts_tasks.pop(chapter_id, None)
+            if task is not None:
+                synthesised.extend(await task)
+            else:
+                synthesised.extend(await synthesise_lines(
+                    list(group), voice_pair=voice_pair, job_id=job_id, usage=usage,
+                ))
+    finally:
+        for task in tts_tasks.values():     # chapters the script did not keep
+            task.cancel()
+    return synthesised
+
+
+# ── Study materials ───────────────────────────────────────────────────────────
+
+def schedule_study_materials(job_id: str) -> Optional[asyncio.Task]:
+    """
+    The task generating the job's study guide and quiz, started if it is not
+    running yet or the last attempt failed. None when the job has no script.
+    """
+    task = _STUDY_TASKS.get(job_id)
+    if task is not None and not (task.done() and (task.cancelled() or not task.result())):
+        return task
+    if job_id not in _STUDY_ARGS:
+        return None
+    task = _STUDY_TASKS[job_id] = asyncio.create_task(_generate_study(job_id))
+    return task
+
+
+async def _generate_study(job_id: str) -> bool:
+    job = _JOB_STORE.get(job_id)
+    if job is None or job.script is None:
+        return False
+    from services.parse_jobs import run_parse
+
+    pdf_path, mode, sha256, budget = _STUDY_ARGS[job_id]
+    try:
+        # Shared cache hit (re-parsed only if the entry has been evicted since)
+        doc, _      = await run_parse(pdf_path, job_id, mode, sha256=sha256, word_budget=budget)
+        guide, quiz = await generate_study_materials(doc, usage=job.llm_usage)
+    except Exception as e:
+        logger.error(f"[{job_id}] Study materials failed: {e}")
+        return False
+    job.script.study_guide    = guide
+    job.script.quiz_questions = quiz
+    job.study_ready           = True
+    _STUDY_ARGS.pop(job_id, None)
+    logger.info(f"[{job_id}] Study materials ready: {len(quiz)} quiz questions.")
+    return True
+
+
+def _prune_study() -> None:
+    cutoff = time.monotonic() - _STUDY_TTL_S
+    for job_id in [j for j, at in _STUDY_AT.items() if at < cutoff]:
+        task = _STUDY_TASKS.get(job_id)
+        if task is not None and not task.done():
+            continue
+        _STUDY_TASKS.pop(job_id, None)
+        _STUDY_ARGS.pop(job_id, None)
+        del _STUDY_AT[job_id]
+
+
+async def await_study_materials(job_id: str) -> Optional[JobStatusResponse]:
+    """The job, once its study materials exist (generating them now if nobody has yet)."""
+    job = _JOB_STORE.get(job_id)
+    if job is not None and job.script is not None and not job.study_ready:
+        task = schedule_study_materials(job_id)
+        if task is not None:
+            await asyncio.shield(task)
+    return job
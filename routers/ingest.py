@@ -3,69 +3,215 @@ routers/ingest.py — Accept a PDF upload, parse it, and return metadata.
 """
 from __future__ import annotations
 
+import asyncio
+import hashlib
 import uuid
 import logging
 import json
+import time
 from pathlib import Path
+from typing import Optional
 
 from fastapi import APIRouter, File, Form, HTTPException, UploadFile, Depends
+from fastapi.responses import JSONResponse
+from starlette.datastructures import Headers
 from config import Settings, get_settings
-from models.schemas import ParsedDocument, VoicePair
-from services.pdf_parser import parse_pdf
+from models.schemas import JobStatus, ParseJobStatus, ParseMode, ParsedDocument, ParseSummary, VoicePair
+from services.parse_jobs import run_parse
 
 logger = logging.getLogger(__name__)
 
 # REMOVED prefix="/api" here because main.py handles it globally
 router = APIRouter(tags=["ingest"])
 
+_UPLOAD_CHUNK   = 1024 * 1024   # bytes copied per read while streaming an upload
+_FORM_OVERHEAD  = 64 * 1024     # multipart boundaries + small form fields
+
+_PARSE_JOB_TTL_S = 3600        # finished async parses are forgotten after this long
+
+# In-memory store of asynchronous parses (async_parse=true uploads). Finished
+# entries keep only a ParseSummary; the document lives in the parse cache.
+_PARSE_JOBS: dict[str, ParseJobStatus] = {}
+_PARSE_DONE_AT: dict[str, float] = {}
+_PARSE_TASKS: set[asyncio.Task] = set()
+
+
+def _max_upload_bytes(settings: Settings) -> int:
+    return settings.max_pdf_size_mb * 1024 * 1024
+
+
+class UploadSizeLimit:
+    """
+    ASGI middleware capping the body of ingest requests. A Content-Length
+    over the limit is refused before anything is read; bodies without one
+    (chunked uploads) are counted as they arrive and cut off with 413 once
+    they pass it, before Starlette spools the rest of the multipart form.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if (
+            scope["type"] != "http" or scope["method"] != "POST"
+            or not scope["path"].rstrip("/").endswith("/ingest")
+        ):
+            return await self.app(scope, receive, send)
+
+        limit  = _max_upload_bytes(get_settings()) + _FORM_OVERHEAD
+        length = Headers(scope=scope).get("content-length", "")
+        if length.isdigit() and int(length) > limit:
+            response = JSONResponse(
+                status_code=413,
+                content={"detail": f"File too large: {int(length) / (1024 * 1024):.1f} MB."},
+            )
+            return await response(scope, receive, send)
+
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    raise HTTPException(
+                        status_code=413,
+                        detail=f"File too large: more than {(limit - _FORM_OVERHEAD) / (1024 * 1024):.0f} MB.",
+                    )
+            return message
+
+        await self.app(scope, limited_receive, send)
+
+
 @router.post("/ingest", response_model=ParsedDocument)
 async def ingest_pdf(
     file:       UploadFile = File(..., description="PDF file to convert"),
     voice_pair: VoicePair  = Form(VoicePair.FM, description="Host voice pairing"),
+    parse_mode: Optional[ParseMode] = Form(None, description="fast | standard | deep (default from settings)"),
+    async_parse: bool      = Form(False, description="Return 202 immediately and parse in the background"),
+    word_budget: Optional[int] = Form(None, description="Stop parsing after this many words (0 = whole document)"),
     settings:   Settings   = Depends(get_settings),
 ) -> ParsedDocument:
     """
     Handle PDF upload and metadata storage.
+    With async_parse, respond 202 with a ParseJobStatus and poll GET /ingest/{job_id}.
     """
     # 1. Validation
     if not file.filename or not file.filename.lower().endswith(".pdf"):
         raise HTTPException(status_code=400, detail="Only PDF files are accepted.")
 
-    content = await file.read()
-    size_mb = len(content) / (1024 * 1024)
-    if size_mb > settings.max_pdf_size_mb:
-        raise HTTPException(
-            status_code=413,
-            detail=f"File too large: {size_mb:.1f} MB.",
-        )
-
-    # 2. Save file
+    # 2. Stream the upload to disk, hashing it on the way
     job_id   = str(uuid.uuid4())
     pdf_path = settings.upload_dir / f"{job_id}.pdf"
+    sha256   = await _save_upload(file, pdf_path, _max_upload_bytes(settings))
+    logger.info(f"[{job_id}] Saved upload: {file.filename}")
 
-    try:
-        pdf_path.write_bytes(content)
-        logger.info(f"[{job_id}] Saved upload: {file.filename}")
-    except IOError as e:
-        raise HTTPException(status_code=500, detail=f"Failed to save file: {e}")
+    # 3. Store Metadata
+    mode      = parse_mode or settings.parse_mode
+    budget    = settings.parse_word_budget if word_budget is None else word_budget
+    meta_path = settings.upload_dir / f"{job_id}.meta.json"
+    meta_path.write_text(json.dumps({
+        "voice_pair": voice_pair, 
+        "filename": file.filename,
+        "parse_mode": mode,
+        "sha256": sha256,
+        "word_budget": budget,
+    }), encoding="utf-8")
+
+    # 4. Parse PDF (or reuse the shared parse of identical bytes) off the event loop
+    if async_parse:
+        _prune_parse_jobs()
+        job = ParseJobStatus(job_id=job_id, status=JobStatus.PENDING, message="Parse queued...")
+        _PARSE_JOBS[job_id] = job
+        task = asyncio.create_task(_parse_in_background(job_id, pdf_path, mode, sha256, budget, settings))
+        _PARSE_TASKS.add(task)
+        task.add_done_callback(_PARSE_TASKS.discard)
+        return JSONResponse(status_code=202, content=job.model_dump(mode="json"))
 
-    # 3. Parse PDF
     try:
-        parsed = parse_pdf(pdf_path, job_id=job_id)
-        # Cache the result immediately to skip parsing during generation
-        cache_path = settings.upload_dir / f"{job_id}.parsed.json"
-        cache_path.write_text(parsed.model_dump_json(), encoding="utf-8")
-        logger.info(f"[{job_id}] Cached parsed results for instant generation.")
+        return await _parse_upload(job_id, pdf_path, mode, sha256, budget)
     except Exception as e:
-        pdf_path.unlink(missing_ok=True)
+        _discard_upload(job_id, settings)
         logger.error(f"[{job_id}] PDF parsing failed: {e}")
         raise HTTPException(status_code=422, detail=f"Could not parse PDF: {e}")
 
-    # 4. Store Metadata
-    meta_path = settings.upload_dir / f"{job_id}.meta.json"
-    meta_path.write_text(json.dumps({
-        "voice_pair": voice_pair, 
-        "filename": file.filename
-    }), encoding="utf-8")
 
-    return parsed
\ No newline at end of file
+@router.get("/ingest/{job_id}", response_model=ParseJobStatus)
+async def get_parse_status(job_id: str) -> ParseJobStatus:
+    if job_id not in _PARSE_JOBS:
+        raise HTTPException(status_code=404, detail="Parse job not found.")
+    return _PARSE_JOBS[job_id]
+
+
+def _prune_parse_jobs() -> None:
+    cutoff = time.monotonic() - _PARSE_JOB_TTL_S
+    for job_id in [j for j, done_at in _PARSE_DONE_AT.items() if done_at < cutoff]:
+        _PARSE_JOBS.pop(job_id, None)
+        del _PARSE_DONE_AT[job_id]
+
+
+async def _parse_upload(
+    job_id:   str,
+    pdf_path: Path,
+    mode:     ParseMode,
+    sha256:   str,
+    budget:   int,
+) -> ParsedDocument:
+    parsed, hit = await run_parse(pdf_path, job_id, mode, sha256=sha256, word_budget=budget)
+    if not hit:
+        logger.info(f"[{job_id}] Cached parsed results for instant generation.")
+    return parsed
+
+
+async def _parse_in_background(
+    job_id:   str,
+    pdf_path: Path,
+    mode:     ParseMode,
+    sha256:   str,
+    budget:   int,
+    settings: Settings,
+) -> None:
+    job = _PARSE_JOBS[job_id]
+    job.status, job.message = JobStatus.PARSING, "Parsing PDF..."
+    try:
+        parsed = await _parse_upload(job_id, pdf_path, mode, sha256, budget)
+        job.result = ParseSummary.of(parsed)
+        job.status, job.message = JobStatus.DONE, f"Parsed {parsed.total_pages} pages."
+    except Exception as e:
+        _discard_upload(job_id, settings)
+        logger.error(f"[{job_id}] PDF parsing failed: {e}")
+        job.status, job.message = JobStatus.ERROR, f"Could not parse PDF: {e}"
+    _PARSE_DONE_AT[job_id] = time.monotonic()
+
+
+def _discard_upload(job_id: str, settings: Settings) -> None:
+    (settings.upload_dir / f"{job_id}.pdf").unlink(missing_ok=True)
+    (settings.upload_dir / f"{job_id}.meta.json").unlink(missing_ok=True)
+
+
+async def _save_upload(file: UploadFile, dest: Path, limit: int) -> str:
+    """
+    Copy an upload to `dest` in fixed-size chunks and return its SHA-256.
+    Aborts with 413 as soon as the running size passes `limit`.
+    """
+    sha  = hashlib.sha256()
+    size = 0
+    try:
+        with open(dest, "wb") as out:
+            while chunk := await file.read(_UPLOAD_CHUNK):
+                size += len(chunk)
+                if size > limit:
+                    raise HTTPException(
+                        status_code=413,
+                        detail=f"File too large: more than {limit / (1024 * 1024):.0f} MB.",
+                    )
+                sha.update(chunk)
+                out.write(chunk)
+    except HTTPException:
+        dest.unlink(missing_ok=True)
+        raise
+    except IOError as e:
+        dest.unlink(missing_ok=True)
+        raise HTTPException(status_code=500, detail=f"Failed to save file: {e}")
+    return sha.hexdigest()
@@ -0,0 +1,32 @@
+"""
+routers/metrics.py — Runtime counters for caches and shared resources.
+"""
+from __future__ import annotations
+
+from fastapi import APIRouter
+
+from services.clients import client_pool_stats
+from services.llm_cache import get_llm_cache
+from services.parse_cache import get_parse_cache
+from services.parse_jobs import parse_queue_stats
+from services.rate_limiter import get_gemini_limiter
+from services.script_generator import get_llm_router, validation_stats
+from services.tts_cache import get_tts_cache
+from services.tts_scheduler import get_tts_scheduler
+
+router = APIRouter(tags=["metrics"])
+
+
+@router.get("/metrics")
+async def get_metrics() -> dict:
+    return {
+        "parse_cache": get_parse_cache().stats(),
+        "parse_queue": parse_queue_stats(),
+        "llm_cache":   get_llm_cache().stats(),
+        "tts_cache":   get_tts_cache().stats(),
+        "http_pools":  client_pool_stats(),
+        "gemini":      get_gemini_limiter().stats(),
+        "tts":         get_tts_scheduler().stats(),
+        "llm_router":  get_llm_router().stats(),
+        "llm_validation": validation_stats(),
+    }
@@ -9,14 +9,15 @@ from pathlib import Path
 
 from fastapi import APIRouter, Depends, HTTPException
 from fastapi.responses import FileResponse, PlainTextResponse
-from google import genai  # Modern Gemini SDK
 
 from config import Settings, get_settings
 from models.schemas import (
     ChatRequest, ChatResponse,
     QuizResult, QuizSubmission,
 )
-from routers.generate import _JOB_STORE  # Shared in-memory state
+from routers.generate import await_study_materials
+from services.clients import get_genai_client
+from services.rate_limiter import estimate_tokens, get_gemini_limiter, is_rate_limit_error, retry_delay_from
 
 logger = logging.getLogger(__name__)
 
@@ -53,6 +54,18 @@ async def get_captions(job_id: str, settings: Settings = Depends(get_settings)):
         raise HTTPException(status_code=404, detail="Captions not ready.")
     return PlainTextResponse(content=path.read_text(encoding="utf-8"), media_type="text/vtt")
 
+@router.get("/{job_id}/study-guide")
+async def get_study_guide(job_id: str) -> dict:
+    """Study guide and quiz, waiting for them if they are still being generated."""
+    job = await await_study_materials(job_id)
+    if not job or not job.script:
+        raise HTTPException(status_code=404, detail="Podcast not found.")
+    return {
+        "study_guide":    job.script.study_guide,
+        "quiz_questions": [q.model_dump() for q in job.script.quiz_questions],
+        "ready":          job.study_ready,
+    }
+
 # ── Gemini RAG Chatbot ────────────────────────────────────────────────────────
 
 @router.post("/{job_id}/chat", response_model=ChatResponse)
@@ -64,15 +77,16 @@ async def chat(
     """
     Answer user questions about the paper using Gemini 2.0 Flash.
     """
-    job = _JOB_STORE.get(job_id)
+    job = await await_study_materials(job_id)
     if not job or not job.script:
         raise HTTPException(status_code=404, detail="Podcast data not found.")
 
-    # Using the study guide as context for the AI
-    context = job.script.study_guide[:3000]
+    # Using the study guide as context for the AI (the dialogue if the guide failed)
+    context = job.script.study_guide or " ".join(line.text for line in job.script.dialogue)
+    context = context[:3000]
     
-    # Initialize the modern Gemini client
-    client = genai.Client(api_key=settings.google_api_key)
+    # Shared app-scoped Gemini client (pooled connections)
+    client = get_genai_client()
     
     system_instruction = f"""
     You are a helpful study assistant for the paper: "{job.job_id}".
@@ -83,12 +97,19 @@ async def chat(
     """
 
     try:
-        # Generate response using modern SDK
-        response = client.models.generate_content(
-            model="gemini-2.0-flash",
-            contents=req.message,
-            config={'system_instruction': system_instruction}
-        )
+        # Generate response using modern SDK, within the shared Gemini quota
+        async with get_gemini_limiter().slot(estimate_tokens(system_instruction + req.message)) as slot:
+            try:
+                response = await client.aio.models.generate_content(
+                    model="gemini-2.0-flash",
+                    contents=req.message,
+                    config={'system_instruction': system_instruction}
+                )
+            except Exception as e:
+                if is_rate_limit_error(e):
+                    slot.rate_limited(retry_delay_from(e))
+                raise
+            slot.succeeded()
         return ChatResponse(reply=response.text.strip())
     except Exception as e:
         logger.error(f"Chat error: {e}")
@@ -98,11 +119,13 @@ async def chat(
 
 @router.post("/{job_id}/quiz", response_model=QuizResult)
 async def submit_quiz(job_id: str, sub: QuizSubmission) -> QuizResult:
-    job = _JOB_STORE.get(job_id)
+    job = await await_study_materials(job_id)
     if not job or not job.script:
         raise HTTPException(status_code=404, detail="Podcast not found.")
 
     questions = job.script.quiz_questions
+    if not questions:
+        raise HTTPException(status_code=503, detail="Quiz not available.")
     score = sum(1 for q, ans in zip(questions, sub.answers) if ans == q.correct_index)
     _USER_SCORE[job_id] = _USER_SCORE.get(job_id, 0) + score
 
@@ -0,0 +1,116 @@
+"""
+services/block_store.py — Columnar storage for the text blocks of a parsed PDF.
+
+Instead of one dict per block, a BlockStore keeps NumPy columns (page, font
+size, vertical position, flags) and a single text buffer. Every block's text is followed by one
+space in the buffer, so the " "-joined text of any contiguous block range is a
+single slice — which is exactly what section bodies are.
+"""
+from __future__ import annotations
+
+from typing import Iterable
+
+import numpy as np
+
+FLAG_BOLD    = np.uint8(1)
+FLAG_HEADING = np.uint8(2)
+
+# One page's blocks as parallel lists: (texts, font sizes, bold flags, y positions)
+PageBlocks = tuple[list[str], list[float], list[bool], list[float]]
+
+
+class BlockStore:
+    """Text blocks in reading order, stored column-wise."""
+
+    __slots__ = ("page", "size", "ypos", "flags", "offsets", "text")
+
+    def __init__(
+        self,
+        page:    np.ndarray,
+        size:    np.ndarray,
+        ypos:    np.ndarray,
+        flags:   np.ndarray,
+        offsets: np.ndarray,
+        text:    str,
+    ):
+        self.page    = page      # int32,   1-based page number
+        self.size    = size      # float64, max font size in the block
+        self.ypos    = ypos      # float32, block centre as a fraction of page height
+        self.flags   = flags     # uint8,   FLAG_* bits
+        self.offsets = offsets   # int64,   len(blocks) + 1 start offsets into `text`
+        self.text    = text
+
+    @classmethod
+    def from_pages(cls, pages: Iterable[tuple[int, PageBlocks]]) -> "BlockStore":
+        """Concatenate per-page block lists (in page order) into one store."""
+        page_col: list[int]   = []
+        size_col: list[float] = []
+        bold_col: list[bool]  = []
+        ypos_col: list[float] = []
+        texts:    list[str]   = []
+        for p_num, (page_texts, page_sizes, page_bold, page_ypos) in pages:
+            page_col.extend([p_num] * len(page_texts))
+            size_col.extend(page_sizes)
+            bold_col.extend(page_bold)
+            ypos_col.extend(page_ypos)
+            texts.extend(page_texts)
+
+        offsets = np.zeros(len(texts) + 1, dtype=np.int64)
+        np.cumsum(np.array([len(t) for t in texts], dtype=np.int64) + 1, out=offsets[1:])
+
+        flags = np.where(np.array(bold_col, dtype=bool), FLAG_BOLD, np.uint8(0)).astype(np.uint8)
+        return cls(
+            page    = np.array(page_col, dtype=np.int32),
+            size    = np.array(size_col, dtype=np.float64),
+            ypos    = np.array(ypos_col, dtype=np.float32),
+            flags   = flags,
+            offsets = offsets,
+            text    = " ".join(texts) + " " if texts else "",
+        )
+
+    def __len__(self) -> int:
+        return len(self.page)
+
+    @property
+    def lengths(self) -> np.ndarray:
+        """Character length of each block's text."""
+        return np.diff(self.offsets) - 1
+
+    @property
+    def is_bold(self) -> np.ndarray:
+        return (self.flags & FLAG_BOLD).astype(bool)
+
+    @property
+    def is_heading(self) -> np.ndarray:
+        return (self.flags & FLAG_HEADING).astype(bool)
+
+    def text_at(self, i: int) -> str:
+        return self.text[self.offsets[i]:self.offsets[i + 1] - 1]
+
+    def texts_at(self, indices) -> list[str]:
+        """Texts of many blocks at once (avoids per-item NumPy scalar access)."""
+        offsets = self.offsets
+        starts  = offsets[indices].tolist()
+        ends    = (offsets[np.asarray(indices, dtype=np.int64) + 1] - 1).tolist()
+        return [self.text[a:b] for a, b in zip(starts, ends)]
+
+    def select(self, keep: np.ndarray) -> "BlockStore":
+        """New store with only the blocks where the boolean mask `keep` is set."""
+        kept    = np.flatnonzero(keep)
+        texts   = self.texts_at(kept)
+        offsets = np.zeros(len(texts) + 1, dtype=np.int64)
+        np.cumsum(self.lengths[kept] + 1, out=offsets[1:])
+        return BlockStore(
+            page    = self.page[kept],
+            size    = self.size[kept],
+            ypos    = self.ypos[kept],
+            flags   = self.flags[kept],
+            offsets = offsets,
+            text    = " ".join(texts) + " " if texts else "",
+        )
+
+    def join(self, lo: int, hi: int) -> str:
+        """Space-joined text of blocks [lo, hi)."""
+        if hi <= lo:
+            return ""
+        return self.text[self.offsets[lo]:self.offsets[hi] - 1]
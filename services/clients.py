@@ -0,0 +1,131 @@
+"""
+services/clients.py — App-scoped HTTP and Gemini clients with pooled connections.
+
+Clients are created once in the FastAPI lifespan (main.py) and shared by every
+request and background job, so TLS sessions and keep-alive connections are
+reused. Outside the app (scripts, tests) they are created lazily on first use.
+"""
+from __future__ import annotations
+
+import importlib.util
+import logging
+from typing import Optional
+
+import httpx
+from google import genai
+from google.genai import types
+
+from config import get_settings
+
+logger = logging.getLogger(__name__)
+
+_GEMINI_HTTP:     Optional[httpx.AsyncClient] = None
+_ELEVENLABS_HTTP: Optional[httpx.AsyncClient] = None
+_LLM_HTTP:        Optional[httpx.AsyncClient] = None
+_GENAI:           Optional[genai.Client]      = None
+
+# HTTP/2 needs the optional `h2` package; fall back to HTTP/1.1 keep-alive without it
+_HAS_H2 = importlib.util.find_spec("h2") is not None
+
+
+def _new_http_client(max_connections: int, timeout: float) -> httpx.AsyncClient:
+    settings = get_settings()
+    limits   = httpx.Limits(
+        max_connections           = max_connections,
+        max_keepalive_connections = max_connections,
+        keepalive_expiry          = settings.http_keepalive_seconds,
+    )
+    return httpx.AsyncClient(
+        limits  = limits,
+        timeout = timeout,
+        http2   = settings.http2_enabled and _HAS_H2,
+    )
+
+
+def get_gemini_http() -> httpx.AsyncClient:
+    global _GEMINI_HTTP
+    if _GEMINI_HTTP is None:
+        _GEMINI_HTTP = _new_http_client(get_settings().gemini_pool_size, timeout=120.0)
+    return _GEMINI_HTTP
+
+
+def get_elevenlabs_http() -> httpx.AsyncClient:
+    global _ELEVENLABS_HTTP
+    if _ELEVENLABS_HTTP is None:
+        _ELEVENLABS_HTTP = _new_http_client(get_settings().elevenlabs_pool_size, timeout=90.0)
+    return _ELEVENLABS_HTTP
+
+
+def get_llm_http() -> httpx.AsyncClient:
+    """Pool shared by the OpenAI, Anthropic and OpenRouter providers."""
+    global _LLM_HTTP
+    if _LLM_HTTP is None:
+        _LLM_HTTP = _new_http_client(get_settings().llm_pool_size, timeout=120.0)
+    return _LLM_HTTP
+
+
+def get_genai_client() -> genai.Client:
+    """Shared Gemini client whose async calls go through the pooled httpx client."""
+    global _GENAI
+    if _GENAI is None:
+        _GENAI = genai.Client(
+            api_key      = get_settings().google_api_key,
+            http_options = types.HttpOptions(httpx_async_client=get_gemini_http()),
+        )
+    return _GENAI
+
+
+# ── Lifespan ──────────────────────────────────────────────────────────────────
+
+async def startup_clients() -> None:
+    settings = get_settings()
+    get_elevenlabs_http()
+    if settings.google_api_key:
+        get_genai_client()
+    else:
+        get_gemini_http()
+    logger.info(
+        f"HTTP pools ready: gemini={settings.gemini_pool_size}, "
+        f"elevenlabs={settings.elevenlabs_pool_size}, http2={settings.http2_enabled and _HAS_H2}"
+    )
+
+
+async def shutdown_clients() -> None:
+    global _GEMINI_HTTP, _ELEVENLABS_HTTP, _LLM_HTTP, _GENAI
+    genai_client, _GENAI = _GENAI, None
+    if genai_client is not None:
+        await genai_client.aio.aclose()   # leaves the injected httpx client open
+        genai_client.close()
+    for client in (_GEMINI_HTTP, _ELEVENLABS_HTTP, _LLM_HTTP):
+        if client is not None:
+            await client.aclose()
+    _GEMINI_HTTP = _ELEVENLABS_HTTP = _LLM_HTTP = None
+
+
+# ── Metrics ───────────────────────────────────────────────────────────────────
+
+def _pool_stats(client: Optional[httpx.AsyncClient]) -> Optional[dict]:
+    if client is None:
+        return None
+    pool = getattr(client._transport, "_pool", None)
+    if pool is None:
+        return None
+    connections = list(pool.connections)
+    requests    = list(getattr(pool, "_requests", []))
+    idle        = sum(1 for c in connections if c.is_idle())
+    return {
+        "max_connections": pool._max_connections,
+        "open":            len(connections),
+        "idle":            idle,
+        "active":          len(connections) - idle,
+        "queued":          sum(1 for r in requests if r.is_queued()),
+        "http2":           pool._http2,
+    }
+
+
+def client_pool_stats() -> dict:
+    return {
+        "gemini":     _pool_stats(_GEMINI_HTTP),
+        "elevenlabs": _pool_stats(_ELEVENLABS_HTTP),
+        "llm":        _pool_stats(_LLM_HTTP),
+    }
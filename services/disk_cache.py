@@ -0,0 +1,169 @@
+"""
+services/disk_cache.py — Size-bounded LRU file cache shared between jobs and workers.
+
+Each entry is a single file in the cache directory. Reads bump the file's
+mtime so it doubles as the LRU clock; writes go to a temp file and are moved
+into place with os.replace, so concurrent readers never see a partial entry.
+Eviction trims to a low-water mark below the budget, so a full cache is
+rescanned once per batch of writes rather than on every write.
+"""
+from __future__ import annotations
+
+import logging
+import os
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+_TMP_MARKER = ".tmp-"
+_LOW_WATER  = 0.9        # eviction trims the cache to this fraction of max_bytes
+
+
+class DiskCache:
+    """LRU cache of named files in `directory`, bounded to `max_bytes` on disk."""
+
+    def __init__(self, directory: Path, max_bytes: int):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+        self.hits      = 0
+        self.misses    = 0
+        self.evictions = 0
+        self._lock     = threading.Lock()
+        self._approx_bytes: Optional[int] = None   # lazily measured on first write
+
+    # ── Reads ─────────────────────────────────────────────────────────────────
+
+    def path_for(self, name: str) -> Path:
+        return self.directory / name
+
+    def read_bytes(self, name: str, record: bool = True) -> Optional[bytes]:
+        """
+        Return the entry's bytes (and mark it recently used), or None on a miss.
+        Pass record=False when the caller decides hit/miss itself (e.g. TTL checks).
+        """
+        path = self.path_for(name)
+        try:
+            data = path.read_bytes()
+        except FileNotFoundError:
+            if record:
+                self.record(hit=False)
+            return None
+        self._touch(path)
+        if record:
+            self.record(hit=True)
+        return data
+
+    def contains(self, name: str) -> bool:
+        return self.path_for(name).exists()
+
+    def touch(self, name: str) -> None:
+        """Mark an entry recently used without reading it."""
+        self._touch(self.path_for(name))
+
+    # ── Writes ────────────────────────────────────────────────────────────────
+
+    def write_bytes(self, name: str, data: bytes) -> Path:
+        """Atomically write an entry, then evict least-recently-used files if over budget."""
+        path = self.path_for(name)
+        tmp  = self.directory / f"{name}{_TMP_MARKER}{uuid.uuid4().hex}"
+        try:
+            replaced = path.stat().st_size
+        except FileNotFoundError:
+            replaced = 0
+        try:
+            tmp.write_bytes(data)
+            self._touch(tmp)
+            os.replace(tmp, path)
+        finally:
+            tmp.unlink(missing_ok=True)
+
+        with self._lock:
+            if self._approx_bytes is not None:
+                self._approx_bytes += len(data) - replaced
+            over = self._approx_bytes is None or self._approx_bytes > self.max_bytes
+        if over:
+            self.evict()
+        return path
+
+    def remove(self, name: str) -> None:
+        try:
+            size = self.path_for(name).stat().st_size
+            os.remove(self.path_for(name))
+        except FileNotFoundError:
+            return
+        with self._lock:
+            if self._approx_bytes is not None:
+                self._approx_bytes -= size
+
+    def evict(self) -> int:
+        """
+        Delete the oldest entries, when the directory is over max_bytes, until
+        it is back under the low-water mark. Re-measures the running total.
+        """
+        entries = []
+        total   = 0
+        for entry in os.scandir(self.directory):
+            if not entry.is_file() or _TMP_MARKER in entry.name:
+                continue
+            try:
+                st = entry.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((st.st_mtime, st.st_size, entry.path))
+            total += st.st_size
+
+        removed = 0
+        if total > self.max_bytes:
+            target = int(self.max_bytes * _LOW_WATER)
+            for _, size, path in sorted(entries):
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                total   -= size
+                removed += 1
+                if total <= target:
+                    break
+            logger.info(f"Disk cache {self.directory}: evicted {removed} entries")
+
+        with self._lock:
+            self._approx_bytes = total
+            self.evictions    += removed
+        return removed
+
+    # ── Metrics ───────────────────────────────────────────────────────────────
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits":      self.hits,
+                "misses":    self.misses,
+                "hit_rate":  round(self.hits / lookups, 3) if lookups else 0.0,
+                "evictions": self.evictions,
+                "bytes":     self._approx_bytes,
+                "max_bytes": self.max_bytes,
+            }
+
+    def record(self, hit: bool) -> None:
+        """Count a lookup; callers that probe with contains() record their own misses."""
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    @staticmethod
+    def _touch(path: Path) -> None:
+        # Explicit timestamps: filesystem clocks can be too coarse to order reads
+        now = time.time_ns()
+        try:
+            os.utime(path, ns=(now, now))
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,92 @@
+"""
+services/doc_codec.py — Compact binary encoding for cached ParsedDocuments.
+
+The JSON dump of a ParsedDocument stores every section body twice (once in
+`sections`, once in `raw_text`) and must be fully re-validated on load. This
+format stores the section text once, as a single UTF-8 blob, with the section
+fields kept column-wise in a small JSON header; the payload is zlib
+compressed unless disabled. Loading skips Pydantic validation (the bytes were
+produced from a validated document) and `raw_text` is rebuilt from the
+sections on first use.
+
+Layout:  MAGIC | flags | [zlib]( u32 header length | header JSON | section text blob )
+"""
+from __future__ import annotations
+
+import json
+import struct
+import zlib
+from pathlib import Path
+
+from models.schemas import ParseMode, ParsedDocument, ParsedSection
+
+MAGIC     = b"P2PD\x01"
+_HEADER   = struct.Struct("<I")
+_ZLIB     = 0x01
+_LEVEL    = 1   # zlib level: higher levels cost 2x the write time for ~7% smaller files
+
+# Scalar ParsedSection fields stored as header columns (body goes in the blob)
+_SECTION_COLUMNS = ("title", "page_start", "page_end", "has_tables", "has_equations")
+
+
+def encode_document(doc: ParsedDocument, compress: bool = True) -> bytes:
+    """Serialise a document (without its table index) to the compact format."""
+    sections = doc.sections
+    bodies   = [s.body for s in sections]
+    fields   = doc.model_dump(mode="json", exclude={"sections", "raw_text", "tables"})
+
+    header = {
+        "doc":      fields,
+        "sections": {col: [getattr(s, col) for s in sections] for col in _SECTION_COLUMNS},
+        "lengths":  [len(b) for b in bodies],
+        # Only documents whose raw_text is not the joined section bodies keep a copy
+        "raw_text": None if doc.raw_text == "\n\n".join(bodies) else doc.raw_text,
+    }
+    header_bytes = json.dumps(header, separators=(",", ":")).encode("utf-8")
+    payload = _HEADER.pack(len(header_bytes)) + header_bytes + "".join(bodies).encode("utf-8")
+    if compress:
+        return MAGIC + bytes([_ZLIB]) + zlib.compress(payload, _LEVEL)
+    return MAGIC + bytes([0]) + payload
+
+
+def decode_document(data: bytes) -> ParsedDocument:
+    """Inverse of encode_document. Constructs models without re-validation."""
+    if not data.startswith(MAGIC):
+        raise ValueError("Not a compact parsed-document payload")
+    flags    = data[len(MAGIC)]
+    payload  = memoryview(data)[len(MAGIC) + 1:]
+    if flags & _ZLIB:
+        payload = memoryview(zlib.decompress(payload))
+    (size,)  = _HEADER.unpack_from(payload)
+    start    = _HEADER.size
+    header   = json.loads(bytes(payload[start:start + size]))
+    blob     = str(payload[start + size:], "utf-8")
+
+    cols     = header["sections"]
+    sections = []
+    offset   = 0
+    for i, length in enumerate(header["lengths"]):
+        sections.append(ParsedSection.model_construct(
+            body = blob[offset:offset + length],
+            **{col: cols[col][i] for col in _SECTION_COLUMNS},
+        ))
+        offset += length
+
+    fields = header["doc"]
+    fields["parse_mode"] = ParseMode(fields["parse_mode"])
+    if header["raw_text"] is not None:
+        fields["raw_text"] = header["raw_text"]
+    # raw_text is derived from the sections on first access when omitted
+    return ParsedDocument.model_construct(sections=sections, **fields)
+
+
+def load_document(path: Path) -> ParsedDocument:
+    """Read a cached document in either the compact or the legacy JSON format."""
+    return read_document(path.read_bytes())
+
+
+def read_document(data: bytes) -> ParsedDocument:
+    """Decode cached document bytes, sniffing the format from the magic prefix."""
+    if data.startswith(MAGIC):
+        return decode_document(data)
+    return ParsedDocument.model_validate_json(data)
@@ -0,0 +1,73 @@
+"""
+services/json_stream.py — Incremental parsing of a streamed JSON array of objects.
+
+LLM responses arrive in arbitrary text chunks. IncrementalArrayParser scans each
+chunk once, tracking string/escape state and nesting depth, and returns every
+top-level array element object as soon as its closing brace arrives — without
+waiting for the rest of the array. Anything before the first "[" (e.g. a
+```json fence) is ignored.
+"""
+from __future__ import annotations
+
+import json
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class IncrementalArrayParser:
+    """Feed text chunks; get back the array's completed objects as they close."""
+
+    def __init__(self):
+        self._buf       = []      # characters of the object currently being read
+        self._depth     = 0       # 0 = before the array, 1 = inside it, 2+ = inside an element
+        self._in_string = False
+        self._escaped   = False
+        self.done       = False   # the closing "]" has been seen
+        self.skipped    = 0       # elements that were not valid JSON objects
+
+    def feed(self, chunk: str) -> list[dict]:
+        items: list[dict] = []
+        for ch in chunk:
+            if self.done:
+                break
+            depth = self._depth
+            if depth >= 2:
+                self._buf.append(ch)
+                if self._in_string:
+                    if self._escaped:
+                        self._escaped = False
+                    elif ch == "\\":
+                        self._escaped = True
+                    elif ch == '"':
+                        self._in_string = False
+                elif ch == '"':
+                    self._in_string = True
+                elif ch in "{[":
+                    self._depth += 1
+                elif ch in "}]":
+                    self._depth -= 1
+                    if self._depth == 1:
+                        self._emit(items)
+            elif depth == 1:
+                if ch == "{":
+                    self._buf   = [ch]
+                    self._depth = 2
+                elif ch == "]":
+                    self.done = True
+            elif ch == "[":
+                self._depth = 1
+        return items
+
+    def _emit(self, items: list[dict]) -> None:
+        text, self._buf = "".join(self._buf), []
+        try:
+            value = json.loads(text)
+        except json.JSONDecodeError as e:
+            self.skipped += 1
+            logger.warning(f"Skipping malformed streamed element: {e} | snippet: {text[:120]}")
+            return
+        if isinstance(value, dict):
+            items.append(value)
+        else:
+            self.skipped += 1
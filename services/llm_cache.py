@@ -0,0 +1,66 @@
+"""
+services/llm_cache.py — Persistent cache of LLM responses.
+
+Entries are keyed by a hash of (model, prompt, generation config), so a retried
+job or a re-generated paper reuses earlier answers instead of calling the API.
+Each entry records when it was written; entries older than the TTL count as
+misses and are removed. Size is bounded by the LRU eviction of DiskCache.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import time
+from functools import lru_cache
+from typing import Optional
+
+from config import get_settings
+from services.disk_cache import DiskCache
+
+logger = logging.getLogger(__name__)
+
+
+def response_key(model: str, prompt: str, config: dict) -> str:
+    payload = json.dumps({"model": model, "prompt": prompt, "config": config}, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class LLMCache:
+    """Disk-backed response cache with TTL expiry and size-bounded LRU eviction."""
+
+    def __init__(self, directory, max_bytes: int, ttl_seconds: float):
+        self.store       = DiskCache(directory, max_bytes)
+        self.ttl_seconds = ttl_seconds
+
+    def get(self, key: str) -> Optional[str]:
+        name = f"{key}.json"
+        data = self.store.read_bytes(name, record=False)
+        if data is not None:
+            entry = json.loads(data)
+            if time.time() - entry["created"] <= self.ttl_seconds:
+                self.store.record(hit=True)
+                return entry["text"]
+            self.store.remove(name)
+        self.store.record(hit=False)
+        return None
+
+    def put(self, key: str, text: str) -> None:
+        entry = {"created": time.time(), "text": text}
+        self.store.write_bytes(f"{key}.json", json.dumps(entry).encode("utf-8"))
+
+    def remove(self, key: str) -> None:
+        self.store.remove(f"{key}.json")
+
+    def stats(self) -> dict:
+        return {**self.store.stats(), "ttl_seconds": self.ttl_seconds}
+
+
+@lru_cache
+def get_llm_cache() -> LLMCache:
+    settings = get_settings()
+    return LLMCache(
+        settings.llm_cache_dir,
+        max_bytes   = settings.llm_cache_max_mb * 1024 * 1024,
+        ttl_seconds = settings.llm_cache_ttl_hours * 3600,
+    )
@@ -0,0 +1,516 @@
+"""
+services/llm_providers.py — LLM providers behind one latency-aware router.
+
+Each provider (Gemini, OpenAI, Anthropic, OpenRouter) is enabled by its API key
+and keeps a rolling window of recent call latencies; the offline "local"
+stand-in is enabled by listing it in LLM_PROVIDERS. The router sends a prompt
+to the healthy provider with the lowest median latency. If that call is still
+running after the provider's recent p95, a duplicate (hedged) request goes to
+the next provider and whichever answers first wins; the other is cancelled.
+A failing provider cools down for a growing interval and the request falls
+over to the next one.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, Callable, Optional
+
+import httpx
+from google.genai import types
+
+from config import get_settings
+from services.clients import get_llm_http
+from services.local_llm import get_local_client
+from services.rate_limiter import estimate_tokens, get_gemini_limiter, is_rate_limit_error, retry_delay_from
+
+logger = logging.getLogger(__name__)
+
+_MIN_SAMPLES   = 5       # latencies needed before a provider's p50/p95 are trusted
+_COOLDOWN_BASE = 5.0     # seconds; doubled per consecutive failure
+_COOLDOWN_MAX  = 120.0
+
+
+class ProviderRateLimited(RuntimeError):
+    """A provider answered 429; `retry_after` is its hint in seconds, if any."""
+
+    def __init__(self, message: str, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+@dataclass
+class Completion:
+    """A provider's answer plus the token usage it reported (None when it did not)."""
+    text:          str
+    provider:      str           = ""
+    prompt_tokens: Optional[int] = None
+    output_tokens: Optional[int] = None
+    cached_tokens: int           = 0     # prompt tokens served from a provider-side context cache
+
+
+def gemini_usage(usage_metadata) -> tuple[Optional[int], Optional[int], int]:
+    """(prompt, output, cached) token counts from a Gemini usage_metadata object."""
+    return (
+        getattr(usage_metadata, "prompt_token_count", None),
+        getattr(usage_metadata, "candidates_token_count", None),
+        getattr(usage_metadata, "cached_content_token_count", None) or 0,
+    )
+
+
+@dataclass
+class SharedContext:
+    """
+    Document context shared by several prompts of one run. When `cache_name`
+    is set, `provider` holds the text in a server-side context cache and
+    prompts sent to it only reference the cache; every other provider (and
+    every provider when caching is unavailable) gets the text inline.
+    """
+    text:       str
+    cache_name: Optional[str] = None
+    provider:   Optional["LLMProvider"] = None
+
+    def inline(self, prompt: str) -> str:
+        return f"{self.text}\n\n{prompt}"
+
+
+class LatencyWindow:
+    """The last `size` successful call latencies of one provider."""
+
+    def __init__(self, size: int):
+        self.samples: deque[float] = deque(maxlen=size)
+
+    def add(self, seconds: float) -> None:
+        self.samples.append(seconds)
+
+    def percentile(self, q: float) -> Optional[float]:
+        if len(self.samples) < _MIN_SAMPLES:
+            return None
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+# ── Providers ─────────────────────────────────────────────────────────────────
+
+class LLMProvider:
+    """One LLM backend plus its health and latency record."""
+
+    name = ""
+
+    def __init__(self, window: int):
+        self.latency        = LatencyWindow(window)
+        self.calls          = 0
+        self.failures       = 0
+        self.cooldown_until = 0.0
+        self._consecutive   = 0
+
+    @property
+    def configured(self) -> bool:
+        raise NotImplementedError
+
+    async def generate(self, prompt: str, config: dict, context: Optional[SharedContext] = None) -> Completion:
+        raise NotImplementedError
+
+    def healthy(self) -> bool:
+        return self.configured and time.monotonic() >= self.cooldown_until
+
+    def record_success(self, seconds: float) -> None:
+        self.calls        += 1
+        self._consecutive  = 0
+        self.latency.add(seconds)
+
+    def record_failure(self, error: Exception) -> None:
+        self.calls        += 1
+        self.failures     += 1
+        self._consecutive += 1
+        delay = getattr(error, "retry_after", None) or min(
+            _COOLDOWN_MAX, _COOLDOWN_BASE * 2 ** (self._consecutive - 1)
+        )
+        self.cooldown_until = time.monotonic() + delay
+        logger.warning(f"LLM provider {self.name} failed ({error}); cooling down {delay:.0f}s")
+
+    def stats(self) -> dict:
+        p50, p95 = self.latency.percentile(0.5), self.latency.percentile(0.95)
+        return {
+            "configured": self.configured,
+            "healthy":    self.healthy(),
+            "calls":      self.calls,
+            "failures":   self.failures,
+            "p50_s":      round(p50, 2) if p50 is not None else None,
+            "p95_s":      round(p95, 2) if p95 is not None else None,
+            "cooldown_s": round(max(0.0, self.cooldown_until - time.monotonic()), 2),
+        }
+
+
+class GeminiProvider(LLMProvider):
+    """Gemini through the shared genai client and the process-wide limiter."""
+
+    name = "gemini"
+
+    def __init__(self, client_factory: Callable[[], Any], model: str, window: int, retries: int = 4):
+        super().__init__(window)
+        self.client_factory = client_factory
+        self.model          = model
+        self.retries        = retries
+
+    @property
+    def configured(self) -> bool:
+        return bool(get_settings().google_api_key)
+
+    def request(
+        self,
+        prompt:  str,
+        config:  dict,
+        context: Optional[SharedContext],
+    ) -> tuple[str, types.GenerateContentConfig]:
+        """(contents, config) for one call: the context by cache reference when this provider holds it."""
+        if context is not None and context.cache_name and context.provider is self:
+            return prompt, types.GenerateContentConfig(**config, cached_content=context.cache_name)
+        return (context.inline(prompt) if context else prompt), types.GenerateContentConfig(**config)
+
+    async def create_cache(self, text: str, ttl_s: int, display_name: str) -> Optional[str]:
+        """Register `text` as a cached context; None when caching is unavailable."""
+        try:
+            cache = await self.client_factory().aio.caches.create(
+                model  = self.model,
+                config = types.CreateCachedContentConfig(
+                    contents     = [text],
+                    ttl          = f"{ttl_s}s",
+                    display_name = display_name,
+                ),
+            )
+        except Exception as e:
+            logger.info(f"Context caching unavailable on {self.name} ({e}); sending the context inline")
+            return None
+        return cache.name
+
+    async def delete_cache(self, name: str) -> None:
+        try:
+            await self.client_factory().aio.caches.delete(name=name)
+        except Exception as e:
+            logger.warning(f"Could not delete cached context {name}: {e}")   # expires with its TTL
+
+    async def generate(self, prompt: str, config: dict, context: Optional[SharedContext] = None) -> Completion:
+        contents, gen_config = self.request(prompt, config, context)
+        client  = self.client_factory()
+        limiter = get_gemini_limiter()
+        for attempt in range(self.retries):
+            # The shared limiter spaces out retries (server delay + jitter) for every caller
+            async with limiter.slot(estimate_tokens(contents)) as slot:
+                try:
+                    response = await client.aio.models.generate_content(
+                        model    = self.model,
+                        contents = contents,
+                        config   = gen_config,
+                    )
+                except Exception as e:
+                    if not is_rate_limit_error(e):
+                        logger.error(f"Gemini error: {e}")
+                        raise RuntimeError(f"Gemini generation failed: {e}")
+                    logger.warning(f"Rate limit hit (attempt {attempt+1}/{self.retries}).")
+                    slot.rate_limited(retry_delay_from(e))
+                    continue
+                usage = getattr(response, "usage_metadata", None)
+                slot.succeeded(getattr(usage, "total_token_count", None))
+            return Completion(response.text.strip(), self.name, *gemini_usage(usage))
+        raise RuntimeError("Gemini rate limit exceeded after all retries.")
+
+
+class LocalProvider(GeminiProvider):
+    """Offline Gemini stand-in (services/local_llm.py) for load tests; always configured."""
+
+    name = "local"
+
+    def __init__(self, window: int):
+        super().__init__(get_local_client, "local", window)
+
+    @property
+    def configured(self) -> bool:
+        return True
+
+
+class HTTPProvider(LLMProvider):
+    """A provider reached with one JSON POST per prompt."""
+
+    key_field   = ""
+    model_field = ""
+
+    @property
+    def configured(self) -> bool:
+        return bool(getattr(get_settings(), self.key_field))
+
+    def _request(self, prompt: str, config: dict) -> tuple[str, dict, dict]:
+        """(url, headers, body) for one completion."""
+        raise NotImplementedError
+
+    def _text(self, data: dict) -> str:
+        raise NotImplementedError
+
+    def _usage(self, data: dict) -> tuple[Optional[int], Optional[int]]:
+        return None, None
+
+    def _parse(self, response) -> Completion:
+        if response.status_code == 429:
+            headers = getattr(response, "headers", None) or {}
+            try:
+                retry_after = float(headers.get("retry-after"))
+            except (TypeError, ValueError):
+                retry_after = None
+            raise ProviderRateLimited(f"{self.name} rate limit exceeded (HTTP 429)", retry_after)
+        if response.status_code >= 400:
+            raise RuntimeError(f"{self.name} request failed: HTTP {response.status_code} {response.text[:200]}")
+        try:
+            data = response.json()
+            return Completion(self._text(data).strip(), self.name, *self._usage(data))
+        except (KeyError, IndexError, TypeError, ValueError) as e:
+            raise RuntimeError(f"{self.name} returned an unexpected response: {e}")
+
+    async def generate(self, prompt: str, config: dict, context: Optional[SharedContext] = None) -> Completion:
+        url, headers, body = self._request(context.inline(prompt) if context else prompt, config)
+        response = await get_llm_http().post(url, headers=headers, json=body)
+        return self._parse(response)
+
+    def complete_sync(self, prompt: str, config: Optional[dict] = None, timeout: float = 60.0) -> str:
+        """Blocking variant of generate for callers outside the event loop."""
+        url, headers, body = self._request(prompt, config or {})
+        response = httpx.post(url, headers=headers, json=body, timeout=timeout)
+        return self._parse(response).text
+
+
+class OpenAICompatibleProvider(HTTPProvider):
+    """Chat-completions API (OpenAI itself, or OpenRouter at another base URL)."""
+
+    def __init__(self, name: str, base_url: str, key_field: str, model_field: str, window: int):
+        super().__init__(window)
+        self.name        = name
+        self.base_url    = base_url
+        self.key_field   = key_field
+        self.model_field = model_field
+
+    def _request(self, prompt: str, config: dict) -> tuple[str, dict, dict]:
+        settings = get_settings()
+        body = {
+            "model":    getattr(settings, self.model_field),
+            "messages": [{"role": "user", "content": prompt}],
+        }
+        if "temperature" in config:
+            body["temperature"] = config["temperature"]
+        # Structured outputs only accept an object root; array answers (dialogue)
+        # rely on the prompt and the caller's validation instead
+        schema = config.get("response_json_schema")
+        if schema and schema.get("type") == "object":
+            body["response_format"] = {
+                "type":        "json_schema",
+                "json_schema": {"name": "response", "schema": schema},
+            }
+        headers = {"Authorization": f"Bearer {getattr(settings, self.key_field)}"}
+        return f"{self.base_url}/chat/completions", headers, body
+
+    def _text(self, data: dict) -> str:
+        return data["choices"][0]["message"]["content"]
+
+    def _usage(self, data: dict) -> tuple[Optional[int], Optional[int]]:
+        usage = data.get("usage") or {}
+        return usage.get("prompt_tokens"), usage.get("completion_tokens")
+
+
+class AnthropicProvider(HTTPProvider):
+    """Anthropic Messages API."""
+
+    name        = "anthropic"
+    key_field   = "anthropic_api_key"
+    model_field = "anthropic_model"
+    url         = "https://api.anthropic.com/v1/messages"
+
+    def _request(self, prompt: str, config: dict) -> tuple[str, dict, dict]:
+        settings = get_settings()
+        body = {
+            "model":      settings.anthropic_model,
+            "max_tokens": 8192,
+            "messages":   [{"role": "user", "content": prompt}],
+        }
+        if "temperature" in config:
+            body["temperature"] = config["temperature"]
+        headers = {"x-api-key": settings.anthropic_api_key, "anthropic-version": "2023-06-01"}
+        return self.url, headers, body
+
+    def _text(self, data: dict) -> str:
+        return "".join(block.get("text", "") for block in data["content"] if block.get("type") == "text")
+
+    def _usage(self, data: dict) -> tuple[Optional[int], Optional[int]]:
+        usage = data.get("usage") or {}
+        return usage.get("input_tokens"), usage.get("output_tokens")
+
+
+# ── Router ────────────────────────────────────────────────────────────────────
+
+class LLMRouter:
+    """Routes each prompt to the fastest healthy provider, hedging slow calls."""
+
+    def __init__(
+        self,
+        providers:     list[LLMProvider],
+        hedging:       bool  = True,
+        hedge_after_s: float = 30.0,
+        max_hedges:    int   = 2,
+    ):
+        self.providers        = providers
+        self.hedging          = hedging
+        self.hedge_after_s    = hedge_after_s
+        self.max_hedges       = max_hedges
+        self.hedges           = 0
+        self.hedge_wins       = 0
+        self.hedges_in_flight = 0
+
+    def provider(self, name: str) -> Optional[LLMProvider]:
+        return next((p for p in self.providers if p.name == name), None)
+
+    def configured(self) -> list[LLMProvider]:
+        return [p for p in self.providers if p.configured]
+
+    def ranked(self) -> list[LLMProvider]:
+        """Healthy providers, measured ones by median latency, then the rest in preference order."""
+        healthy = [p for p in self.providers if p.healthy()]
+        if not healthy:
+            # Everyone is cooling down: try whoever recovers first rather than failing outright
+            return sorted(self.configured(), key=lambda p: p.cooldown_until)
+
+        def key(p: LLMProvider) -> tuple:
+            p50 = p.latency.percentile(0.5)
+            return (p50 is None, p50 or 0.0)
+        return sorted(healthy, key=key)
+
+    async def open_context(self, text: str, ttl_s: int, min_tokens: int, display_name: str) -> SharedContext:
+        """
+        Shared context for a run, cached on the provider currently ranked first
+        when it supports caching and the text is large enough to be accepted.
+        """
+        ranked  = self.ranked()
+        primary = ranked[0] if ranked else None
+        if isinstance(primary, GeminiProvider) and estimate_tokens(text) >= min_tokens:
+            name = await primary.create_cache(text, ttl_s, display_name)
+            if name:
+                logger.info(f"Cached {estimate_tokens(text)}-token shared context on {primary.name} as {name}")
+                return SharedContext(text, name, primary)
+        return SharedContext(text)
+
+    async def close_context(self, context: SharedContext) -> None:
+        if context.cache_name and isinstance(context.provider, GeminiProvider):
+            await context.provider.delete_cache(context.cache_name)
+
+    async def generate(self, prompt: str, config: dict, context: Optional[SharedContext] = None) -> Completion:
+        candidates = self.ranked()
+        if not candidates:
+            raise RuntimeError("No LLM provider configured.")
+        last_error: Optional[Exception] = None
+        while candidates:
+            primary = candidates.pop(0)
+            try:
+                return await self._race(primary, candidates, prompt, config, context)
+            except Exception as e:
+                last_error = e
+                if candidates:
+                    logger.warning(f"{primary.name} failed; falling over to {candidates[0].name}")
+        raise last_error
+
+    def _hedge_delay(self, provider: LLMProvider) -> Optional[float]:
+        if not self.hedging or self.hedges_in_flight >= self.max_hedges:
+            return None
+        p95 = provider.latency.percentile(0.95)
+        return p95 if p95 is not None else self.hedge_after_s
+
+    async def _race(
+        self,
+        primary: LLMProvider,
+        backups: list[LLMProvider],
+        prompt:  str,
+        config:  dict,
+        context: Optional[SharedContext] = None,
+    ) -> Completion:
+        """Run `primary`; past its p95, hedge with the first backup (which is then consumed)."""
+        tasks = [asyncio.create_task(self._call(primary, prompt, config, context))]
+        try:
+            delay = self._hedge_delay(primary) if backups else None
+            if delay is None:
+                return await tasks[0]
+            done, _ = await asyncio.wait(tasks, timeout=delay)
+            if done or self.hedges_in_flight >= self.max_hedges:
+                return await tasks[0]
+
+            backup = backups.pop(0)
+            logger.info(f"{primary.name} slower than {delay:.1f}s; hedging with {backup.name}")
+            self.hedges           += 1
+            self.hedges_in_flight += 1
+            try:
+                tasks.append(asyncio.create_task(self._call(backup, prompt, config, context)))
+                pending = set(tasks)
+                while pending:
+                    done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                    for task in done:
+                        if task.exception() is None:
+                            if task is tasks[1]:
+                                self.hedge_wins += 1
+                            return task.result()
+                raise tasks[0].exception()
+            finally:
+                self.hedges_in_flight -= 1
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+    async def _call(
+        self,
+        provider: LLMProvider,
+        prompt:   str,
+        config:   dict,
+        context:  Optional[SharedContext] = None,
+    ) -> Completion:
+        start = time.monotonic()
+        try:
+            completion = await provider.generate(prompt, config, context)
+        except Exception as e:
+            provider.record_failure(e)
+            raise
+        provider.record_success(time.monotonic() - start)
+        return completion
+
+    def stats(self) -> dict:
+        return {
+            "hedging":    self.hedging,
+            "hedges":     self.hedges,
+            "hedge_wins": self.hedge_wins,
+            "providers":  {p.name: p.stats() for p in self.providers},
+        }
+
+
+def build_router(gemini_client: Callable[[], Any], gemini_model: str) -> LLMRouter:
+    """Router over the providers named in settings.llm_providers, in that order."""
+    settings  = get_settings()
+    window    = settings.llm_latency_window
+    available = {
+        "gemini":     lambda: GeminiProvider(gemini_client, gemini_model, window),
+        "openai":     lambda: OpenAICompatibleProvider(
+            "openai", "https://api.openai.com/v1", "openai_api_key", "openai_model", window,
+        ),
+        "anthropic":  lambda: AnthropicProvider(window),
+        "openrouter": lambda: OpenAICompatibleProvider(
+            "openrouter", "https://openrouter.ai/api/v1", "openrouter_api_key", "openrouter_model", window,
+        ),
+        "local":      lambda: LocalProvider(window),
+    }
+    providers = []
+    for name in (n.strip() for n in settings.llm_providers.split(",")):
+        if name in available:
+            providers.append(available[name]())
+        elif name:
+            logger.warning(f"Unknown LLM provider '{name}' in LLM_PROVIDERS; ignoring it")
+    return LLMRouter(
+        providers,
+        hedging       = settings.llm_hedging,
+        hedge_after_s = settings.llm_hedge_after_s,
+        max_hedges    = settings.llm_hedge_max_inflight,
+    )
@@ -0,0 +1,160 @@
+"""
+services/local_llm.py — Offline stand-in for the Gemini client, for load tests.
+
+LocalGenAIClient mimics the parts of google-genai the generator uses
+(`aio.models.generate_content` and `generate_content_stream`) and answers
+without the network. Each prompt kind (chapter plan, part summary, chapter
+dialogue, study materials) is recognised from the JSON shape it asks for and
+gets a schema-correct answer whose content is derived deterministically from
+the prompt. Latency, jitter, error and 429 rates come from settings, so the
+limiter, retries, streaming, TTS and mixing can be exercised end to end.
+
+Select it with LLM_PROVIDERS=local.
+"""
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import random
+import re
+from types import SimpleNamespace
+from typing import AsyncIterator, Optional
+
+from config import get_settings
+
+_WORD_RE      = re.compile(r"[A-Za-z][A-Za-z-]{3,}")
+_CHAPTER_RE   = re.compile(r'^Chapter: "(.*)"$', re.MULTILINE)
+_COUNT_RE     = re.compile(r"Create (\d+) podcast chapters")
+_PART_RE      = re.compile(r"^\[(\d+)\]", re.MULTILINE)
+_STREAM_CHUNK = 48   # characters per streamed chunk
+
+# Prompt kind, recognised by a fragment of the JSON shape the prompt asks for
+_KINDS = (
+    ("study",    '"study_guide"'),
+    ("chapters", '"chapters"'),
+    ("summary",  '"summary"'),
+    ("dialogue", '"host"'),
+)
+
+
+class LocalLLMError(RuntimeError):
+    pass
+
+
+def prompt_kind(prompt: str) -> Optional[str]:
+    return next((kind for kind, marker in _KINDS if marker in prompt), None)
+
+
+def local_answer(prompt: str, seed: int = 0) -> str:
+    """Deterministic, schema-correct JSON answer for a generator prompt."""
+    digest = hashlib.sha256(f"{seed}:{prompt}".encode("utf-8")).digest()
+    rng    = random.Random(digest)
+    words  = list(dict.fromkeys(w.lower() for w in _WORD_RE.findall(prompt))) or ["paper"]
+
+    def pick(k: int) -> list[str]:
+        return [rng.choice(words) for _ in range(k)]
+
+    kind = prompt_kind(prompt)
+    if kind == "chapters":
+        m     = _COUNT_RE.search(prompt)
+        count = int(m.group(1)) if m else 3
+        parts = [int(n) for n in _PART_RE.findall(prompt)]
+        data  = {"chapters": []}
+        for i in range(count):
+            chapter = {
+                "id":       i + 1,
+                "title":    " ".join(pick(3)).title(),
+                "hook":     f"What does {' '.join(pick(2))} really tell us?",
+                "concepts": pick(3),
+            }
+            if parts:   # map-reduce planning: split the parts evenly, in order
+                chapter["parts"] = parts[i * len(parts) // count:(i + 1) * len(parts) // count]
+            data["chapters"].append(chapter)
+    elif kind == "summary":
+        data = {"summary": ". ".join(" ".join(pick(12)) for _ in range(3)) + ".", "key_points": pick(3)}
+    elif kind == "dialogue":
+        m     = _CHAPTER_RE.search(prompt)
+        title = m.group(1) if m else "this chapter"
+        data  = [
+            {"host": "AB"[i % 2], "text": f"{'So' if i % 2 == 0 else 'Well'}, on {title}: " + " ".join(pick(rng.randint(14, 30))) + "."}
+            for i in range(rng.randint(12, 15))
+        ]
+    elif kind == "study":
+        quiz = []
+        for _ in range(6):
+            options = [" ".join(pick(3)) for _ in range(4)]
+            quiz.append({
+                "question":      f"Which statement about {rng.choice(words)} is correct?",
+                "options":       options,
+                "correct_index": rng.randrange(len(options)),
+                "explanation":   " ".join(pick(12)) + ".",
+            })
+        guide = "# Research Summary\n\n" + "\n\n".join(" ".join(pick(40)) + "." for _ in range(4))
+        data  = {"study_guide": guide, "quiz": quiz}
+    else:
+        data = {"answer": " ".join(pick(20))}
+    return json.dumps(data)
+
+
+class _LocalModels:
+    """`client.aio.models` of the local client."""
+
+    def __init__(self, rng: random.Random):
+        self._rng = rng
+
+    async def _simulate(self, prompt: str) -> None:
+        settings = get_settings()
+        delay    = settings.local_llm_latency_s + self._rng.uniform(0, settings.local_llm_jitter_s)
+        await asyncio.sleep(delay)
+        roll = self._rng.random()
+        if roll < settings.local_llm_rate_limit_rate:
+            # Worded like a Gemini RESOURCE_EXHAUSTED error so the limiter sees the retry delay
+            raise LocalLLMError(
+                f"429 RESOURCE_EXHAUSTED (simulated). retryDelay: '{settings.local_llm_retry_delay_s}s'"
+            )
+        if roll < settings.local_llm_rate_limit_rate + settings.local_llm_error_rate:
+            raise LocalLLMError("500 INTERNAL (simulated local LLM error)")
+
+    def _response(self, text: str, prompt: str) -> SimpleNamespace:
+        usage = SimpleNamespace(
+            prompt_token_count     = len(prompt) // 4,
+            candidates_token_count = len(text) // 4,
+            total_token_count      = (len(prompt) + len(text)) // 4,
+        )
+        return SimpleNamespace(text=text, usage_metadata=usage)
+
+    async def generate_content(self, model: str, contents: str, config=None) -> SimpleNamespace:
+        await self._simulate(contents)
+        return self._response(local_answer(contents, get_settings().local_llm_seed), contents)
+
+    async def generate_content_stream(self, model: str, contents: str, config=None) -> AsyncIterator[SimpleNamespace]:
+        await self._simulate(contents)
+        text = local_answer(contents, get_settings().local_llm_seed)
+
+        async def chunks():
+            for i in range(0, len(text), _STREAM_CHUNK):
+                await asyncio.sleep(0)
+                last = i + _STREAM_CHUNK >= len(text)
+                yield SimpleNamespace(
+                    text           = text[i:i + _STREAM_CHUNK],
+                    usage_metadata = self._response(text, contents).usage_metadata if last else None,
+                )
+        return chunks()
+
+
+class LocalGenAIClient:
+    """Duck-typed replacement for genai.Client (async API only)."""
+
+    def __init__(self, seed: int = 0):
+        self.aio = SimpleNamespace(models=_LocalModels(random.Random(seed)))
+
+
+_CLIENT: Optional[LocalGenAIClient] = None
+
+
+def get_local_client() -> LocalGenAIClient:
+    global _CLIENT
+    if _CLIENT is None:
+        _CLIENT = LocalGenAIClient(get_settings().local_llm_seed)
+    return _CLIENT
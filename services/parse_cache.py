@@ -0,0 +1,175 @@
+"""
+services/parse_cache.py — Content-addressed cache of parsed PDFs shared across jobs.
+
+Entries are keyed by the SHA-256 of the PDF bytes plus the parser version and
+parse mode, so the same paper uploaded by many users is parsed once. Jobs link
+to an entry through the `sha256` recorded in their `.meta.json`.
+
+Documents are written in the compact binary format (services/doc_codec.py);
+entries written as JSON by older versions are still read.
+"""
+from __future__ import annotations
+
+import hashlib
+import logging
+from functools import lru_cache
+from pathlib import Path
+from typing import Iterable, Optional
+
+from pydantic import TypeAdapter
+
+from config import get_settings
+from models.schemas import ParseMode, ParsedDocument, ParsedTable
+from services.disk_cache import DiskCache
+from services.doc_codec import encode_document, read_document
+from services.pdf_parser import PARSER_VERSION, mode_satisfies, parse_pdf
+from services.retrieval import PassageIndex
+
+logger = logging.getLogger(__name__)
+
+_HASH_CHUNK = 1024 * 1024
+
+_TABLE_INDEX = TypeAdapter(dict[int, list[ParsedTable]])
+
+# Current format first; .parsed.json entries predate the compact format
+_DOC_SUFFIXES = (".parsed.bin", ".parsed.json")
+# Indexes stored beside each document; kept as recently used as the document itself
+_SIDE_SUFFIXES = (".tables.json", ".bm25.npz")
+
+
+def file_sha256(path: Path) -> str:
+    """Hash a file in fixed-size chunks without loading it into memory."""
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(_HASH_CHUNK):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def content_key(sha256: str, mode: ParseMode, word_budget: int = 0) -> str:
+    key = f"{sha256}-v{PARSER_VERSION}-{ParseMode(mode).value}"
+    if get_settings().parse_strip_references:
+        key += "-noref"
+    return f"{key}-w{word_budget}" if word_budget else key
+
+
+class ParseCache:
+    """Shared, size-bounded LRU store of ParsedDocuments keyed by content hash."""
+
+    def __init__(self, directory: Path, max_bytes: int):
+        self.store = DiskCache(directory, max_bytes)
+
+    def get(self, sha256: str, mode: ParseMode, word_budget: int = 0) -> Optional[ParsedDocument]:
+        """
+        Return a cached parse at least as thorough as `mode`, or None.
+        A complete parse also satisfies a budgeted request.
+        """
+        budgets = [0, word_budget] if word_budget else [0]
+        for candidate, budget in ((m, b) for b in budgets for m in ParseMode):
+            if not mode_satisfies(candidate, mode):
+                continue
+            key = content_key(sha256, candidate, budget)
+            for suffix in _DOC_SUFFIXES:
+                name = f"{key}{suffix}"
+                if self.store.contains(name):
+                    data = self.store.read_bytes(name)
+                    if data is not None:
+                        for side in _SIDE_SUFFIXES:     # evicted together with the document
+                            self.store.touch(f"{key}{side}")
+                        doc = read_document(data)
+                        doc.content_key = key
+                        return doc
+        self.store.record(hit=False)
+        return None
+
+    def put(self, sha256: str, doc: ParsedDocument, word_budget: int = 0) -> None:
+        key = content_key(sha256, doc.parse_mode, word_budget if doc.is_partial else 0)
+        # The table index lives beside the document so plain loads stay small
+        self.store.write_bytes(f"{key}.tables.json", _TABLE_INDEX.dump_json(doc.tables))
+        if doc.retrieval is not None:
+            self.store.write_bytes(f"{key}.bm25.npz", doc.retrieval.to_bytes())
+        self.store.write_bytes(f"{key}.parsed.bin", encode_document(doc, get_settings().parse_cache_compress))
+        doc.content_key = key
+
+    def load_tables(self, key: str) -> dict[int, list[ParsedTable]]:
+        data = self.store.read_bytes(f"{key}.tables.json", record=False)
+        return _TABLE_INDEX.validate_json(data) if data is not None else {}
+
+    def load_retrieval(self, key: str) -> Optional[PassageIndex]:
+        data = self.store.read_bytes(f"{key}.bm25.npz", record=False)
+        return PassageIndex.from_bytes(data) if data is not None else None
+
+    def stats(self) -> dict:
+        return self.store.stats()
+
+
+@lru_cache
+def get_parse_cache() -> ParseCache:
+    settings = get_settings()
+    return ParseCache(settings.parse_cache_dir, settings.parse_cache_max_mb * 1024 * 1024)
+
+
+def load_or_parse(
+    pdf_path: Path,
+    job_id:   str,
+    mode:     ParseMode,
+    sha256:   Optional[str] = None,
+    word_budget: int        = 0,
+) -> tuple[ParsedDocument, bool]:
+    """
+    Return (document, cache_hit) for a job's PDF, parsing it only if no job has
+    parsed the same bytes before. Cached documents are re-labelled for `job_id`.
+    """
+    sha256 = sha256 or file_sha256(pdf_path)
+    cache  = get_parse_cache()
+
+    doc = cache.get(sha256, mode, word_budget)
+    if doc is not None:
+        logger.info(f"[{job_id}] Parse cache hit ({doc.parse_mode.value}) for {sha256[:12]}")
+        return doc.model_copy(update={"job_id": job_id, "filename": pdf_path.name}), True
+
+    doc = parse_pdf(pdf_path, job_id=job_id, mode=mode, word_budget=word_budget)
+    doc.retrieval = PassageIndex.build(doc.sections, get_settings().retrieval_passage_words)
+    cache.put(sha256, doc, word_budget)
+    return doc, False
+
+
+def ensure_complete(doc: ParsedDocument) -> ParsedDocument:
+    """
+    Finish a budgeted (partial) document in place by loading the full parse of
+    the same PDF — from the shared cache when another job already has it.
+    """
+    if not doc.is_partial:
+        return doc
+    pdf_path = get_settings().upload_dir / doc.filename
+    full, _  = load_or_parse(pdf_path, doc.job_id, doc.parse_mode)
+    for name in ParsedDocument.model_fields:
+        setattr(doc, name, getattr(full, name))
+    logger.info(f"[{doc.job_id}] Completed partial parse: {doc.total_pages} pages.")
+    return doc
+
+
+def get_tables(doc: ParsedDocument, pages: Iterable[int]) -> dict[int, list[ParsedTable]]:
+    """
+    Batch lookup in the document's table index: {page: [tables]} for every
+    requested page that has any. Loads the index from the parse cache once
+    per document when it is not already attached. A budgeted document only
+    has tables for its parsed pages; async callers use
+    parse_jobs.document_tables, which completes it off the loop first.
+    """
+    if not doc.tables and doc.content_key:
+        doc.tables = get_parse_cache().load_tables(doc.content_key)
+    return {p: doc.tables[p] for p in sorted(set(pages)) if p in doc.tables}
+
+
+def get_retrieval_index(doc: ParsedDocument) -> PassageIndex:
+    """
+    The document's BM25 passage index: attached, loaded from the parse cache,
+    or (for documents cached before indexes existed) built on the spot.
+    """
+    if doc.retrieval is None:
+        index = get_parse_cache().load_retrieval(doc.content_key) if doc.content_key else None
+        if index is None:
+            index = PassageIndex.build(doc.sections, get_settings().retrieval_passage_words)
+        doc.retrieval = index
+    return doc.retrieval
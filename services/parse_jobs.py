@@ -0,0 +1,110 @@
+"""
+services/parse_jobs.py — Runs PDF parsing off the event loop with bounded concurrency.
+
+parse_pdf is synchronous and CPU-heavy; calling it inline from an async route
+stalls every other request on the worker. run_parse hands it to a small thread
+pool whose size caps how many parses run at once; the rest wait in its queue.
+"""
+from __future__ import annotations
+
+import asyncio
+import functools
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Iterable, Optional
+
+from config import get_settings
+from models.schemas import ParseMode, ParsedDocument, ParsedTable
+from services.parse_cache import ensure_complete, get_retrieval_index, get_tables, load_or_parse
+from services.retrieval import PassageIndex
+
+logger = logging.getLogger(__name__)
+
+_EXECUTOR: Optional[ThreadPoolExecutor] = None
+_LOCK     = threading.Lock()
+_running  = 0
+_waiting  = 0
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _EXECUTOR
+    with _LOCK:
+        if _EXECUTOR is None:
+            _EXECUTOR = ThreadPoolExecutor(
+                max_workers        = max(1, get_settings().parse_max_concurrency),
+                thread_name_prefix = "pdf-parse",
+            )
+        return _EXECUTOR
+
+
+def _tracked(fn, *args, **kwargs):
+    global _running, _waiting
+    with _LOCK:
+        _waiting -= 1
+        _running += 1
+    try:
+        return fn(*args, **kwargs)
+    finally:
+        with _LOCK:
+            _running -= 1
+
+
+async def run_parse(
+    pdf_path: Path,
+    job_id:   str,
+    mode:     ParseMode,
+    sha256:   Optional[str] = None,
+    word_budget: int        = 0,
+) -> tuple[ParsedDocument, bool]:
+    """Async load_or_parse: waits for a free parse slot without blocking the loop."""
+    return await _submit(load_or_parse, pdf_path, job_id, mode, sha256=sha256, word_budget=word_budget)
+
+
+async def complete_document(doc: ParsedDocument) -> ParsedDocument:
+    """Async ensure_complete: parse the rest of a budgeted document off the loop."""
+    if not doc.is_partial:
+        return doc
+    return await _submit(ensure_complete, doc)
+
+
+async def document_tables(doc: ParsedDocument, pages: Iterable[int]) -> dict[int, list[ParsedTable]]:
+    """Async get_tables: completes a budgeted document first when `pages` run past its parsed ones."""
+    pages = sorted(set(pages))
+    if doc.is_partial and pages and pages[-1] > (doc.pages_parsed or 0):
+        await complete_document(doc)
+    return await asyncio.to_thread(get_tables, doc, pages)
+
+
+async def retrieval_index(doc: ParsedDocument) -> PassageIndex:
+    """Async get_retrieval_index: the index is loaded (or built) in a worker thread."""
+    if doc.retrieval is not None:
+        return doc.retrieval
+    return await asyncio.to_thread(get_retrieval_index, doc)
+
+
+async def _submit(fn, *args, **kwargs):
+    global _waiting
+    executor = _get_executor()
+    with _LOCK:
+        _waiting += 1
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(executor, functools.partial(_tracked, fn, *args, **kwargs))
+
+
+def parse_queue_stats() -> dict:
+    with _LOCK:
+        return {
+            "max_concurrency": get_settings().parse_max_concurrency,
+            "running":         _running,
+            "waiting":         _waiting,
+        }
+
+
+def shutdown_parse_executor() -> None:
+    global _EXECUTOR
+    with _LOCK:
+        executor, _EXECUTOR = _EXECUTOR, None
+    if executor is not None:
+        executor.shutdown(wait=False, cancel_futures=True)
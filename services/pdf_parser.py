@@ -10,25 +10,38 @@ Deep PDF extraction using two complementary libraries:
 Pipeline:
   1. Extract metadata (title, authors, doi)
   2. Segment document into logical sections (headings → next heading)
-  3. Detect and extract tables per page via pdfplumber
+  3. Detect tables per page and index them as Markdown (page → tables)
   4. Flag pages with mathematical equations
-  5. Return a clean ParsedDocument ready for the script generator
+  5. Strip running headers/footers (and optionally the references section)
+  6. Return a clean ParsedDocument ready for the script generator
 """
 from __future__ import annotations
 
+import math
+import multiprocessing as mp
+import os
 import re
+import threading
 import uuid
 import logging
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from pathlib import Path
 from typing import Optional
 
 import fitz           # PyMuPDF
+import numpy as np
 import pdfplumber
 
-from models.schemas import ParsedDocument, ParsedSection
+from config import get_settings
+from models.schemas import ParseMode, ParsedDocument, ParsedSection, ParsedTable
+from services.block_store import FLAG_HEADING, BlockStore, PageBlocks
 
 logger = logging.getLogger(__name__)
 
+# Bump whenever extraction output changes so content-addressed caches invalidate
+PARSER_VERSION = "4"
+
 # ── Regex helpers ─────────────────────────────────────────────────────────────
 
 # Common academic section headings
@@ -49,21 +62,63 @@ CUSTOM_HEADING_RE = re.compile(r"^[A-Z][A-Za-z\s\-:]{3,60}$")
 EQUATION_CHARS = set("∑∫∂∇≈≠≤≥αβγδεζηθλμνξπρστφψωΩΓΔΘΛΞΠΣΦΨ∈∉⊂⊃∀∃")
 EQUATION_RE    = re.compile(r"[=\+\-\*/\^]{1}.*[=\+\-\*/\^]|\\[a-z]+\{")  # LaTeX or inline math
 
+# Table captions ("Table 2", "TABLE III") gate table detection outside deep mode
+TABLE_CAPTION_RE = re.compile(r"^\s*table\s+([0-9]+|[ivxlc]+)\b", re.IGNORECASE | re.MULTILINE)
+
+# A references/bibliography heading ends the useful content for a budgeted parse
+REFERENCES_RE = re.compile(r"^(\d+\.?\s*)?(references|bibliography|works cited)$", re.IGNORECASE)
+
+# Running heads/footers: blocks in the top or bottom band of the page whose
+# digit-normalised text recurs on at least this share of pages (and ≥ 3 pages)
+_MARGIN_BAND       = 0.12
+_RUNNING_MIN_SHARE = 0.5
+_RUNNING_MIN_PAGES = 3
+_DIGITS_RE         = re.compile(r"\d+")
+_PAGE_NUMBER_RE    = re.compile(r"^(page\s*)?#(\s*(of|/)\s*#)?$")
+
+# Ordering used to decide whether a cached parse is good enough for a request
+_MODE_RANK = {ParseMode.FAST: 0, ParseMode.STANDARD: 1, ParseMode.DEEP: 2}
+
 
 # ── Public API ────────────────────────────────────────────────────────────────
 
-def parse_pdf(file_path: Path, job_id: Optional[str] = None) -> ParsedDocument:
+def parse_pdf(
+    file_path: Path,
+    job_id:    Optional[str] = None,
+    mode:      ParseMode     = ParseMode.DEEP,
+    word_budget: int         = 0,
+    strip_references: Optional[bool] = None,
+) -> ParsedDocument:
     """
     Main entry point. Performs a single-pass scan of the PDF for maximum speed.
+    Large documents are split into page chunks and extracted in worker processes.
+
+    With a `word_budget`, pages are extracted in order until that many words
+    have been collected or the references heading is reached; the result is
+    marked `is_partial` and can be completed later (parse_cache.ensure_complete).
+
+    Running headers, footers and page numbers are always dropped; the
+    references section is dropped when `strip_references` (default: the
+    PARSE_STRIP_REFERENCES setting). `chars_removed` reports the savings.
+
+    `mode` trades accuracy for speed:
+      • fast     — plain text derived from the layout dict, caption-only table
+                   hints, math-symbol equation check
+      • standard — as fast, but find_tables() runs on captioned pages and the
+                   full equation heuristics apply
+      • deep     — separate plain-text pass and find_tables() on every page
     """
     job_id = job_id or str(uuid.uuid4())
-    logger.info(f"[{job_id}] Starting optimized PDF parse: {file_path.name}")
+    mode   = ParseMode(mode)
+    if strip_references is None:
+        strip_references = get_settings().parse_strip_references
+    logger.info(f"[{job_id}] Starting optimized PDF parse ({mode.value}): {file_path.name}")
 
     doc = fitz.open(str(file_path))
     
     # Initialize collectors
-    blocks      = []
     table_pages = set()
+    table_index = {}
     eq_pages    = set()
     doi         = None
     
@@ -73,67 +128,40 @@ def parse_pdf(file_path: Path, job_id: Optional[str] = None) -> ParsedDocument:
     year  = _extract_year(meta.get("creationDate", ""))
 
     try:
-        for pg_idx, page in enumerate(doc):
-            p_num = pg_idx + 1
-            
-            # 1. Text extraction ("dict" for formatting info)
-            page_dict = page.get_text("dict")
-            full_text = page.get_text() # for DOI and equations
-            
-            # 2. Block extraction
-            for block in page_dict.get("blocks", []):
-                if block.get("type") != 0: continue
-                lines_text = []
-                max_size   = 0.0
-                is_bold    = False
-                for line in block.get("lines", []):
-                    for span in line.get("spans", []):
-                        txt = span.get("text", "").strip()
-                        if txt:
-                            lines_text.append(txt)
-                            sz = span.get("size", 10)
-                            if sz > max_size: max_size = sz
-                            if span.get("flags", 0) & 2**4: is_bold = True
-                
-                text = " ".join(lines_text).strip()
-                if text:
-                    blocks.append({
-                        "page": p_num, "text": text, 
-                        "font_size": max_size, "is_bold": is_bold
-                    })
-
-            # 3. Table detection
+        page_results = None
+        workers      = _parse_worker_count(doc.page_count)
+        if word_budget > 0:
+            page_results = _extract_until_budget(doc, mode, word_budget)
+        elif workers > 1:
+            logger.info(f"[{job_id}] Extracting {doc.page_count} pages with {workers} workers.")
             try:
-                if page.find_tables().tables:
-                    table_pages.add(p_num)
-            except: pass
-
-            # 4. Equation detection
-            math_chars = sum(1 for c in full_text if c in EQUATION_CHARS)
-            if math_chars >= 3 or EQUATION_RE.search(full_text):
+                page_results = _extract_parallel(file_path, doc.page_count, workers, mode)
+            except BrokenProcessPool as e:
+                logger.warning(f"[{job_id}] Parse worker pool failed ({e}); falling back to serial.")
+        if page_results is None:
+            page_results = [_extract_page(page, pg_idx + 1, mode) for pg_idx, page in enumerate(doc)]
+
+        # Merge per-page results in page order
+        store = BlockStore.from_pages((r[0], r[1]) for r in page_results)
+        for p_num, _, has_table, page_tables, has_eq, page_doi in page_results:
+            if has_table:
+                table_pages.add(p_num)
+            if page_tables:
+                table_index[p_num] = page_tables
+            if has_eq:
                 eq_pages.add(p_num)
+            if doi is None and page_doi:
+                doi = page_doi
 
-            # 5. DOI lookup (first 2 pages only)
-            if pg_idx < 2 and doi is None:
-                m = re.search(r"10\.\d{4,}/\S+", full_text)
-                if m: doi = m.group()
-
-        # Post-process: Heading detection threshold
-        if blocks:
-            sizes = sorted(set(b["font_size"] for b in blocks), reverse=True)
-            threshold = sizes[max(0, int(len(sizes) * 0.15) - 1)]
-        else: threshold = 14.0
-
-        for b in blocks:
-            text_clean = b["text"].strip()
-            b["is_heading"] = (
-                b["font_size"] >= threshold
-                or HEADING_RE.match(text_clean)
-                or (b["is_bold"] and CUSTOM_HEADING_RE.match(text_clean) and len(text_clean) < 80)
-            )
+        # Post-process: drop page furniture, then heading detection (vectorised over the block columns)
+        store, chars_removed = _strip_running_blocks(store)
+        _classify_headings(store)
+        if strip_references:
+            store, chars_removed["references"] = _strip_references(store)
+        logger.info(f"[{job_id}] Cleanup removed {sum(chars_removed.values())} chars: {chars_removed}")
 
         # Build final segments
-        sections = _segment_sections(blocks, table_pages, eq_pages)
+        sections = _segment_sections(store, table_pages, eq_pages)
         raw_text = "\n\n".join(s.body for s in sections)
         word_count = len(raw_text.split())
 
@@ -143,12 +171,19 @@ def parse_pdf(file_path: Path, job_id: Optional[str] = None) -> ParsedDocument:
             "keywords": meta.get("keywords", "")
         }
 
-        logger.info(f"[{job_id}] Parsed {doc.page_count} pages in single pass.")
+        pages_parsed = len(page_results)
+        is_partial   = pages_parsed < doc.page_count
+        if is_partial:
+            logger.info(f"[{job_id}] Word budget reached: parsed {pages_parsed}/{doc.page_count} pages.")
+        else:
+            logger.info(f"[{job_id}] Parsed {doc.page_count} pages in single pass.")
 
         return ParsedDocument(
             job_id=job_id, filename=file_path.name, total_pages=doc.page_count,
             word_count=word_count, sections=sections, raw_text=raw_text,
-            metadata=parsed_meta
+            metadata=parsed_meta, parse_mode=mode, tables=table_index,
+            is_partial=is_partial, pages_parsed=pages_parsed if is_partial else None,
+            chars_removed=chars_removed,
         )
     finally:
         doc.close()
@@ -160,49 +195,317 @@ def _detect_tables_STUB(): pass
 def _detect_equation_pages_STUB(): pass
 
 
+# ── Per-page extraction ───────────────────────────────────────────────────────
+
+# (page number, blocks, has_tables, tables, has_equations, doi candidate)
+PageResult = tuple[int, PageBlocks, bool, list[ParsedTable], bool, Optional[str]]
+
+
+def _extract_page(page: fitz.Page, p_num: int, mode: ParseMode = ParseMode.DEEP) -> PageResult:
+    """Extract text blocks, table/equation flags and a DOI candidate from one page."""
+    # 1. Text extraction ("dict" for formatting info)
+    page_dict  = page.get_text("dict")
+    dict_lines = []   # plain-text lines rebuilt from the dict (fast/standard)
+
+    # 2. Block extraction (kept as parallel lists: cheap to pickle from workers)
+    texts, sizes, bold, ypos = [], [], [], []
+    height = page_dict.get("height") or page.rect.height or 1.0
+    for block in page_dict.get("blocks", []):
+        if block.get("type") != 0: continue
+        lines_text = []
+        max_size   = 0.0
+        is_bold    = False
+        for line in block.get("lines", []):
+            raw_line = []
+            for span in line.get("spans", []):
+                raw_line.append(span.get("text", ""))
+                txt = span.get("text", "").strip()
+                if txt:
+                    lines_text.append(txt)
+                    sz = span.get("size", 10)
+                    if sz > max_size: max_size = sz
+                    if span.get("flags", 0) & 2**4: is_bold = True
+            dict_lines.append("".join(raw_line))
+
+        text = " ".join(lines_text).strip()
+        if text:
+            texts.append(text)
+            sizes.append(max_size)
+            bold.append(is_bold)
+            y0, y1 = block["bbox"][1], block["bbox"][3]
+            ypos.append((y0 + y1) / 2 / height)
+
+    if mode == ParseMode.DEEP:
+        full_text = page.get_text() # for DOI and equations
+    else:
+        full_text = "\n".join(dict_lines)
+
+    # 3. Table detection (deferred to captioned pages unless deep)
+    has_caption = mode != ParseMode.DEEP and bool(TABLE_CAPTION_RE.search(full_text))
+    has_table   = False
+    tables      = []
+    if mode == ParseMode.FAST:
+        has_table = has_caption
+    elif mode == ParseMode.DEEP or has_caption:
+        try:
+            found     = page.find_tables().tables
+            has_table = bool(found)
+            tables    = [_index_table(t, p_num) for t in found]
+            tables    = [t for t in tables if t is not None]
+        except: pass
+
+    # 4. Equation detection
+    math_chars = sum(1 for c in full_text if c in EQUATION_CHARS)
+    if mode == ParseMode.FAST:
+        has_eq = math_chars >= 3
+    else:
+        has_eq = math_chars >= 3 or bool(EQUATION_RE.search(full_text))
+
+    # 5. DOI lookup (first 2 pages only)
+    doi = None
+    if p_num <= 2:
+        m = re.search(r"10\.\d{4,}/\S+", full_text)
+        if m: doi = m.group()
+
+    return p_num, (texts, sizes, bold, ypos), has_table, tables, has_eq, doi
+
+
+def _index_table(table, p_num: int) -> Optional[ParsedTable]:
+    """Render a fitz table found during extraction as a ParsedTable."""
+    rows = table.extract()
+    if not rows:
+        return None
+    return ParsedTable(
+        page     = p_num,
+        markdown = _table_to_markdown(rows),
+        rows     = len(rows),
+        cols     = max(len(r) for r in rows),
+    )
+
+
+def _extract_until_budget(doc: fitz.Document, mode: ParseMode, word_budget: int) -> list[PageResult]:
+    """Extract pages in order, stopping once the budget or the references are reached."""
+    results: list[PageResult] = []
+    words = 0
+    for pg_idx, page in enumerate(doc):
+        result = _extract_page(page, pg_idx + 1, mode)
+        results.append(result)
+        texts  = result[1][0]
+        words += sum(len(t.split()) for t in texts)
+        if words >= word_budget:
+            break
+        # Ignore "References" in a table of contents: require some body text first
+        if words >= word_budget // 4 and any(REFERENCES_RE.match(t) for t in texts):
+            break
+    return results
+
+
+def _extract_page_range(file_path: str, start: int, stop: int, mode: ParseMode) -> list[PageResult]:
+    """Worker entry point: open a private fitz handle and extract pages [start, stop)."""
+    doc = fitz.open(file_path)
+    try:
+        return [_extract_page(doc[pg_idx], pg_idx + 1, mode) for pg_idx in range(start, stop)]
+    finally:
+        doc.close()
+
+
+# ── Parallel extraction ───────────────────────────────────────────────────────
+
+_POOL: Optional[ProcessPoolExecutor] = None
+_POOL_SIZE = 0
+_POOL_LOCK = threading.Lock()   # parses run concurrently (services/parse_jobs.py)
+
+
+def _parse_worker_count(page_count: int) -> int:
+    """Number of worker processes to use, or 1 to stay serial."""
+    settings = get_settings()
+    if page_count < settings.parse_parallel_min_pages:
+        return 1
+    workers = settings.parse_workers or os.cpu_count() or 1
+    return max(1, min(workers, page_count))
+
+
+def _get_pool(workers: int) -> ProcessPoolExecutor:
+    """Lazily create (or resize) the shared extraction process pool."""
+    global _POOL, _POOL_SIZE
+    with _POOL_LOCK:
+        if _POOL is None or _POOL_SIZE != workers:
+            if _POOL is not None:
+                _POOL.shutdown(wait=False)     # work already submitted still finishes
+            # spawn: MuPDF state must not be inherited across fork()
+            _POOL      = ProcessPoolExecutor(max_workers=workers, mp_context=mp.get_context("spawn"))
+            _POOL_SIZE = workers
+        return _POOL
+
+
+def _discard_pool(pool: ProcessPoolExecutor) -> None:
+    """Drop a broken pool so the next parse starts a fresh one; other parses' futures are left alone."""
+    global _POOL, _POOL_SIZE
+    with _POOL_LOCK:
+        if _POOL is pool:
+            _POOL, _POOL_SIZE = None, 0
+    pool.shutdown(wait=False)
+
+
+def _extract_parallel(
+    file_path:  Path,
+    page_count: int,
+    workers:    int,
+    mode:       ParseMode,
+) -> list[PageResult]:
+    """Split the page range into chunks and extract them in worker processes."""
+    # A few chunks per worker keeps the pool busy when some pages are heavier than others
+    chunk  = max(1, math.ceil(page_count / (workers * 4)))
+    ranges = [(s, min(s + chunk, page_count)) for s in range(0, page_count, chunk)]
+    pool   = _get_pool(workers)
+
+    results: list[PageResult] = []
+    try:
+        futures = [pool.submit(_extract_page_range, str(file_path), s, e, mode) for s, e in ranges]
+        for fut in futures:          # futures are in page order
+            results.extend(fut.result())
+    except BrokenProcessPool:
+        _discard_pool(pool)
+        raise
+    return results
+
+
+def mode_satisfies(cached: ParseMode, requested: ParseMode) -> bool:
+    """True if a document parsed in `cached` mode is at least as thorough as `requested`."""
+    return _MODE_RANK[ParseMode(cached)] >= _MODE_RANK[ParseMode(requested)]
+
+
+def shutdown_parse_pool() -> None:
+    """Terminate the extraction worker processes (called on app shutdown)."""
+    global _POOL, _POOL_SIZE
+    with _POOL_LOCK:
+        pool, _POOL, _POOL_SIZE = _POOL, None, 0
+    if pool is not None:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+def _classify_headings(store: BlockStore) -> None:
+    """
+    Set FLAG_HEADING on blocks that look like section titles: font size in the
+    top ~15% of distinct sizes, a known academic heading, or a short bold title.
+    """
+    if not len(store):
+        return
+    sizes     = np.unique(store.size)[::-1]          # distinct sizes, descending
+    threshold = sizes[max(0, int(len(sizes) * 0.15) - 1)]
+    heading   = store.size >= threshold
+
+    # Regexes only run on short blocks; no real heading is 80+ characters long
+    candidates = np.flatnonzero(~heading & (store.lengths < 80))
+    is_bold    = store.is_bold[candidates].tolist()
+    for i, bold, text in zip(candidates.tolist(), is_bold, store.texts_at(candidates)):
+        if HEADING_RE.match(text) or (bold and CUSTOM_HEADING_RE.match(text)):
+            heading[i] = True
+
+    store.flags[heading] |= FLAG_HEADING
+
+
+def _strip_running_blocks(store: BlockStore) -> tuple[BlockStore, dict[str, int]]:
+    """
+    Drop running heads, footers, page numbers and licence lines: blocks in the
+    top/bottom margin band whose text (digits normalised) repeats across pages.
+    """
+    removed = {"running_headers": 0, "page_numbers": 0}
+    if not len(store):
+        return store, removed
+    n_pages = int(np.unique(store.page).size)
+    in_band = (store.ypos < _MARGIN_BAND) | (store.ypos > 1 - _MARGIN_BAND)
+    band    = np.flatnonzero(in_band)
+    if not band.size:
+        return store, removed
+
+    # Distinct pages per normalised text, counted over the margin blocks only
+    keys          = [_DIGITS_RE.sub("#", t).casefold() for t in store.texts_at(band)]
+    uniq, inverse = np.unique(np.array(keys, dtype=object), return_inverse=True)
+    pairs         = np.unique(np.stack([inverse, store.page[band]]), axis=1)
+    page_counts   = np.bincount(pairs[0], minlength=len(uniq))
+
+    min_pages = max(_RUNNING_MIN_PAGES, math.ceil(n_pages * _RUNNING_MIN_SHARE))
+    running   = page_counts[inverse] >= min_pages
+    if not running.any():
+        return store, removed
+
+    drop      = band[running]
+    is_number = np.array([bool(_PAGE_NUMBER_RE.match(k)) for k, r in zip(keys, running.tolist()) if r])
+    lengths   = store.lengths[drop]
+    removed["page_numbers"]    = int(lengths[is_number].sum())
+    removed["running_headers"] = int(lengths[~is_number].sum())
+
+    keep       = np.ones(len(store), dtype=bool)
+    keep[drop] = False
+    return store.select(keep), removed
+
+
+def _strip_references(store: BlockStore) -> tuple[BlockStore, int]:
+    """
+    Drop the references section: from the first references heading up to the
+    next known section heading (e.g. an appendix) or the end of the document.
+    """
+    headings = np.flatnonzero(store.is_heading).tolist()
+    titles   = [_clean_heading(t) for t in store.texts_at(headings)]
+    start    = next((h for h, t in zip(headings, titles) if REFERENCES_RE.match(t)), None)
+    if start is None:
+        return store, 0
+    end = next(
+        (h for h, t in zip(headings, titles) if h > start and HEADING_RE.match(t) and not REFERENCES_RE.match(t)),
+        len(store),
+    )
+    keep            = np.ones(len(store), dtype=bool)
+    keep[start:end] = False
+    return store.select(keep), int(store.lengths[start:end].sum())
+
+
 def _segment_sections(
-    blocks: list[dict],
+    store: BlockStore,
     table_pages: set[int],
     eq_pages: set[int],
 ) -> list[ParsedSection]:
     """
     Group consecutive non-heading blocks under the nearest preceding heading,
-    producing a list of ParsedSection objects.
+    producing a list of ParsedSection objects. Works on block index ranges:
+    each body is one slice of the store's text buffer.
     """
+    n = len(store)
+    if not n:
+        return []
+
+    # Prefix counts of blocks on table/equation pages: any-in-range checks are O(1)
+    def prefix(flagged: set[int]) -> list[int]:
+        hits = np.isin(store.page, np.fromiter(flagged, dtype=np.int32))
+        return np.concatenate(([0], np.cumsum(hits))).tolist()
+
+    tab_cum  = prefix(table_pages)
+    eq_cum   = prefix(eq_pages)
+    page     = store.page.tolist()
+    headings = np.flatnonzero(store.is_heading).tolist()
+
+    # (title, page_start, body range) for the preamble and every heading
+    segments = [("Preamble", page[0], 0, headings[0] if headings else n)]
+    titles   = store.texts_at(headings)
+    for k, (h, title) in enumerate(zip(headings, titles)):
+        hi = headings[k + 1] if k + 1 < len(headings) else n
+        segments.append((_clean_heading(title), page[h], h + 1, hi))
+
     sections: list[ParsedSection] = []
-    current_title  = "Preamble"
-    current_body   = []
-    current_start  = blocks[0]["page"] if blocks else 1
-    current_pages  = set()
-
-    def flush():
-        nonlocal current_title, current_body, current_start, current_pages
-        body = " ".join(current_body).strip()
-        if not body:
-            return
-        pages_used = sorted(current_pages)
-        pg_end = pages_used[-1] if pages_used else current_start
+    pages_lo = 0   # pages accumulate across empty sections until one is emitted
+    for title, page_start, lo, hi in segments:
+        if hi <= lo:
+            continue
+        # pages span the body plus the heading that closes it
+        end = min(hi + 1, n)
         sections.append(ParsedSection(
-            title          = current_title,
-            body           = body,
-            page_start     = current_start,
-            page_end       = pg_end,
-            has_tables     = bool(current_pages & table_pages),
-            has_equations  = bool(current_pages & eq_pages),
+            title          = title,
+            body           = store.join(lo, hi),
+            page_start     = page_start,
+            page_end       = page[end - 1],
+            has_tables     = tab_cum[end] > tab_cum[pages_lo],
+            has_equations  = eq_cum[end] > eq_cum[pages_lo],
         ))
-        current_body  = []
-        current_pages = set()
-
-    for block in blocks:
-        current_pages.add(block["page"])
-        if block["is_heading"]:
-            flush()
-            current_title = _clean_heading(block["text"])
-            current_start = block["page"]
-        else:
-            current_body.append(block["text"])
-
-    flush()   # flush the last section
+        pages_lo = end
     return sections
 
 
@@ -219,23 +522,35 @@ def extract_table_markdown(file_path: Path, page_number: int) -> str:
     Extract all tables from a given page and return them as Markdown strings.
     Useful for injecting structured table data into the LLM prompt.
     """
-    results = []
+    tables = extract_tables_markdown(file_path, [page_number])
+    return "\n\n".join(tables.get(page_number, []))
+
+
+def extract_tables_markdown(file_path: Path, page_numbers: list[int]) -> dict[int, list[str]]:
+    """
+    Batch variant of extract_table_markdown: opens the PDF once with pdfplumber
+    and returns {page: [markdown, ...]} for every requested page that has tables.
+    Prefer the table index built during parsing (services.parse_cache.get_tables).
+    """
+    results: dict[int, list[str]] = {}
     with pdfplumber.open(str(file_path)) as pdf:
-        if page_number > len(pdf.pages):
-            return ""
-        page   = pdf.pages[page_number - 1]
-        tables = page.extract_tables()
-        for table in tables:
-            if not table:
+        for page_number in sorted(set(page_numbers)):
+            if page_number < 1 or page_number > len(pdf.pages):
                 continue
-            header = table[0]
-            rows   = table[1:]
-            md     = "| " + " | ".join(str(c or "") for c in header) + " |\n"
-            md    += "| " + " | ".join("---" for _ in header) + " |\n"
-            for row in rows:
-                md += "| " + " | ".join(str(c or "") for c in row) + " |\n"
-            results.append(md)
-    return "\n\n".join(results)
+            tables = [t for t in pdf.pages[page_number - 1].extract_tables() if t]
+            if tables:
+                results[page_number] = [_table_to_markdown(t) for t in tables]
+    return results
+
+
+def _table_to_markdown(table: list[list]) -> str:
+    header = table[0]
+    rows   = table[1:]
+    md     = "| " + " | ".join(str(c or "") for c in header) + " |\n"
+    md    += "| " + " | ".join("---" for _ in header) + " |\n"
+    for row in rows:
+        md += "| " + " | ".join(str(c or "") for c in row) + " |\n"
+    return md
 
 
 def _guess_title_from_filename(filename: str) -> str:
@@ -0,0 +1,289 @@
+"""
+services/rate_limiter.py — Process-wide adaptive limiter for Gemini calls.
+
+Every Gemini request (chapter dialogue, study materials, chat, concurrent jobs)
+passes through one AdaptiveLimiter, which combines:
+
+  • token buckets for requests/minute and tokens/minute
+  • an AIMD concurrency limit: +1/limit per fast success, halved on a 429,
+    trimmed when latency exceeds the target
+  • a shared cooldown after a 429, using the server's retry delay when it
+    sends one, with per-waiter jitter so callers do not retry in lockstep
+
+The AIMD window and cooldown live in AIMDController, which the ElevenLabs
+scheduler (services/tts_scheduler.py) builds on as well.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import random
+import re
+import time
+from contextlib import asynccontextmanager
+from functools import lru_cache
+from typing import AsyncIterator, Optional
+
+from config import get_settings
+
+logger = logging.getLogger(__name__)
+
+# "retryDelay": "37s" in Gemini RESOURCE_EXHAUSTED details
+_RETRY_DELAY_RE = re.compile(r"retry[_ ]?delay['\"]?\s*[:=]\s*['\"]?(\d+(?:\.\d+)?)s", re.IGNORECASE)
+
+_BACKOFF_BASE   = 2.0    # seconds; doubled per consecutive 429 without a server hint
+_BACKOFF_MAX    = 60.0
+_DECREASE_GAP   = 1.0    # 429s within this many seconds count as one congestion event
+
+
+def is_rate_limit_error(error: Exception) -> bool:
+    err = str(error)
+    return "429" in err or "RESOURCE_EXHAUSTED" in err
+
+
+def retry_delay_from(error: Exception) -> Optional[float]:
+    """Server-provided retry delay (seconds) from a Gemini error, if any."""
+    response = getattr(error, "response", None)
+    headers  = getattr(response, "headers", None) or {}
+    try:
+        if headers.get("retry-after"):
+            return float(headers["retry-after"])
+    except (TypeError, ValueError):
+        pass
+    m = _RETRY_DELAY_RE.search(str(error))
+    return float(m.group(1)) if m else None
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (~4 characters per token) for budgeting."""
+    return max(1, len(text) // 4)
+
+
+class TokenBucket:
+    """Refills continuously at `per_minute` units per minute, up to one minute's worth."""
+
+    def __init__(self, per_minute: float):
+        self.capacity = float(per_minute)
+        self.rate     = per_minute / 60.0
+        self.level    = float(per_minute)
+        self.updated  = time.monotonic()
+
+    def _refill(self) -> None:
+        now          = time.monotonic()
+        self.level   = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float) -> float:
+        """Seconds until `amount` units are available (0 if they are now)."""
+        self._refill()
+        amount = min(amount, self.capacity)   # an oversized request waits for a full bucket
+        if self.level >= amount:
+            return 0.0
+        return (amount - self.level) / self.rate
+
+    def available(self) -> float:
+        self._refill()
+        return self.level
+
+    def take(self, amount: float) -> None:
+        self._refill()
+        self.level -= amount                  # may go negative when correcting estimates
+
+
+class Slot:
+    """Outcome of one limited call, reported back to the limiter on release."""
+
+    __slots__ = ("ok", "throttled", "retry_after")
+
+    def __init__(self):
+        self.ok          = False
+        self.throttled   = False
+        self.retry_after: Optional[float] = None
+
+    def succeeded(self) -> None:
+        self.ok = True
+
+    def rate_limited(self, retry_after: Optional[float] = None) -> None:
+        self.throttled   = True
+        self.retry_after = retry_after
+
+
+class _Slot(Slot):
+    """Slot that also corrects the call's token estimate."""
+
+    __slots__ = ("tokens",)
+
+    def __init__(self, tokens: int):
+        super().__init__()
+        self.tokens = tokens
+
+    def succeeded(self, actual_tokens: Optional[int] = None) -> None:
+        super().succeeded()
+        if actual_tokens:
+            self.tokens = actual_tokens
+
+
+class AIMDController:
+    """
+    AIMD concurrency window plus a shared cooldown, for limiters to build on:
+    +1/limit per fast success, trimmed when latency exceeds the target, halved
+    on a 429 (429s within `decrease_gap` seconds count as one congestion
+    event). Without a server hint the cooldown doubles per consecutive 429,
+    from `backoff_base` up to `backoff_max` seconds.
+    """
+
+    def __init__(
+        self,
+        name:             str,
+        max_concurrency:  int,
+        min_concurrency:  int,
+        initial_limit:    int,
+        latency_target_s: float,
+        backoff_base:     float,
+        backoff_max:      float,
+        decrease_gap:     float = _DECREASE_GAP,
+    ):
+        self.name            = name
+        self.max_concurrency = max_concurrency
+        self.min_concurrency = min_concurrency
+        self.latency_target  = latency_target_s
+        self.backoff_base    = backoff_base
+        self.backoff_max     = backoff_max
+        self.decrease_gap    = decrease_gap
+
+        self.limit           = float(max(min_concurrency, min(max_concurrency, initial_limit)))
+        self.in_flight       = 0
+        self.cooldown_until  = 0.0
+        self.throttles       = 0
+        self.completed       = 0
+        self._consecutive    = 0
+        self._last_decrease  = 0.0
+
+    def _on_success(self, latency: float) -> None:
+        self.completed    += 1
+        self._consecutive  = 0
+        if latency <= self.latency_target:
+            self.limit = min(self.max_concurrency, self.limit + 1.0 / self.limit)
+        else:
+            self.limit = max(self.min_concurrency, self.limit * 0.9)
+
+    def _on_throttle(self, retry_after: Optional[float]) -> None:
+        now = time.monotonic()
+        self.throttles    += 1
+        self._consecutive += 1
+        if now - self._last_decrease >= self.decrease_gap:
+            self.limit          = max(self.min_concurrency, self.limit / 2)
+            self._last_decrease = now
+        delay = retry_after if retry_after is not None else min(
+            self.backoff_max, self.backoff_base * 2 ** (self._consecutive - 1)
+        )
+        self.cooldown_until = max(self.cooldown_until, now + delay)
+        logger.warning(f"{self.name} rate limited: limit → {self.limit:.1f}, cooling down {delay:.1f}s")
+
+
+class AdaptiveLimiter(AIMDController):
+    """Token buckets plus an AIMD concurrency window shared by all callers."""
+
+    def __init__(
+        self,
+        rpm:              int,
+        tpm:              int,
+        max_concurrency:  int,
+        min_concurrency:  int   = 1,
+        latency_target_s: float = 20.0,
+    ):
+        super().__init__(
+            "Gemini", max_concurrency, min_concurrency, initial_limit=4, latency_target_s=latency_target_s,
+            backoff_base=_BACKOFF_BASE, backoff_max=_BACKOFF_MAX,
+        )
+        self.requests = TokenBucket(rpm)
+        self.tokens   = TokenBucket(tpm)
+        self.waiting  = 0
+        self._waiters: list[asyncio.Future] = []
+
+    # ── Acquire / release ─────────────────────────────────────────────────────
+
+    async def acquire(self, tokens: int) -> None:
+        loop = asyncio.get_running_loop()
+        self.waiting += 1
+        try:
+            while True:
+                cooldown = self.cooldown_until - time.monotonic()
+                if cooldown > 0:
+                    await asyncio.sleep(cooldown + random.uniform(0, min(5.0, 0.25 * cooldown + 0.1)))
+                    continue
+                if self.in_flight >= int(self.limit):
+                    fut = loop.create_future()
+                    self._waiters.append(fut)
+                    try:
+                        await fut
+                    except asyncio.CancelledError:
+                        if fut.done() and not fut.cancelled():
+                            self._wake(1)        # pass on a wake-up we can no longer use
+                        raise
+                    finally:
+                        if fut in self._waiters:
+                            self._waiters.remove(fut)
+                    continue
+                delay = max(self.requests.wait_time(1), self.tokens.wait_time(tokens))
+                if delay > 0:
+                    await asyncio.sleep(delay + random.uniform(0, 0.05))
+                    continue
+                self.requests.take(1)
+                self.tokens.take(tokens)
+                self.in_flight += 1
+                return
+        finally:
+            self.waiting -= 1
+
+    def _release(self) -> None:
+        self.in_flight -= 1
+        self._wake(max(0, int(self.limit) - self.in_flight))
+
+    def _wake(self, n: int) -> None:
+        while n > 0 and self._waiters:
+            fut = self._waiters.pop(0)
+            if not fut.done():
+                fut.set_result(None)
+                n -= 1
+
+    @asynccontextmanager
+    async def slot(self, tokens: int) -> AsyncIterator[_Slot]:
+        """Hold one concurrency slot; report the outcome through the yielded _Slot."""
+        await self.acquire(tokens)
+        outcome = _Slot(tokens)
+        start   = time.monotonic()
+        try:
+            yield outcome
+        finally:
+            if outcome.throttled:
+                self._on_throttle(outcome.retry_after)
+            elif outcome.ok:
+                self.tokens.take(outcome.tokens - tokens)   # correct the estimate
+                self._on_success(time.monotonic() - start)
+            self._release()
+
+    # ── Metrics ───────────────────────────────────────────────────────────────
+
+    def stats(self) -> dict:
+        return {
+            "limit":              round(self.limit, 2),
+            "in_flight":          self.in_flight,
+            "queued":             self.waiting,
+            "throttles":          self.throttles,
+            "completed":          self.completed,
+            "cooldown_s":         round(max(0.0, self.cooldown_until - time.monotonic()), 2),
+            "requests_available": round(self.requests.available(), 1),
+            "tokens_available":   round(self.tokens.available()),
+        }
+
+
+@lru_cache
+def get_gemini_limiter() -> AdaptiveLimiter:
+    settings = get_settings()
+    return AdaptiveLimiter(
+        rpm              = settings.gemini_rpm,
+        tpm              = settings.gemini_tpm,
+        max_concurrency  = settings.gemini_max_concurrency,
+        latency_target_s = settings.gemini_latency_target_s,
+    )
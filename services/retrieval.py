@@ -0,0 +1,176 @@
+"""
+services/retrieval.py — Local BM25 index over a parsed document's sections.
+
+Section bodies are split into passages of roughly `passage_words` words. The
+index keeps term postings as flat NumPy arrays (CSC-style: one slice of
+passage ids and term frequencies per vocabulary term), so scoring a query is
+a few vector operations. It is built at parse time, stored next to the parse
+cache entry, and used to pick the passages each chapter prompt needs.
+"""
+from __future__ import annotations
+
+import io
+import re
+
+import numpy as np
+
+from models.schemas import ParsedSection
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+_STOPWORDS = frozenset(
+    "a an and are as at be by for from has have in is it its of on or that the this "
+    "to was were which with we our their these those can also not".split()
+)
+
+BM25_K1 = 1.5
+BM25_B  = 0.75
+
+
+def tokenize(text: str) -> list[str]:
+    return [t for t in _TOKEN_RE.findall(text.lower()) if len(t) > 1 and t not in _STOPWORDS]
+
+
+def split_passages(sections: list[ParsedSection], passage_words: int) -> tuple[list[str], list[int]]:
+    """(passages, section index of each) — sections split into ~passage_words chunks."""
+    passages, owners = [], []
+    for i, section in enumerate(sections):
+        words = section.body.split()
+        for start in range(0, len(words), passage_words):
+            passages.append(" ".join(words[start:start + passage_words]))
+            owners.append(i)
+    return passages, owners
+
+
+class PassageIndex:
+    """BM25 over document passages with postings stored column-wise."""
+
+    def __init__(
+        self,
+        passages: list[str],
+        section:  np.ndarray,   # int32 — owning section of each passage
+        terms:    list[str],
+        indptr:   np.ndarray,   # int64 — term t's postings are [indptr[t], indptr[t+1])
+        postings: np.ndarray,   # int32 — passage ids
+        tf:       np.ndarray,   # float32 — term frequency in that passage
+        length:   np.ndarray,   # float32 — tokens per passage
+    ):
+        self.passages = passages
+        self.section  = section
+        self.vocab    = {t: i for i, t in enumerate(terms)}
+        self.terms    = terms
+        self.indptr   = indptr
+        self.postings = postings
+        self.tf       = tf
+        self.length   = length
+        n  = len(passages)
+        df = np.diff(indptr).astype(np.float64)
+        self.idf      = np.log1p((n - df + 0.5) / (df + 0.5))
+        self.avg_len  = float(length.mean()) if n else 0.0
+
+    def __len__(self) -> int:
+        return len(self.passages)
+
+    # ── Build ─────────────────────────────────────────────────────────────────
+
+    @classmethod
+    def build(cls, sections: list[ParsedSection], passage_words: int = 120) -> "PassageIndex":
+        passages, owners = split_passages(sections, passage_words)
+        vocab: dict[str, int] = {}
+        term_ids: list[int]   = []
+        doc_ids:  list[int]   = []
+        lengths:  list[int]   = []
+        for p, text in enumerate(passages):
+            tokens = tokenize(text)
+            lengths.append(len(tokens))
+            for tok in tokens:
+                term_ids.append(vocab.setdefault(tok, len(vocab)))
+            doc_ids.extend([p] * len(tokens))
+
+        # Count (term, passage) pairs, sorted by term → CSC postings
+        pairs = np.array([term_ids, doc_ids], dtype=np.int64).reshape(2, -1)
+        if pairs.shape[1]:
+            uniq, counts = np.unique(pairs, axis=1, return_counts=True)
+        else:
+            uniq, counts = np.zeros((2, 0), dtype=np.int64), np.zeros(0, dtype=np.int64)
+        indptr = np.zeros(len(vocab) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(uniq[0], minlength=len(vocab)), out=indptr[1:])
+
+        return cls(
+            passages = passages,
+            section  = np.array(owners, dtype=np.int32),
+            terms    = list(vocab),
+            indptr   = indptr,
+            postings = uniq[1].astype(np.int32),
+            tf       = counts.astype(np.float32),
+            length   = np.array(lengths, dtype=np.float32),
+        )
+
+    # ── Query ─────────────────────────────────────────────────────────────────
+
+    def scores(self, query: str) -> np.ndarray:
+        """BM25 score of every passage for `query`."""
+        scores = np.zeros(len(self.passages), dtype=np.float64)
+        if not len(self.passages):
+            return scores
+        norm = BM25_K1 * (1 - BM25_B + BM25_B * self.length / max(self.avg_len, 1e-9))
+        for term in set(tokenize(query)):
+            t = self.vocab.get(term)
+            if t is None:
+                continue
+            lo, hi = self.indptr[t], self.indptr[t + 1]
+            ids    = self.postings[lo:hi]
+            tf     = self.tf[lo:hi]
+            scores[ids] += self.idf[t] * tf * (BM25_K1 + 1) / (tf + norm[ids])
+        return scores
+
+    def select(self, query: str, token_budget: int) -> list[int]:
+        """
+        Highest-scoring passages for `query` that fit in `token_budget`
+        (~4 characters per token), returned in document order.
+        """
+        scores = self.scores(query)
+        chosen, used = [], 0
+        for p in np.argsort(-scores, kind="stable").tolist():
+            if scores[p] <= 0:
+                break
+            cost = len(self.passages[p]) // 4 + 1
+            if used + cost > token_budget:
+                continue
+            chosen.append(p)
+            used += cost
+        return sorted(chosen)
+
+    # ── Persistence ───────────────────────────────────────────────────────────
+
+    def to_bytes(self) -> bytes:
+        buf = io.BytesIO()
+        np.savez(
+            buf,
+            passages = _utf8("\x00".join(self.passages)),
+            terms    = _utf8("\x00".join(self.terms)),
+            section  = self.section,
+            indptr   = self.indptr,
+            postings = self.postings,
+            tf       = self.tf,
+            length   = self.length,
+        )
+        return buf.getvalue()
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "PassageIndex":
+        with np.load(io.BytesIO(data), allow_pickle=False) as z:
+            passages = z["passages"].tobytes().decode("utf-8")
+            terms    = z["terms"].tobytes().decode("utf-8")
+            return cls(
+                passages = passages.split("\x00") if passages else [],
+                section  = z["section"],
+                terms    = terms.split("\x00") if terms else [],
+                indptr   = z["indptr"],
+                postings = z["postings"],
+                tf       = z["tf"],
+                length   = z["length"],
+            )
+
+
+def _utf8(text: str) -> np.ndarray:
+    return np.frombuffer(text.encode("utf-8"), dtype=np.uint8)
@@ -1,74 +1,449 @@
 """
-services/script_generator.py - Gemini with retry logic
+services/script_generator.py - Script generation over the routed LLM providers
 """
 from __future__ import annotations
 
 import asyncio
-import json
 import logging
 import re
 import time
-from typing import Any
+from collections import Counter, defaultdict
+from contextvars import ContextVar
+from functools import lru_cache
+from typing import Annotated, Any, AsyncIterator, Callable, Optional
 
-from google import genai
-from google.genai import types
+from pydantic import BaseModel, Field, TypeAdapter, ValidationError, field_validator, model_validator
 
 from config import get_settings
 from models.schemas import (
-    Chapter, DialogueLine, ParsedDocument,
+    Chapter, DialogueLine, LLMCall, LLMUsage, ParsedDocument,
     PodcastScript, QuizQuestion,
 )
+from services.clients import get_genai_client
+from services.json_stream import IncrementalArrayParser
+from services.llm_cache import get_llm_cache, response_key
+from services.llm_providers import GeminiProvider, LLMRouter, SharedContext, build_router, gemini_usage
+from services.parse_jobs import document_tables, retrieval_index
+from services.rate_limiter import estimate_tokens, get_gemini_limiter, is_rate_limit_error, retry_delay_from
+from services.retrieval import PassageIndex
 
 logger   = logging.getLogger(__name__)
 settings = get_settings()
 
 MODEL = "gemini-2.5-flash"
 
+MAX_PROMPT_TABLES = 3      # tables injected into prompts
+MAX_TABLE_CHARS   = 1500   # total Markdown budget for those tables
+MAX_OUTLINE_TITLES = 30    # section titles listed in the chapter-planning prompt
+MIN_CHAPTERS      = 3
+
+# Generation config sent with every _ask call (also part of the response-cache key)
+GENERATION_CONFIG = {"temperature": 0.7, "response_mime_type": "application/json"}
+
+# Raised when no provider has a key (the Gemini key is the one most setups use)
+NO_LLM_KEY_ERROR = "No GOOGLE_API_KEY set in .env file. (or OPENAI/ANTHROPIC/OPENROUTER_API_KEY)"
+
+_STREAM_DONE = object()   # end-of-chapter marker in stream_dialogue's queue
+
+# Response validation outcomes per stage since start-up (see validation_stats)
+_VALIDATION: dict[str, Counter] = defaultdict(Counter)
+
+# Usage record and shared document context of the generate_script run in progress
+_USAGE:   ContextVar[Optional[LLMUsage]]      = ContextVar("llm_usage", default=None)
+_CONTEXT: ContextVar[Optional[SharedContext]] = ContextVar("llm_context", default=None)
+
+
+# ── Response schemas ──────────────────────────────────────────────────────────
+# Sent to the provider as the response JSON schema where it supports one, and
+# used to validate every answer before it is used (see _ask_json).
+
+class _PartSummary(BaseModel):
+    summary: str = Field(min_length=1)
+    key_points: list[str] = []
+
+
+class _PlannedChapter(BaseModel):
+    title: str = Field(min_length=1)
+    hook: str = ""
+    concepts: list[str] = []
+    parts: list[int] = []   # map-reduce planning only
+
+
+class _ChapterPlan(BaseModel):
+    chapters: list[_PlannedChapter] = Field(min_length=1)
+
+
+class _DialogueItem(BaseModel):
+    host: str = Field(pattern="^[ABab]$")
+    text: str = Field(min_length=1)
+
+
+class _QuizItem(BaseModel):
+    question: str = Field(min_length=1)
+    options: list[str] = Field(min_length=2)
+    correct_index: int
+    explanation: str = ""
+
+    @model_validator(mode="after")
+    def _answer_is_an_option(self) -> "_QuizItem":
+        if not 0 <= self.correct_index < len(self.options):
+            raise ValueError(f"correct_index {self.correct_index} is not an index into options")
+        return self
+
+
+class _StudyMaterials(BaseModel):
+    study_guide: str = Field(min_length=1)
+    quiz: list[_QuizItem] = Field(min_length=1)
+
+    @field_validator("study_guide", mode="before")
+    @classmethod
+    def _guide_as_text(cls, value: Any) -> Any:
+        # Gemini sometimes returns study_guide as a dict of sections
+        return _to_string(value) if isinstance(value, dict) else value
+
+
+_SUMMARY  = TypeAdapter(_PartSummary)
+_CHAPTERS = TypeAdapter(_ChapterPlan)
+_DIALOGUE = TypeAdapter(Annotated[list[_DialogueItem], Field(min_length=1)])
+_STUDY    = TypeAdapter(_StudyMaterials)
+_LINE     = TypeAdapter(_DialogueItem)
+
+
+@lru_cache
+def _response_schema(adapter: TypeAdapter) -> dict:
+    """JSON schema of `adapter` with $refs inlined (providers accept few schema keywords)."""
+    schema = adapter.json_schema()
+    defs   = schema.pop("$defs", {})
+
+    def resolve(node: Any) -> Any:
+        if isinstance(node, dict):
+            if "$ref" in node:
+                return resolve(defs[node["$ref"].rsplit("/", 1)[-1]])
+            return {k: resolve(v) for k, v in node.items()}
+        if isinstance(node, list):
+            return [resolve(v) for v in node]
+        return node
+    return resolve(schema)
+
+
+def _generation_config(schema: Optional[dict]) -> dict:
+    return {**GENERATION_CONFIG, "response_json_schema": schema} if schema else GENERATION_CONFIG
+
 
 def _get_client():
     if not settings.google_api_key:
         raise RuntimeError("No GOOGLE_API_KEY set in .env file.")
-    return genai.Client(api_key=settings.google_api_key)
+    return get_genai_client()
 
 
-async def _ask(prompt: str, retries: int = 4) -> str:
-    """Call Gemini asynchronously with automatic retry on rate limits."""
-    client = _get_client()
-    for attempt in range(retries):
-        try:
-            response = await client.aio.models.generate_content(
-                model    = MODEL,
-                contents = prompt,
-                config   = types.GenerateContentConfig(
-                    temperature        = 0.7,
-                    response_mime_type = "application/json",
-                ),
-            )
-            return response.text.strip()
-        except Exception as e:
-            err = str(e)
-            if "429" in err or "RESOURCE_EXHAUSTED" in err:
-                wait = 10 * (attempt + 1) # Reduced wait time
-                logger.warning(f"Rate limit hit. Waiting {wait}s (attempt {attempt+1}/{retries})...")
-                await asyncio.sleep(wait)
-            else:
-                logger.error(f"Gemini error: {e}")
-                raise RuntimeError(f"Gemini generation failed: {e}")
-    raise RuntimeError("Gemini rate limit exceeded after all retries.")
+@lru_cache
+def get_llm_router() -> LLMRouter:
+    # Late-bound so the Gemini provider always uses the current _get_client
+    return build_router(lambda: _get_client(), MODEL)
 
 
-def _safe_json(text: str, default: Any = None) -> Any:
-    """Parse JSON safely, stripping markdown fences if present."""
-    if default is None:
-        default = {}
+def llm_configured() -> bool:
+    return bool(get_llm_router().configured())
+
+
+def _call_llm(prompt: str, timeout: float = 60.0) -> str:
+    """
+    Blocking one-shot completion through OpenAI, falling back to OpenRouter.
+    For callers outside the event loop; async code goes through _ask.
+    """
+    router    = get_llm_router()
+    providers = [router.provider(name) for name in ("openai", "openrouter")]
+    providers = [p for p in providers if p is not None and p.configured]
+    if not providers:
+        raise RuntimeError("No LLM API key set (OPENAI_API_KEY or OPENROUTER_API_KEY).")
+    for i, provider in enumerate(providers):
+        try:
+            return provider.complete_sync(prompt, GENERATION_CONFIG, timeout=timeout)
+        except RuntimeError as e:
+            if i == len(providers) - 1:
+                raise
+            logger.warning(f"{provider.name} failed ({e}); trying {providers[i + 1].name}")
+
+
+def _record_call(
+    stage:         str,
+    provider:      str,
+    prompt:        str,
+    text:          str,
+    started:       float,
+    prompt_tokens: Optional[int] = None,
+    output_tokens: Optional[int] = None,
+    cached_tokens: int           = 0,
+) -> None:
+    """Add one call to the current run's usage; missing token counts are estimated."""
+    usage = _USAGE.get()
+    if usage is None:
+        return
+    cached = provider == "cache"
+    usage.add(LLMCall(
+        stage         = stage,
+        provider      = provider,
+        prompt_tokens = 0 if cached else prompt_tokens if prompt_tokens is not None else estimate_tokens(prompt),
+        output_tokens = 0 if cached else output_tokens if output_tokens is not None else estimate_tokens(text),
+        cached_tokens = cached_tokens,
+        latency_ms    = int((time.monotonic() - started) * 1000),
+        estimated     = not cached and (prompt_tokens is None or output_tokens is None),
+    ))
+
+
+def _fit(text: str, tokens: int) -> str:
+    """`text` cut to about `tokens` tokens (~4 characters each), at a word boundary."""
+    limit = max(0, tokens) * 4
+    if len(text) <= limit:
+        return text
+    cut = text.rfind(" ", 0, limit)
+    return text[:cut if cut > limit // 2 else limit].rstrip() + "..."
+
+
+async def _ask(
+    prompt:    str,
+    use_cache: bool = True,
+    stage:     str  = "",
+    context:   Optional[SharedContext] = None,
+    schema:    Optional[dict] = None,
+) -> str:
+    """
+    Answer a prompt through the provider router (fastest healthy provider,
+    hedged when slow; Gemini calls retry rate limits via the shared limiter).
+    `context` is the run's shared document context, sent by cache reference
+    where the provider holds it and inline otherwise; `schema` is the JSON
+    schema the answer must follow. Responses are cached on disk by (model,
+    full prompt, config), read and written in a worker thread; use_cache=False skips the lookup (a fresh answer
+    still refreshes the cache). Tokens and latency are recorded under `stage`
+    on the running job's usage.
+    """
+    started = time.monotonic()
+    config  = _generation_config(schema)
+    full    = context.inline(prompt) if context else prompt
+    cache   = get_llm_cache() if settings.llm_cache_enabled else None
+    key     = response_key(MODEL, full, config)
+    if cache is not None and use_cache:
+        cached = await asyncio.to_thread(cache.get, key)
+        if cached is not None:
+            logger.info(f"LLM cache hit ({key[:12]})")
+            _record_call(stage, "cache", full, cached, started)
+            return cached
+
+    completion = await get_llm_router().generate(prompt, config, context)
+    _record_call(
+        stage, completion.provider, full, completion.text, started,
+        completion.prompt_tokens, completion.output_tokens, completion.cached_tokens,
+    )
+    if cache is not None:
+        await asyncio.to_thread(cache.put, key, completion.text)
+    return completion.text
+
+
+async def _ask_stream(
+    prompt:    str,
+    retries:   int  = 4,
+    use_cache: bool = True,
+    stage:     str  = "",
+    context:   Optional[SharedContext] = None,
+    schema:    Optional[dict] = None,
+) -> AsyncIterator[str]:
+    """
+    Streaming variant of _ask: yields response text chunks as Gemini produces
+    them. A cached response is yielded as one chunk and a completed stream is
+    cached. Rate limits are only retried before the first chunk is yielded.
+    When the router would not pick Gemini (or the local stand-in) right now,
+    the routed, non-streamed answer is yielded as one chunk instead, and so is
+    the answer when the stream fails before its first chunk: Gemini is marked
+    failed and the router falls over to the next provider. Streams themselves
+    are not hedged; only the routed fallback is.
+    """
+    started = time.monotonic()
+    config  = _generation_config(schema)
+    full    = context.inline(prompt) if context else prompt
+    cache   = get_llm_cache() if settings.llm_cache_enabled else None
+    key     = response_key(MODEL, full, config)
+    if cache is not None and use_cache:
+        cached = await asyncio.to_thread(cache.get, key)
+        if cached is not None:
+            logger.info(f"LLM cache hit ({key[:12]})")
+            _record_call(stage, "cache", full, cached, started)
+            yield cached
+            return
+
+    ranked  = get_llm_router().ranked()
+    if not ranked or not isinstance(ranked[0], GeminiProvider):
+        yield await _ask(prompt, use_cache=False, stage=stage, context=context, schema=schema)
+        return
+
+    gemini  = ranked[0]   # Gemini or its offline stand-in
+    client  = gemini.client_factory()
+    limiter = get_gemini_limiter()
+    contents, gen_config = gemini.request(prompt, config, context)
+    error: Exception = RuntimeError("Gemini rate limit exceeded after all retries.")
+    for attempt in range(retries):
+        parts: list[str] = []
+        usage = None
+        failed = False
+        async with limiter.slot(estimate_tokens(contents)) as slot:
+            try:
+                stream = await client.aio.models.generate_content_stream(
+                    model    = gemini.model,
+                    contents = contents,
+                    config   = gen_config,
+                )
+                async for chunk in stream:
+                    usage = getattr(chunk, "usage_metadata", None) or usage
+                    if chunk.text:
+                        parts.append(chunk.text)
+                        yield chunk.text
+            except Exception as e:
+                if parts:
+                    logger.error(f"Gemini error: {e}")
+                    gemini.record_failure(e)
+                    raise RuntimeError(f"Gemini generation failed: {e}")
+                if not is_rate_limit_error(e):
+                    error, failed = e, True
+                else:
+                    logger.warning(f"Rate limit hit (attempt {attempt+1}/{retries}).")
+                    slot.rate_limited(retry_delay_from(e))
+                    continue
+            else:
+                slot.succeeded(getattr(usage, "total_token_count", None))
+        if failed:
+            break
+        text = "".join(parts).strip()
+        gemini.record_success(time.monotonic() - started)
+        _record_call(stage, gemini.name, full, text, started, *gemini_usage(usage))
+        if cache is not None:
+            await asyncio.to_thread(cache.put, key, text)
+        return
+
+    # Nothing was yielded yet: answer through the router, which skips the cooled-down Gemini
+    logger.warning(f"Gemini stream failed before its first chunk ({error}); falling back to the router")
+    gemini.record_failure(error)
+    yield await _ask(prompt, use_cache=False, stage=stage, context=context, schema=schema)
+
+
+def _strip_fences(text: str) -> str:
+    """Response text without the markdown code fences models like to add."""
     text = re.sub(r"^```(?:json)?\s*", "", text, flags=re.MULTILINE)
     text = re.sub(r"\s*```$",           "", text, flags=re.MULTILINE)
-    text = text.strip()
+    return text.strip()
+
+
+def _validate(raw: str, adapter: TypeAdapter) -> tuple[Any, Optional[str]]:
+    """(value, None) when `raw` is valid JSON for `adapter`, else (None, short error)."""
     try:
-        return json.loads(text)
-    except json.JSONDecodeError as e:
-        logger.warning(f"JSON parse failed: {e} | snippet: {text[:200]}")
-        return default
+        return adapter.validate_json(_strip_fences(raw)), None
+    except ValidationError as e:
+        problems = [f"{'.'.join(map(str, err['loc'])) or 'response'}: {err['msg']}" for err in e.errors()[:3]]
+        return None, "; ".join(problems)
+
+
+def _repair_prompt(prompt: str, raw: str, error: str) -> str:
+    return f"""{prompt}
+
+Your previous answer to this request did not match the required JSON structure.
+Problems: {error}
+
+Previous answer:
+{_fit(raw, 1000)}
+
+Return ONLY the corrected JSON."""
+
+
+def _count_validation(stage: str, outcome: str) -> None:
+    """Count a validation outcome (valid | invalid | repaired | failed) for `stage`."""
+    _VALIDATION[stage][outcome] += 1
+    usage = _USAGE.get()
+    if usage is not None and outcome == "invalid":
+        usage.invalid_responses[stage] = usage.invalid_responses.get(stage, 0) + 1
+
+
+def validation_stats() -> dict:
+    """Per-stage response validation counts and the share of responses that were invalid."""
+    stats = {}
+    for stage, counts in _VALIDATION.items():
+        responses    = counts["valid"] + counts["invalid"]
+        stats[stage] = {
+            "responses":    responses,
+            "invalid":      counts["invalid"],
+            "repaired":     counts["repaired"],
+            "failed":       counts["failed"],
+            "failure_rate": round(counts["invalid"] / responses, 4) if responses else 0.0,
+        }
+    return stats
+
+
+async def _ask_json(
+    prompt:  str,
+    adapter: TypeAdapter,
+    stage:   str,
+    context: Optional[SharedContext] = None,
+) -> Any:
+    """
+    Ask for JSON following `adapter`'s schema and return the validated value.
+    An invalid answer is dropped from the response cache and only this prompt
+    is retried, with a repair prompt quoting the problems, up to
+    LLM_REPAIR_ATTEMPTS times. Returns None when no answer validates.
+    """
+    schema = _response_schema(adapter)
+    raw    = await _ask(prompt, stage=stage, context=context, schema=schema)
+    return await _repaired(prompt, raw, adapter, stage, context)
+
+
+async def _repaired(
+    prompt:  str,
+    raw:     str,
+    adapter: TypeAdapter,
+    stage:   str,
+    context: Optional[SharedContext] = None,
+) -> Any:
+    """Validate the answer `raw` to `prompt`, asking for repairs while it is invalid (see _ask_json)."""
+    schema = _response_schema(adapter)
+    for attempt in range(settings.llm_repair_attempts + 1):
+        value, error = _validate(raw, adapter)
+        if error is None:
+            _count_validation(stage, "valid")
+            if attempt:
+                _count_validation(stage, "repaired")
+            return value
+        _count_validation(stage, "invalid")
+        logger.warning(f"Invalid {stage} response ({error}) | snippet: {raw[:200]}")
+        if attempt == 0:
+            await _forget(prompt, context, schema)
+        if attempt == settings.llm_repair_attempts:
+            break
+        raw = await _ask(
+            _repair_prompt(prompt, raw, error), use_cache=False,
+            stage=f"{stage}:repair", context=context, schema=schema,
+        )
+    _count_validation(stage, "failed")
+    return None
+
+
+async def _forget(prompt: str, context: Optional[SharedContext], schema: Optional[dict]) -> None:
+    """Drop the cached answer to `prompt` so a rerun does not replay an invalid response."""
+    if settings.llm_cache_enabled:
+        full = context.inline(prompt) if context else prompt
+        await asyncio.to_thread(get_llm_cache().remove, response_key(MODEL, full, _generation_config(schema)))
+
+
+async def _table_context(doc: ParsedDocument, sections) -> str:
+    """Markdown for the largest tables on the pages covered by `sections`."""
+    pages = {p for s in sections if s.has_tables for p in range(s.page_start, s.page_end + 1)}
+    if not pages:
+        return ""
+    tables = [t for page_tables in (await document_tables(doc, pages)).values() for t in page_tables]
+    tables = sorted(tables, key=lambda t: t.cells, reverse=True)[:MAX_PROMPT_TABLES]
+
+    parts, used = [], 0
+    for t in sorted(tables, key=lambda t: t.page):
+        if used + len(t.markdown) > MAX_TABLE_CHARS:
+            break
+        parts.append(f"(page {t.page})\n{t.markdown}")
+        used += len(t.markdown)
+    return "\n".join(parts)
 
 
 def _to_string(value: Any) -> str:
@@ -87,57 +462,196 @@ def _to_string(value: Any) -> str:
     return str(value)
 
 
-async def generate_script(doc: ParsedDocument) -> PodcastScript:
-    """Generate a full podcast script from a parsed document."""
-    if not settings.google_api_key:
-        raise RuntimeError("No GOOGLE_API_KEY set in .env file.")
+async def generate_script(
+    doc:     ParsedDocument,
+    on_line: Optional[Callable[[DialogueLine], None]] = None,
+    on_chapter: Optional[Callable[[int, list[DialogueLine]], None]] = None,
+    usage:   Optional[LLMUsage] = None,
+) -> PodcastScript:
+    """
+    Generate a podcast script (chapters and dialogue) from a parsed document.
+    `on_line` receives dialogue lines as they stream in and `on_chapter` each
+    chapter's complete dialogue as soon as it is done (see _generate_dialogue).
+    The study guide and quiz are not needed for audio and come separately from
+    generate_study_materials. Every LLM call is recorded on `usage` when one
+    is given.
+    """
+    if not llm_configured():
+        raise RuntimeError(NO_LLM_KEY_ERROR)
+
+    token = _USAGE.set(usage)
+    try:
+        script = await _generate_script(doc, on_line, on_chapter)
+    finally:
+        _USAGE.reset(token)
+    if usage is not None:
+        logger.info(
+            f"[{doc.job_id}] LLM usage: {len(usage.calls)} calls, "
+            f"{usage.prompt_tokens} prompt + {usage.output_tokens} output tokens"
+        )
+    return script
+
+
+async def _generate_script(
+    doc:        ParsedDocument,
+    on_line:    Optional[Callable[[DialogueLine], None]],
+    on_chapter: Optional[Callable[[int, list[DialogueLine]], None]],
+) -> PodcastScript:
 
     logger.info(f"[{doc.job_id}] Starting script generation with LLM (Turbo Mode)")
 
     # ── Step 1: Chapter structure ─────────────────────────────────────────────
     logger.info(f"[{doc.job_id}] Step 1: Generating structure...")
-    chapters_data = await _generate_chapters(doc)
-    logger.info(f"[{doc.job_id}] Got {len(chapters_data)} chapters")
-
-    # ── Step 2 & 3: Run Dialogue and Study Materials in Parallel ────────────────
-    logger.info(f"[{doc.job_id}] Step 2 & 3: Generating dialogue and materials in parallel...")
-    
-    dialogue_task = _generate_dialogue(doc, chapters_data)
-    materials_task = _generate_study_materials(doc)
-    
-    all_lines, (guide, quiz) = await asyncio.gather(dialogue_task, materials_task)
-    
-    logger.info(f"[{doc.job_id}] Got {len(all_lines)} dialogue lines and study materials.")
-
-    # ── Assemble final script ─────────────────────────────────────────────────
-    total_words = sum(len(l.text.split()) for l in all_lines)
-    total_secs  = int(total_words / 2.5)
-    chapters    = _build_chapters(chapters_data, all_lines)
-
-    result = PodcastScript(
-        job_id                       = doc.job_id,
-        paper_title                  = doc.metadata.get("title", doc.filename),
-        paper_authors                = doc.metadata.get("authors", "Unknown"),
-        total_estimated_duration_sec = total_secs,
-        chapters                     = chapters,
-        dialogue                     = all_lines,
-        study_guide                  = guide,
-        quiz_questions               = quiz,
-    )
+    parts = None
+    if doc.word_count >= settings.mapreduce_min_words:
+        # Long document: summarise every part first, then plan chapters over the summaries
+        parts = await _summarise_parts(doc)
+        logger.info(f"[{doc.job_id}] Summarised {len(parts)} parts for chapter planning")
+
+    # The paper overview is part of every later prompt: register it with the
+    # provider once and reference it, or send it inline where that is unavailable
+    router  = get_llm_router()
+    text    = await _paper_context(doc, parts)
+    if settings.context_cache_enabled:
+        context = await router.open_context(
+            text, settings.context_cache_ttl_s, settings.context_cache_min_tokens, f"paper-{doc.job_id}",
+        )
+    else:
+        context = SharedContext(text)
+    token = _CONTEXT.set(context)
+    try:
+        chapters_data = await _generate_chapters(doc, parts)
+        logger.info(f"[{doc.job_id}] Got {len(chapters_data)} chapters")
+
+        # ── Step 2: Dialogue for all chapters in parallel ─────────────────────────
+        logger.info(f"[{doc.job_id}] Step 2: Generating dialogue...")
+        all_lines = await _generate_dialogue(doc, chapters_data, on_line, on_chapter)
+        logger.info(f"[{doc.job_id}] Got {len(all_lines)} dialogue lines.")
+
+        # ── Assemble final script ─────────────────────────────────────────────────
+        total_words = sum(len(l.text.split()) for l in all_lines)
+        total_secs  = int(total_words / 2.5)
+        chapters    = _build_chapters(chapters_data, all_lines)
+
+        result = PodcastScript(
+            job_id                       = doc.job_id,
+            paper_title                  = doc.metadata.get("title", doc.filename),
+            paper_authors                = doc.metadata.get("authors", "Unknown"),
+            total_estimated_duration_sec = total_secs,
+            chapters                     = chapters,
+            dialogue                     = all_lines,
+        )
+    finally:
+        _CONTEXT.reset(token)
+        await router.close_context(context)
 
     logger.info(f"[{doc.job_id}] ✓ Script generation complete: {len(all_lines)} lines, {len(chapters)} chapters")
     return result
 
 
-async def _generate_chapters(doc: ParsedDocument) -> list[dict]:
-    """Generate chapter structure from document sections."""
-    sections = "\n".join(f"- {s.title}: {s.body[:150]}..." for s in doc.sections[:8])
+def _chapter_count(doc: ParsedDocument) -> int:
+    """Chapters to plan: one per WORDS_PER_CHAPTER words, between 3 and MAX_CHAPTERS."""
+    return max(MIN_CHAPTERS, min(settings.max_chapters, round(doc.word_count / max(1, settings.words_per_chapter))))
+
+
+def _section_parts(doc: ParsedDocument, tokens: int) -> list[list[int]]:
+    """Consecutive sections grouped into parts of about `tokens` tokens (indices into doc.sections)."""
+    parts, current, used = [], [], 0
+    for i, section in enumerate(doc.sections):
+        size = estimate_tokens(section.body)
+        if current and used + size > tokens:
+            parts.append(current)
+            current, used = [], 0
+        current.append(i)
+        used += size
+    if current:
+        parts.append(current)
+    return parts
+
+
+async def _summarise_parts(doc: ParsedDocument) -> list[dict]:
+    """
+    Map step for long documents: summarise each part of the document in
+    parallel, at most SUMMARY_CONCURRENCY calls at once. Returns one dict per
+    part with its section indices, page range, summary and key points.
+    """
+    limit = asyncio.Semaphore(settings.summary_concurrency)
+    title = doc.metadata.get("title", "Research Paper")
+
+    async def _summarise(n: int, indices: list[int]) -> dict:
+        sections = [doc.sections[i] for i in indices]
+        text     = _fit("\n\n".join(f"{s.title}\n{s.body}" for s in sections), settings.summary_part_tokens)
+        prompt   = f"""Summarise part {n} of an academic paper for a podcast producer.
+
+Paper: "{title}"
+Sections: {'; '.join(s.title for s in sections)}
 
-    prompt = f"""Create 3 podcast chapters for this academic paper.
+Text:
+{text}
 
+Return ONLY a JSON object:
+{{"summary": "3-5 sentence summary of this part", "key_points": ["...", "..."]}}"""
+        async with limit:
+            data = await _ask_json(prompt, _SUMMARY, "summary")
+        return {
+            "part":       n,
+            "sections":   indices,
+            "pages":      (sections[0].page_start, sections[-1].page_end),
+            "summary":    data.summary if data else _fit(text, 60),
+            "key_points": [k for k in data.key_points if k][:5] if data else [],
+        }
+
+    groups = _section_parts(doc, settings.summary_part_tokens)
+    return await asyncio.gather(*(_summarise(n + 1, g) for n, g in enumerate(groups)))
+
+
+async def _paper_context(doc: ParsedDocument, parts: Optional[list[dict]]) -> str:
+    """The paper overview every chapter, dialogue and study prompt builds on."""
+    return f"""Paper overview
 Title: {doc.metadata.get('title', 'Unknown')}
 Authors: {doc.metadata.get('authors', 'Unknown')}
-Sections found: {sections}
+{await _outline(doc, parts)}"""
+
+
+async def _shared(doc: ParsedDocument, parts: Optional[list[dict]] = None) -> SharedContext:
+    """The running generate_script's shared context, or an inline one outside a run."""
+    return _CONTEXT.get() or SharedContext(await _paper_context(doc, parts))
+
+
+async def _outline(doc: ParsedDocument, parts: Optional[list[dict]]) -> str:
+    """Document overview for chapter planning: part summaries, or section previews."""
+    if parts:
+        lines = []
+        for p in parts:
+            titles = "; ".join(doc.sections[i].title for i in p["sections"])
+            points = f" Key points: {'; '.join(p['key_points'])}." if p["key_points"] else ""
+            lines.append(f"[{p['part']}] (pages {p['pages'][0]}-{p['pages'][1]}; {titles}) {p['summary']}{points}")
+        return "Part summaries:\n" + "\n".join(lines)
+
+    # Section previews share the outline budget evenly
+    outline  = doc.sections[:8]
+    per_item = settings.outline_context_tokens // max(1, len(outline))
+    sections = "\n".join(f"- {s.title}: {_fit(s.body, per_item)}" for s in outline)
+    tables   = await _table_context(doc, doc.sections[:8])
+    tables   = f"\nKey tables:\n{tables}" if tables else ""
+    # Long papers: list the later section titles too, so chapters can cover them
+    later    = [s.title for s in doc.sections[8:8 + MAX_OUTLINE_TITLES]]
+    if later:
+        sections += "\nLater sections: " + "; ".join(later)
+    return f"Sections found: {sections}{tables}"
+
+
+async def _generate_chapters(doc: ParsedDocument, parts: Optional[list[dict]] = None) -> list[dict]:
+    """
+    Generate chapter structure from document sections, or (map-reduce mode)
+    from the part summaries, in which case each chapter lists its parts and
+    carries their summaries into its dialogue prompt.
+    """
+    count  = _chapter_count(doc)
+    cover  = " Together the chapters must cover the whole document, in order." if parts else ""
+    parts_field = ',\n      "parts": [1, 2]' if parts else ""
+
+    prompt = f"""Create {count} podcast chapters for the academic paper described above.{cover}
 
 Return ONLY a JSON object with no markdown:
 {{
@@ -146,17 +660,20 @@ Return ONLY a JSON object with no markdown:
       "id": 1,
       "title": "Short catchy chapter title",
       "hook": "Surprising opening question or fact",
-      "concepts": ["concept1", "concept2"]
+      "concepts": ["concept1", "concept2"]{parts_field}
     }}
   ]
 }}"""
 
-    raw      = await _ask(prompt)
-    data     = _safe_json(raw, default={"chapters": []})
-    chapters = data.get("chapters", [])
+    plan     = await _ask_json(prompt, _CHAPTERS, "chapters", await _shared(doc, parts))
+    chapters = [ch.model_dump() for ch in plan.chapters][:settings.max_chapters] if plan else []
 
+    by_part = {p["part"]: p for p in parts or []}
     for i, ch in enumerate(chapters):
         ch["id"] = i + 1
+        covered  = [by_part[n] for n in ch.pop("parts") if n in by_part]
+        if covered:
+            ch["summary"] = " ".join(p["summary"] for p in covered)
 
     if not chapters:
         logger.warning("No chapters returned — using fallback")
@@ -169,18 +686,125 @@ Return ONLY a JSON object with no markdown:
     return chapters
 
 
-async def _generate_dialogue(doc: ParsedDocument, chapters: list) -> list[DialogueLine]:
-    """Generate dialogue lines for all chapters in parallel."""
-    context = "\n\n".join(s.body[:400] for s in doc.sections[:7]) # Slightly more context
+async def _generate_dialogue(
+    doc:      ParsedDocument,
+    chapters: list,
+    on_line:  Optional[Callable[[DialogueLine], None]] = None,
+    on_chapter: Optional[Callable[[int, list[DialogueLine]], None]] = None,
+) -> list[DialogueLine]:
+    """
+    Generate dialogue lines for all chapters in parallel. In streaming mode
+    `on_line` is called for every line as soon as it has been parsed;
+    `on_chapter(chapter_id, lines)` fires as each chapter completes.
+    """
+    context = await _shared(doc)
+
+    async def _gen_chapter(prompt: str, chapter_id: int) -> list[DialogueLine]:
+        results = []
+        if settings.script_streaming:
+            async for line in _stream_chapter(prompt, chapter_id, context):
+                results.append(line)
+                if on_line:
+                    on_line(line)
+        else:
+            items   = await _ask_json(prompt, _DIALOGUE, "dialogue", context) or []
+            results = [_dialogue_line(item, chapter_id) for item in items]
+        if on_chapter:
+            on_chapter(chapter_id, results)
+        return results
+
+    # Run all chapter generations in parallel!
+    tasks = [_gen_chapter(prompt, cid) for prompt, cid in await _dialogue_prompts(doc, chapters)]
+    all_chapter_lines = await asyncio.gather(*tasks)
+    
+    # Flatten and return
+    return [line for sublist in all_chapter_lines for line in sublist]
+
+
+async def stream_dialogue(doc: ParsedDocument, chapters: list) -> AsyncIterator[DialogueLine]:
+    """
+    Yield DialogueLines as Gemini streams them. Chapters are generated
+    concurrently, so lines of different chapters interleave; within a chapter
+    they arrive in order and carry their chapter_id.
+    """
+    queue: asyncio.Queue = asyncio.Queue()
+    context = await _shared(doc)
+
+    async def _pump(prompt: str, chapter_id: int) -> None:
+        try:
+            async for line in _stream_chapter(prompt, chapter_id, context):
+                await queue.put(line)
+            await queue.put(_STREAM_DONE)
+        except Exception as e:
+            await queue.put(e)
+
+    tasks = [asyncio.create_task(_pump(p, cid)) for p, cid in await _dialogue_prompts(doc, chapters)]
+    try:
+        remaining = len(tasks)
+        while remaining:
+            item = await queue.get()
+            if item is _STREAM_DONE:
+                remaining -= 1
+            elif isinstance(item, Exception):
+                raise item
+            else:
+                yield item
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+async def _stream_chapter(
+    prompt:     str,
+    chapter_id: int,
+    context:    Optional[SharedContext] = None,
+) -> AsyncIterator[DialogueLine]:
+    """
+    Dialogue lines of one chapter as they stream in. Elements that fail
+    validation are skipped; if none validates, the chapter is re-asked with a
+    repair prompt (see _ask_json). A partly invalid stream counts as an
+    invalid response but keeps the lines already emitted.
+    """
+    schema = _response_schema(_DIALOGUE)
+    parser = IncrementalArrayParser()
+    chunks, emitted, skipped = [], 0, 0
+    async for chunk in _ask_stream(prompt, stage="dialogue", context=context, schema=schema):
+        chunks.append(chunk)
+        for ld in parser.feed(chunk):
+            try:
+                item = _LINE.validate_python(ld)
+            except ValidationError:
+                skipped += 1
+                continue
+            emitted += 1
+            yield _dialogue_line(item, chapter_id)
+
+    if emitted and not skipped:
+        _count_validation("dialogue", "valid")
+    elif emitted:
+        _count_validation("dialogue", "invalid")
+        logger.warning(f"Chapter {chapter_id}: skipped {skipped} invalid dialogue lines")
+    else:
+        for item in await _repaired(prompt, "".join(chunks), _DIALOGUE, "dialogue", context) or []:
+            yield _dialogue_line(item, chapter_id)
+
+
+async def _dialogue_prompts(doc: ParsedDocument, chapters: list) -> list[tuple[str, int]]:
+    """(prompt, chapter id) for every chapter."""
+    prompts = []
+    index   = await retrieval_index(doc)
+    for i, chapter in enumerate(chapters):
+        context, sections = _chapter_context(doc, chapter, index)
+        tables  = await _table_context(doc, sections)
+        tables  = f"\nKey tables from the paper:\n{tables}" if tables else ""
 
-    async def _gen_chapter(i: int, chapter: dict) -> list[DialogueLine]:
         is_first = i == 0
         is_last  = i == len(chapters) - 1
 
         intro = "Open with a podcast welcome and tease the paper's most interesting finding." if is_first else "Continue the conversation smoothly."
         outro = "End with an encouraging sign-off and tell listeners to take the quiz!" if is_last else "End by teasing the next chapter."
 
-        prompt = f"""Write podcast dialogue between two hosts.
+        prompt = f"""Write podcast dialogue between two hosts about the paper described above.
 Host A: Curious, funny, asks simple relatable questions.
 Host B: Knowledgeable expert, explains clearly with fun analogies.
 
@@ -188,7 +812,7 @@ Chapter: "{chapter.get('title', 'Discussion')}"
 Opening hook: "{chapter.get('hook', 'Let us explore this topic')}"
 Key concepts: {', '.join(chapter.get('concepts', ['the main ideas']))}
 
-Paper context: {context[:2000]}
+Paper context: {context}{tables}
 
 1. {intro}
 2. Host A opens with the hook in their first line.
@@ -198,36 +822,63 @@ Paper context: {context[:2000]}
 
 Return ONLY a JSON array:
 [ {{"host": "A", "text": "..."}}, {{"host": "B", "text": "..."}} ]"""
+        prompts.append((prompt, chapter["id"]))
+    return prompts
 
-        raw = await _ask(prompt)
-        lines_data = _safe_json(raw, default=[])
-        
-        results = []
-        if isinstance(lines_data, list):
-            for ld in lines_data:
-                if isinstance(ld, dict) and "host" in ld and "text" in ld:
-                    results.append(DialogueLine(
-                        host       = str(ld["host"]).upper(),
-                        text       = str(ld["text"]).strip(),
-                        chapter_id = chapter["id"],
-                    ))
-        return results
 
-    # Run all chapter generations in parallel!
-    tasks = [_gen_chapter(i, ch) for i, ch in enumerate(chapters[:3])]
-    all_chapter_lines = await asyncio.gather(*tasks)
-    
-    # Flatten and return
-    return [line for sublist in all_chapter_lines for line in sublist]
+def _chapter_context(doc: ParsedDocument, chapter: dict, index: PassageIndex) -> tuple[str, list]:
+    """
+    Passages most relevant to the chapter (BM25 over title, hook and concepts)
+    within the chapter token budget, plus the sections they come from. In
+    map-reduce mode the summaries of the chapter's parts come first and share
+    the budget. Falls back to the opening of the first sections when nothing
+    matches.
+    """
+    budget  = settings.chapter_context_tokens
+    summary = _fit(chapter["summary"], budget // 3) if chapter.get("summary") else ""
+    prefix  = f"Summary: {summary}\n\n" if summary else ""
+    budget -= estimate_tokens(prefix) if summary else 0
+
+    query  = " ".join([chapter.get("title", ""), chapter.get("hook", ""), *chapter.get("concepts", [])])
+    chosen = index.select(query, budget)
+    if not chosen:
+        context = "\n\n".join(s.body[:400] for s in doc.sections[:7])
+        return prefix + _fit(context, budget), doc.sections[:7]
+    owners  = sorted({int(index.section[p]) for p in chosen})
+    context = "\n\n".join(index.passages[p] for p in chosen)
+    return prefix + context, [doc.sections[i] for i in owners if i < len(doc.sections)]
+
+
+def _dialogue_line(item: _DialogueItem, chapter_id: int) -> DialogueLine:
+    return DialogueLine(host=item.host.upper(), text=item.text.strip(), chapter_id=chapter_id)
+
+
+async def generate_study_materials(
+    doc:   ParsedDocument,
+    usage: Optional[LLMUsage] = None,
+) -> tuple[str, list[QuizQuestion]]:
+    """
+    Study guide and quiz for a parsed document, independent of the script so
+    they stay off the time-to-audio path. LLM calls are recorded on `usage`.
+    """
+    if not llm_configured():
+        raise RuntimeError(NO_LLM_KEY_ERROR)
+
+    token = _USAGE.set(usage)
+    try:
+        return await _generate_study_materials(doc)
+    finally:
+        _USAGE.reset(token)
 
 
 async def _generate_study_materials(doc: ParsedDocument) -> tuple[str, list[QuizQuestion]]:
     """Generate study guide and quiz questions."""
-    text_sample = doc.raw_text[:5000]
+    text_sample = _fit(doc.raw_text, settings.study_context_tokens)
 
-    prompt = f"""Create study materials for this academic paper.
+    prompt = f"""Create study materials for the academic paper described above.
 
-Paper: "{doc.metadata.get('title', 'Research Paper')}"
+Paper text:
+{text_sample}
 
 Return ONLY a JSON object:
 {{
@@ -244,28 +895,20 @@ Return ONLY a JSON object:
 
 Write exactly 6 quiz questions."""
 
-    raw  = await _ask(prompt)
-    data = _safe_json(raw, default={"study_guide": "Study guide unavailable.", "quiz": []})
-
-    # ── Fix: Gemini sometimes returns study_guide as a dict ───────────────────
-    raw_guide = data.get("study_guide", "Study guide unavailable.")
-    guide     = _to_string(raw_guide)
-
-    raw_quiz   = data.get("quiz", [])
-    questions  = []
+    materials = await _ask_json(prompt, _STUDY, "study", await _shared(doc))
+    if materials is None:
+        return "Study guide unavailable.", []
 
-    for q in raw_quiz:
-        try:
-            questions.append(QuizQuestion(
-                question      = q["question"],
-                options       = q["options"],
-                correct_index = int(q["correct_index"]),
-                explanation   = q.get("explanation", ""),
-            ))
-        except Exception as e:
-            logger.warning(f"Skipping bad quiz question: {e}")
-
-    return guide, questions
+    questions = [
+        QuizQuestion(
+            question      = q.question,
+            options       = q.options,
+            correct_index = q.correct_index,
+            explanation   = q.explanation,
+        )
+        for q in materials.quiz
+    ]
+    return materials.study_guide, questions
 
 
 def _build_chapters(chapters_data: list[dict], lines: list[DialogueLine]) -> list[Chapter]:
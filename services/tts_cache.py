@@ -0,0 +1,56 @@
+"""
+services/tts_cache.py — Persistent cache of synthesised dialogue segments.
+
+Entries are the MP3 bytes ElevenLabs returned, keyed by a hash of (voice,
+model, voice settings, normalised text), so retried jobs, re-generated
+scripts and stock phrases such as sign-offs are rendered once. Files live in a
+DiskCache (size-bounded LRU, atomic writes) shared by all jobs and workers.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import re
+import unicodedata
+from functools import lru_cache
+from typing import Optional
+
+from config import get_settings
+from services.disk_cache import DiskCache
+
+_SPACE_RE = re.compile(r"\s+")
+
+
+def normalise_text(text: str) -> str:
+    """Text as spoken: Unicode NFC with runs of whitespace collapsed."""
+    return _SPACE_RE.sub(" ", unicodedata.normalize("NFC", text)).strip()
+
+
+def segment_key(voice_id: str, model: str, voice_settings: dict, text: str) -> str:
+    payload = json.dumps(
+        {"voice": voice_id, "model": model, "settings": voice_settings, "text": normalise_text(text)},
+        sort_keys=True,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class TTSCache:
+    """Disk-backed cache of synthesised MP3 segments with size-bounded LRU eviction."""
+
+    def __init__(self, directory, max_bytes: int):
+        self.store = DiskCache(directory, max_bytes)
+
+    def get(self, key: str) -> Optional[bytes]:
+        return self.store.read_bytes(f"{key}.mp3")
+
+    def put(self, key: str, audio: bytes) -> None:
+        self.store.write_bytes(f"{key}.mp3", audio)
+
+    def stats(self) -> dict:
+        return self.store.stats()
+
+
+@lru_cache
+def get_tts_cache() -> TTSCache:
+    settings = get_settings()
+    return TTSCache(settings.tts_cache_dir, max_bytes=settings.tts_cache_max_mb * 1024 * 1024)
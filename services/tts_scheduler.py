@@ -0,0 +1,138 @@
+"""
+services/tts_scheduler.py — Process-wide fair scheduler for ElevenLabs requests.
+
+Every TTS request of every job waits in one FairScheduler: the AIMD window
+and 429 cooldown of rate_limiter.AIMDController, shared by all jobs, with
+slots granted round-robin across jobs, so a long podcast cannot starve a
+short one, and within a job the earliest line first, so audio is ready in the
+order it will be played.
+"""
+from __future__ import annotations
+
+import asyncio
+import heapq
+import itertools
+import time
+from collections import Counter, deque
+from contextlib import asynccontextmanager
+from functools import lru_cache
+from typing import AsyncIterator, Optional
+
+from config import get_settings
+from services.rate_limiter import AIMDController, Slot
+
+_BACKOFF_BASE = 1.0    # seconds; doubled per consecutive 429 without a server hint
+_BACKOFF_MAX  = 30.0
+
+
+class FairScheduler(AIMDController):
+    """AIMD concurrency window shared by all jobs, granted round-robin across jobs."""
+
+    def __init__(
+        self,
+        max_concurrency:  int,
+        min_concurrency:  int   = 1,
+        latency_target_s: float = 10.0,
+    ):
+        super().__init__(
+            "ElevenLabs", max_concurrency, min_concurrency, initial_limit=5, latency_target_s=latency_target_s,
+            backoff_base=_BACKOFF_BASE, backoff_max=_BACKOFF_MAX,
+        )
+        self._running: Counter = Counter()                 # in-flight requests per job
+        self._queues: dict[str, list] = {}                 # job -> heap of (order, seq, future)
+        self._turns: deque[str] = deque()                  # jobs with waiters, in round-robin order
+        self._seq    = itertools.count()
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._timer_loop: Optional[asyncio.AbstractEventLoop] = None
+
+    # ── Acquire / release ─────────────────────────────────────────────────────
+
+    async def acquire(self, job: str, order=0) -> None:
+        """Wait for a slot; `order` ranks the job's own requests (lowest first)."""
+        fut = asyncio.get_running_loop().create_future()
+        if job not in self._queues:
+            self._queues[job] = []
+            self._turns.append(job)
+        heapq.heappush(self._queues[job], (order, next(self._seq), fut))
+        self._dispatch()
+        try:
+            await fut
+        except asyncio.CancelledError:
+            if fut.done() and not fut.cancelled():
+                self._release(job)          # granted just before the cancellation
+            raise
+
+    def _release(self, job: str) -> None:
+        self.in_flight   -= 1
+        self._running[job] -= 1
+        if self._running[job] <= 0:
+            del self._running[job]
+        self._dispatch()
+
+    def _dispatch(self) -> None:
+        """Grant free slots to waiting requests, one job at a time in turn."""
+        wait = self.cooldown_until - time.monotonic()
+        if wait > 0:
+            self._wake_after(wait)
+            return
+        while self.in_flight < int(self.limit) and self._turns:
+            job   = self._turns.popleft()
+            queue = self._queues[job]
+            while queue and queue[0][2].done():     # cancelled while waiting
+                heapq.heappop(queue)
+            if queue:
+                _, _, fut = heapq.heappop(queue)
+                fut.set_result(None)
+                self.in_flight    += 1
+                self._running[job] += 1
+            if queue:
+                self._turns.append(job)
+            else:
+                del self._queues[job]
+
+    def _wake_after(self, delay: float) -> None:
+        loop = asyncio.get_running_loop()
+        if self._timer is not None and self._timer_loop is loop and self._timer.when() > loop.time():
+            return
+        self._timer      = loop.call_later(delay, self._dispatch)
+        self._timer_loop = loop
+
+    @asynccontextmanager
+    async def slot(self, job: str, order=0) -> AsyncIterator[Slot]:
+        """Hold one slot for `job`; report the outcome through the yielded Slot."""
+        await self.acquire(job, order)
+        outcome = Slot()
+        start   = time.monotonic()
+        try:
+            yield outcome
+        finally:
+            if outcome.throttled:
+                self._on_throttle(outcome.retry_after)
+            elif outcome.ok:
+                self._on_success(time.monotonic() - start)
+            self._release(job)
+
+    # ── Metrics ───────────────────────────────────────────────────────────────
+
+    def stats(self) -> dict:
+        queued = {job: sum(not f.done() for _, _, f in q) for job, q in self._queues.items()}
+        return {
+            "limit":            round(self.limit, 2),
+            "in_flight":        self.in_flight,
+            "queued":           sum(queued.values()),
+            "jobs":             len(set(queued) | set(self._running)),
+            "queued_by_job":    {job: n for job, n in queued.items() if n},
+            "in_flight_by_job": dict(self._running),
+            "throttles":        self.throttles,
+            "completed":        self.completed,
+            "cooldown_s":       round(max(0.0, self.cooldown_until - time.monotonic()), 2),
+        }
+
+
+@lru_cache
+def get_tts_scheduler() -> FairScheduler:
+    settings = get_settings()
+    return FairScheduler(
+        max_concurrency  = settings.tts_max_concurrency,
+        latency_target_s = settings.tts_latency_target_s,
+    )
@@ -7,6 +7,7 @@ import asyncio
 import io
 import logging
 import random
+import uuid
 from dataclasses import dataclass
 
 import httpx
@@ -14,12 +15,17 @@ from pydub import AudioSegment
 from pydub.generators import Sine
 
 from config import get_settings
+from models.schemas import TTSUsage
+from services.clients import get_elevenlabs_http
+from services.tts_cache import get_tts_cache, segment_key
+from services.tts_scheduler import get_tts_scheduler
 
 logger   = logging.getLogger(__name__)
 settings = get_settings()
 
 ELEVENLABS_BASE   = "https://api.elevenlabs.io/v1"
 TTS_MODEL         = "eleven_turbo_v2"
+VOICE_SETTINGS    = {"stability": 0.5, "similarity_boost": 0.75}
 PAUSE_HOST_SWITCH = 600  # ms
 
 
@@ -39,9 +45,15 @@ class SynthesisedLine:
 
 # ── Public API ────────────────────────────────────────────────────────────────
 
-async def synthesise_script(script, voice_pair: str = "FM") -> list[SynthesisedLine]:
+async def synthesise_script(
+    script,
+    voice_pair: str = "FM",
+    usage:      TTSUsage | None = None,
+) -> list[SynthesisedLine]:
     """
     Accept a PodcastScript object and synthesise dialogue lines in parallel.
+    Lines rendered before (same voice and text) come from the segment cache;
+    lookups are counted on `usage`.
     """
     if not hasattr(script, "dialogue"):
         raise RuntimeError(f"Expected PodcastScript object, got {type(script).__name__}")
@@ -51,55 +63,72 @@ async def synthesise_script(script, voice_pair: str = "FM") -> list[SynthesisedL
         logger.error("Script has no dialogue lines.")
         return []
 
+    synthesised = await synthesise_lines(dialogue, voice_pair=voice_pair, job_id=script.job_id, usage=usage)
+    logger.info(f"TTS complete: {len(synthesised)} segments synthesised in parallel.")
+    if usage is not None:
+        logger.info(f"TTS cache: {usage.cache_hits} hits, {usage.cache_misses} misses ({usage.hit_rate:.0%})")
+    return synthesised
+
+
+async def synthesise_lines(
+    dialogue,
+    voice_pair: str = "FM",
+    job_id:     str | None = None,
+    usage:      TTSUsage | None = None,
+) -> list[SynthesisedLine]:
+    """
+    Synthesise a list of dialogue lines (a whole script or one chapter),
+    returning segments in line order. ElevenLabs requests wait in the shared
+    TTS scheduler, which takes turns between jobs (`job_id`; each call without
+    one counts as its own job) and serves each job's earliest lines first.
+    Pass the job's `usage` to count segment cache hits.
+    """
     voice_a, voice_b = settings.voice_ids_for_pair(voice_pair)
     voice_map = {"A": voice_a, "B": voice_b}
-
-    # Concurrency control: 5 simultaneous requests to ElevenLabs
-    semaphore = asyncio.Semaphore(5)
+    job       = job_id or f"call-{uuid.uuid4().hex[:8]}"
 
     async def _process_line(idx: int, line) -> tuple[int, SynthesisedLine | None]:
-        async with semaphore:
-            if hasattr(line, "host"):
-                host       = str(line.host).upper()
-                text       = str(line.text).strip()
-                chapter_id = getattr(line, "chapter_id", None)
-            elif isinstance(line, dict):
-                host       = str(line.get("host", "A")).upper()
-                text       = str(line.get("text", "")).strip()
-                chapter_id = line.get("chapter_id")
-            else:
-                return idx, None
-
-            if not text:
-                return idx, None
-
-            voice_id = voice_map.get(host, voice_a)
-            logger.info(f"Synthesising line {idx+1}/{len(dialogue)} for Host {host}")
-
-            try:
-                audio, synthetic = await _tts_with_retry(http, voice_id, text)
-                return idx, SynthesisedLine(
-                    host        = host,
-                    text        = text,
-                    audio       = audio,
-                    duration_ms = len(audio),
-                    chapter_id  = chapter_id,
-                    synthetic   = synthetic,
-                )
-            except Exception as e:
-                logger.error(f"Failed to synthesise line {idx}: {e}")
-                raise
-
-    async with httpx.AsyncClient(timeout=90.0) as http:
-        tasks   = [_process_line(i, line) for i, line in enumerate(dialogue)]
-        results = await asyncio.gather(*tasks)
+        if hasattr(line, "host"):
+            host       = str(line.host).upper()
+            text       = str(line.text).strip()
+            chapter_id = getattr(line, "chapter_id", None)
+        elif isinstance(line, dict):
+            host       = str(line.get("host", "A")).upper()
+            text       = str(line.get("text", "")).strip()
+            chapter_id = line.get("chapter_id")
+        else:
+            return idx, None
+
+        if not text:
+            return idx, None
+
+        voice_id = voice_map.get(host, voice_a)
+        logger.info(f"Synthesising line {idx+1}/{len(dialogue)} for Host {host}")
+
+        try:
+            # Chapters are scripted in order, so (chapter, line) is the playback order
+            audio, synthetic = await _tts_with_retry(
+                http, voice_id, text, usage, job=job, order=(chapter_id or 0, idx),
+            )
+            return idx, SynthesisedLine(
+                host        = host,
+                text        = text,
+                audio       = audio,
+                duration_ms = len(audio),
+                chapter_id  = chapter_id,
+                synthetic   = synthetic,
+            )
+        except Exception as e:
+            logger.error(f"Failed to synthesise line {idx}: {e}")
+            raise
+
+    http    = get_elevenlabs_http()   # app-scoped pool, closed on shutdown
+    tasks   = [_process_line(i, line) for i, line in enumerate(dialogue)]
+    results = await asyncio.gather(*tasks)
 
     # Sort results by original index and filter out None
     sorted_results = sorted([r for r in results if r[1] is not None], key=lambda x: x[0])
-    synthesised    = [r[1] for r in sorted_results]
-
-    logger.info(f"TTS complete: {len(synthesised)} segments synthesised in parallel.")
-    return synthesised
+    return [r[1] for r in sorted_results]
 
 
 # ── Internal Helpers ──────────────────────────────────────────────────────────
@@ -108,6 +137,9 @@ async def _tts_with_retry(
     http:     httpx.AsyncClient,
     voice_id: str,
     text:     str,
+    usage:    TTSUsage | None = None,
+    job:      str = "",
+    order:    tuple = (0, 0),
 ) -> tuple[AudioSegment, bool]:
 
     # No API key — use synthetic fallback
@@ -115,6 +147,37 @@ async def _tts_with_retry(
         logger.warning("No ElevenLabs API key — using synthetic audio")
         return _generate_synthetic_speech(text), True
 
+    cache = get_tts_cache() if settings.tts_cache_enabled else None
+    key   = segment_key(voice_id, TTS_MODEL, VOICE_SETTINGS, text)
+    data  = await asyncio.to_thread(cache.get, key) if cache is not None else None
+    if usage is not None and cache is not None:
+        usage.record(hit=data is not None)
+    if data is not None:
+        return _decode_mp3(data), False
+
+    audio, data = await _request_tts(http, voice_id, text, job, order)
+    if cache is not None:
+        await asyncio.to_thread(cache.put, key, data)
+    return audio, False
+
+
+def _decode_mp3(data: bytes) -> AudioSegment:
+    return AudioSegment.from_file(io.BytesIO(data), format="mp3")
+
+
+async def _request_tts(
+    http:     httpx.AsyncClient,
+    voice_id: str,
+    text:     str,
+    job:      str,
+    order:    tuple,
+) -> tuple[AudioSegment, bytes]:
+    """
+    Decoded audio and MP3 bytes for `text` from ElevenLabs, retrying rate
+    limits and bad responses. Every attempt waits for a scheduler slot; a 429
+    makes the whole process back off, not just this request.
+    """
+    scheduler = get_tts_scheduler()
     url     = f"{ELEVENLABS_BASE}/text-to-speech/{voice_id}"
     headers = {
         "xi-api-key":   settings.elevenlabs_api_key,
@@ -123,23 +186,25 @@ async def _tts_with_retry(
     payload = {
         "text":           text,
         "model_id":       TTS_MODEL,
-        "voice_settings": {"stability": 0.5, "similarity_boost": 0.75},
+        "voice_settings": VOICE_SETTINGS,
     }
 
     for attempt in range(3):
         try:
-            resp = await http.post(url, headers=headers, json=payload)
+            async with scheduler.slot(job, order) as slot:
+                resp = await http.post(url, headers=headers, json=payload)
 
-            if resp.status_code == 429:
-                await asyncio.sleep(2 ** attempt)
-                continue
+                if resp.status_code == 429:
+                    slot.rate_limited(_retry_after(resp))
+                    continue
 
-            if resp.status_code != 200:
-                body = resp.text[:200]
-                raise TTSFailure(f"ElevenLabs returned {resp.status_code}: {body}")
+                if resp.status_code != 200:
+                    body = resp.text[:200]
+                    raise TTSFailure(f"ElevenLabs returned {resp.status_code}: {body}")
 
-            audio = AudioSegment.from_file(io.BytesIO(resp.content), format="mp3")
-            return audio, False
+                audio = _decode_mp3(resp.content)
+                slot.succeeded()
+                return audio, resp.content
 
         except TTSFailure:
             raise
@@ -152,6 +217,13 @@ async def _tts_with_retry(
     raise TTSFailure("Unable to synthesise speech")
 
 
+def _retry_after(resp) -> float | None:
+    try:
+        return float(resp.headers.get("retry-after"))
+    except (AttributeError, TypeError, ValueError):
+        return None
+
+
 def _generate_synthetic_speech(text: str) -> AudioSegment:
     """Fallback: generate beep tones when no ElevenLabs key is available."""
     word_count       = len(text.split())
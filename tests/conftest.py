@@ -0,0 +1,27 @@
+import fitz
+import pytest
+
+
+def _write_pdf(path, pages=6):
+    """Write a small multi-section PDF to `path`."""
+    doc = fitz.open()
+    headings = ["Introduction", "Methods", "Results"]
+    for i in range(pages):
+        page = doc.new_page()
+        if i % 2 == 0:
+            page.insert_text((72, 80), headings[(i // 2) % len(headings)], fontsize=16)
+        for j in range(8):
+            page.insert_text((72, 120 + j * 30), f"Line {j} of page {i + 1} about the method", fontsize=10)
+    doc.save(str(path))
+    doc.close()
+    return path
+
+
+@pytest.fixture
+def make_pdf():
+    return _write_pdf
+
+
+@pytest.fixture
+def sample_pdf(tmp_path):
+    return _write_pdf(tmp_path / "sample.pdf")
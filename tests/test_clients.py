@@ -0,0 +1,15 @@
+from fastapi.testclient import TestClient
+
+import services.clients as clients
+from main import app
+
+
+def test_clients_are_app_scoped_and_closed_on_shutdown():
+    with TestClient(app) as live:
+        http = clients.get_elevenlabs_http()
+        assert clients.get_elevenlabs_http() is http
+        stats = clients.client_pool_stats()["elevenlabs"]
+        assert stats["max_connections"] > 0 and stats["open"] == 0
+        assert "http_pools" in live.get("/api/metrics").json()
+    assert http.is_closed
+    assert clients.client_pool_stats() == {"gemini": None, "elevenlabs": None, "llm": None}
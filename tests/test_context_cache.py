@@ -0,0 +1,120 @@
+import asyncio
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+from google import genai
+from google.genai import types
+
+import services.script_generator as sg
+from config import get_settings
+from models.schemas import LLMUsage, ParsedDocument, ParsedSection
+from services.llm_providers import build_router
+from services.local_llm import local_answer
+
+doc = ParsedDocument(
+    job_id="ctx", filename="ctx.pdf", total_pages=2, word_count=40,
+    sections=[
+        ParsedSection(title="Intro", body="Caching shared prompt prefixes.", page_start=1, page_end=1),
+        ParsedSection(title="Results", body="Time to first token drops.", page_start=2, page_end=2),
+    ],
+    raw_text="Caching shared prompt prefixes.\n\nTime to first token drops.",
+    metadata={"title": "Context Caching", "authors": "X"},
+)
+
+
+class _GeminiStandIn(BaseHTTPRequestHandler):
+    """Just enough of the Gemini REST API: cachedContents plus (stream)generateContent."""
+
+    def log_message(self, *args):
+        pass
+
+    def _send(self, status, payload, sse=False):
+        data = (f"data: {json.dumps(payload)}\r\n\r\n" if sse else json.dumps(payload)).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "text/event-stream" if sse else "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_POST(self):
+        server = self.server
+        body   = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        if self.path.startswith("/v1beta/cachedContents"):
+            if server.refuse_cache:
+                return self._send(400, {"error": {"code": 400, "message": "too small", "status": "INVALID_ARGUMENT"}})
+            name = f"cachedContents/c{len(server.caches) + 1}"
+            server.caches[name] = body["contents"][0]["parts"][0]["text"]
+            return self._send(200, {"name": name, "model": body["model"]})
+
+        server.requests.append(body)
+        prompt = body["contents"][-1]["parts"][0]["text"]
+        cached = len(server.caches.get(body.get("cachedContent"), "")) // 4
+        return self._send(200, {
+            "candidates":    [{"content": {"role": "model", "parts": [{"text": local_answer(prompt)}]}, "finishReason": "STOP"}],
+            "usageMetadata": {"promptTokenCount": len(prompt) // 4 + cached, "candidatesTokenCount": 50,
+                              "cachedContentTokenCount": cached, "totalTokenCount": len(prompt) // 4 + cached + 50},
+        }, sse="alt=sse" in self.path)
+
+    def do_DELETE(self):
+        self.server.deleted.append(self.path)
+        self._send(200, {})
+
+
+@pytest.fixture
+def stand_in():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _GeminiStandIn)
+    server.caches, server.requests, server.deleted, server.refuse_cache = {}, [], [], False
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+
+
+def _generate(monkeypatch, server, streaming):
+    settings = get_settings()
+    for key in ("openai_api_key", "anthropic_api_key", "openrouter_api_key"):
+        monkeypatch.setattr(settings, key, "")
+    monkeypatch.setattr(settings, "google_api_key", "test-key")
+    monkeypatch.setattr(settings, "llm_providers", "gemini")
+    monkeypatch.setattr(settings, "llm_cache_enabled", False)
+    monkeypatch.setattr(settings, "script_streaming", streaming)
+    monkeypatch.setattr(settings, "context_cache_min_tokens", 1)
+
+    client = genai.Client(
+        api_key      = "test-key",
+        http_options = types.HttpOptions(base_url=f"http://127.0.0.1:{server.server_port}"),
+    )
+    router = build_router(lambda: client, sg.MODEL)
+    monkeypatch.setattr(sg, "get_llm_router", lambda: router)
+    usage  = LLMUsage()
+    script = asyncio.run(sg.generate_script(doc, usage=usage))
+    return script, usage
+
+
+@pytest.mark.parametrize("streaming", [False, True])
+def test_shared_context_is_cached_once_and_referenced_by_every_call(monkeypatch, stand_in, streaming):
+    script, usage = _generate(monkeypatch, stand_in, streaming)
+
+    assert len(script.dialogue) >= 36
+    (name, cached_text), = stand_in.caches.items()
+    assert "Paper overview" in cached_text and "Context Caching" in cached_text
+    assert len(stand_in.requests) == 4                      # chapters, 3 dialogues
+    for body in stand_in.requests:
+        assert body["cachedContent"] == name
+        assert "Paper overview" not in json.dumps(body["contents"])
+    assert all(call.cached_tokens > 0 for call in usage.calls)
+    assert stand_in.deleted == [f"/v1beta/{name}"]
+
+
+def test_context_is_sent_inline_when_caching_is_refused(monkeypatch, stand_in):
+    stand_in.refuse_cache = True
+    script, usage = _generate(monkeypatch, stand_in, streaming=False)
+
+    assert len(script.dialogue) >= 36
+    assert stand_in.caches == {} and stand_in.deleted == []
+    assert len(stand_in.requests) == 4
+    for body in stand_in.requests:
+        assert "cachedContent" not in body
+        assert "Paper overview" in body["contents"][-1]["parts"][0]["text"]
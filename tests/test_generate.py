@@ -0,0 +1,170 @@
+import asyncio
+import json
+
+import routers.generate as gen
+import services.script_generator as sg
+from config import get_settings
+from models.schemas import DialogueLine, ParsedDocument, ParsedSection, PodcastScript
+
+doc = ParsedDocument(
+    job_id="pipe", filename="pipe.pdf", total_pages=1, word_count=2,
+    sections=[ParsedSection(title="Intro", body="Text", page_start=1, page_end=1)],
+    raw_text="Text", metadata={"title": "Pipe"},
+)
+
+
+def test_chapter_tts_starts_before_the_script_is_finished(monkeypatch):
+    monkeypatch.setattr(get_settings(), "script_streaming", False)
+    delays = {"One": 0.0, "Two": 0.05, "Three": 0.1}
+    events = []
+
+    async def fake_ask(prompt, *a, **kw):
+        title = next(t for t in delays if f'Chapter: "{t}"' in prompt)
+        await asyncio.sleep(delays[title])
+        events.append(f"scripted {title}")
+        return f'[{{"host": "A", "text": "{title} a"}}, {{"host": "B", "text": "{title} b"}}]'
+
+    async def fake_tts(lines, voice_pair="FM", job_id=None, usage=None):
+        events.append(f"tts {lines[0].chapter_id}")
+        await asyncio.sleep(0)
+        return [line.text for line in lines]
+
+    monkeypatch.setattr(sg, "_ask", fake_ask)
+    monkeypatch.setattr(gen, "synthesise_lines", fake_tts)
+    chapters = [{"id": i + 1, "title": t} for i, t in enumerate(delays)]
+
+    async def run():
+        tasks = {}
+
+        def on_chapter(chapter_id, lines):
+            tasks[chapter_id] = asyncio.create_task(fake_tts(lines))
+
+        lines  = await sg._generate_dialogue(doc, chapters, on_chapter=on_chapter)
+        script = PodcastScript(
+            job_id="pipe", paper_title="Pipe", paper_authors="X", total_estimated_duration_sec=0,
+            chapters=[], dialogue=lines, study_guide="", quiz_questions=[],
+        )
+        return await gen._collect_synthesis(script, tasks, "FM", "pipe")
+
+    segments = asyncio.run(run())
+    assert segments == ["One a", "One b", "Two a", "Two b", "Three a", "Three b"]
+    assert events.index("tts 1") < events.index("scripted Two")
+    assert events.index("tts 2") < events.index("scripted Three")
+
+
+def test_collect_synthesis_covers_lines_without_an_early_task(monkeypatch):
+    async def fake_tts(lines, voice_pair="FM", job_id=None, usage=None):
+        return [line.text for line in lines]
+
+    monkeypatch.setattr(gen, "synthesise_lines", fake_tts)
+    dialogue = [DialogueLine(host="A", text=t, chapter_id=c) for t, c in [("x", 1), ("y", 2), ("z", 2)]]
+    script = PodcastScript(
+        job_id="pipe", paper_title="Pipe", paper_authors="X", total_estimated_duration_sec=0,
+        chapters=[], dialogue=dialogue, study_guide="", quiz_questions=[],
+    )
+
+    async def run():
+        early = {1: asyncio.create_task(fake_tts(dialogue[:1]))}
+        return await gen._collect_synthesis(script, early, "FM", "pipe")
+
+    assert asyncio.run(run()) == ["x", "y", "z"]
+
+
+def test_long_documents_are_summarised_in_parallel_and_get_more_chapters(monkeypatch):
+    settings = get_settings()
+    monkeypatch.setattr(settings, "script_streaming", False)
+    monkeypatch.setattr(settings, "mapreduce_min_words", 1000)
+    monkeypatch.setattr(settings, "words_per_chapter", 500)
+    monkeypatch.setattr(settings, "summary_part_tokens", 1000)
+    monkeypatch.setattr(settings, "summary_concurrency", 2)
+    monkeypatch.setattr(settings, "context_cache_enabled", False)
+
+    body     = " ".join(f"word{i}" for i in range(250))
+    sections = [ParsedSection(title=f"S{i}", body=body, page_start=i, page_end=i) for i in range(1, 13)]
+    long_doc = ParsedDocument(
+        job_id="long", filename="long.pdf", total_pages=12, word_count=3000,
+        sections=sections, raw_text=body, metadata={"title": "Long"},
+    )
+    in_flight, peak, prompts = 0, 0, {}
+
+    async def fake_ask(prompt, *a, stage="", context=None, **kw):
+        nonlocal in_flight, peak
+        prompts.setdefault(stage, []).append(context.inline(prompt) if context else prompt)
+        if stage == "summary":
+            in_flight += 1
+            peak = max(peak, in_flight)
+            await asyncio.sleep(0.01)
+            in_flight -= 1
+            return '{"summary": "part summary", "key_points": ["k"]}'
+        if stage == "chapters":
+            chapters = [{"title": f"C{i}", "hook": "h", "concepts": ["c"], "parts": [i + 1]} for i in range(6)]
+            return json.dumps({"chapters": chapters})
+        if stage == "dialogue":
+            return '[{"host": "A", "text": "a"}, {"host": "B", "text": "b"}]'
+        return '{"study_guide": "g", "quiz": []}'
+
+    monkeypatch.setattr(sg, "_ask", fake_ask)
+    monkeypatch.setattr(sg, "llm_configured", lambda: True)
+    script = asyncio.run(sg.generate_script(long_doc))
+
+    assert len(prompts["summary"]) == 6 and peak == 2             # 2 sections per part, bounded map step
+    assert "Create 6 podcast chapters" in prompts["chapters"][0]
+    assert "[6] (pages 11-12; S11; S12) part summary" in prompts["chapters"][0]
+    assert len(prompts["dialogue"]) == 6 and len(script.chapters) == 6
+    assert all("Summary: part summary" in p for p in prompts["dialogue"])
+    assert {line.chapter_id for line in script.dialogue} == set(range(1, 7))
+
+
+def test_study_materials_are_generated_once_off_the_pipeline_and_awaited_on_use(monkeypatch):
+    from models.schemas import JobStatus, JobStatusResponse, QuizQuestion
+
+    calls = []
+
+    async def fake_study(document, usage=None):
+        calls.append(document.job_id)
+        await asyncio.sleep(0.01)
+        return "guide", [QuizQuestion(question="q", options=["a", "b"], correct_index=1, explanation="")]
+
+    async def fake_parse(pdf_path, job_id, mode, sha256=None, word_budget=0):
+        return doc, True
+
+    monkeypatch.setattr(gen, "generate_study_materials", fake_study)
+    monkeypatch.setattr("services.parse_jobs.run_parse", fake_parse)
+    script = PodcastScript(
+        job_id="study", paper_title="Pipe", paper_authors="X", total_estimated_duration_sec=0,
+        chapters=[], dialogue=[],
+    )
+    monkeypatch.setitem(gen._JOB_STORE, "study", JobStatusResponse(job_id="study", status=JobStatus.SYNTHESISING, script=script))
+    monkeypatch.setitem(gen._STUDY_ARGS, "study", ("study.pdf", doc.parse_mode, None, 0))
+
+    async def run():
+        first = gen.schedule_study_materials("study")
+        assert gen.schedule_study_materials("study") is first
+        return await asyncio.gather(gen.await_study_materials("study"), gen.await_study_materials("study"))
+
+    job, _ = asyncio.run(run())
+    gen._STUDY_TASKS.pop("study", None)
+    assert calls == ["pipe"]
+    assert job.study_ready and job.script.study_guide == "guide" and len(job.script.quiz_questions) == 1
+    assert "study" not in gen._STUDY_ARGS
+
+
+def test_pending_study_materials_expire(monkeypatch):
+    monkeypatch.setattr(gen, "_STUDY_ARGS", {"old": ("old.pdf", None, None, 0), "new": ("new.pdf", None, None, 0)})
+    monkeypatch.setattr(gen, "_STUDY_AT", {"old": gen.time.monotonic() - gen._STUDY_TTL_S - 1, "new": gen.time.monotonic()})
+    monkeypatch.setattr(gen, "_STUDY_TASKS", {})
+    gen._prune_study()
+    assert list(gen._STUDY_ARGS) == ["new"] and list(gen._STUDY_AT) == ["new"]
+
+
+def test_study_materials_mode_setting_is_validated_at_startup(monkeypatch):
+    import pytest
+    from pydantic import ValidationError
+    from config import Settings
+
+    assert Settings().study_materials_mode == "background"
+    monkeypatch.setenv("STUDY_MATERIALS_MODE", "lazy")
+    assert Settings().study_materials_mode == "lazy"
+    monkeypatch.setenv("STUDY_MATERIALS_MODE", "backgound")
+    with pytest.raises(ValidationError):
+        Settings()
@@ -0,0 +1,115 @@
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+import services.parse_cache as pc
+from config import get_settings
+from main import app
+from services.parse_cache import ParseCache
+
+client = TestClient(app)
+
+
+@pytest.fixture
+def upload_dir(tmp_path, monkeypatch):
+    settings = get_settings()
+    monkeypatch.setattr(settings, "upload_dir", tmp_path)
+    cache = ParseCache(tmp_path / "cache", max_bytes=10 * 1024 * 1024)
+    monkeypatch.setattr(pc, "get_parse_cache", lambda: cache)
+    return tmp_path
+
+
+def test_ingest_streams_upload_and_records_hash(upload_dir, sample_pdf):
+    with open(sample_pdf, "rb") as f:
+        response = client.post("/api/ingest", files={"file": ("paper.pdf", f, "application/pdf")})
+    assert response.status_code == 200
+    job_id = response.json()["job_id"]
+
+    meta = json.loads((upload_dir / f"{job_id}.meta.json").read_text())
+    assert meta["sha256"] == pc.file_sha256(sample_pdf)
+    assert (upload_dir / f"{job_id}.pdf").read_bytes() == sample_pdf.read_bytes()
+
+
+def test_ingest_rejects_oversized_upload(upload_dir, monkeypatch):
+    monkeypatch.setattr(get_settings(), "max_pdf_size_mb", 1)
+    payload = b"%PDF-1.4\n" + b"0" * (2 * 1024 * 1024)
+    response = client.post("/api/ingest", files={"file": ("big.pdf", payload, "application/pdf")})
+    assert response.status_code == 413
+    assert not list(upload_dir.glob("*.pdf"))
+
+
+def test_chunked_upload_is_cut_off_before_the_form_is_spooled(upload_dir, monkeypatch):
+    import routers.ingest as ingest
+
+    monkeypatch.setattr(get_settings(), "max_pdf_size_mb", 1)
+    monkeypatch.setattr(ingest, "_save_upload", lambda *a, **kw: pytest.fail("body reached the route"))
+    body = (
+        b'--b\r\nContent-Disposition: form-data; name="file"; filename="big.pdf"\r\n'
+        b"Content-Type: application/pdf\r\n\r\n" + b"0" * (2 * 1024 * 1024) + b"\r\n--b--\r\n"
+    )
+    chunks   = (body[i:i + 64 * 1024] for i in range(0, len(body), 64 * 1024))
+    response = client.post("/api/ingest", content=chunks, headers={"content-type": "multipart/form-data; boundary=b"})
+    assert response.request.headers.get("transfer-encoding") == "chunked"
+    assert response.status_code == 413
+    assert not list(upload_dir.glob("*.pdf"))
+
+
+def test_save_upload_aborts_once_running_size_passes_limit(tmp_path):
+    import asyncio, io
+    from fastapi import HTTPException, UploadFile
+    from routers.ingest import _save_upload
+
+    upload = UploadFile(file=io.BytesIO(b"x" * 3_000_000), filename="big.pdf")
+    dest   = tmp_path / "big.pdf"
+    with pytest.raises(HTTPException) as exc:
+        asyncio.run(_save_upload(upload, dest, limit=1_500_000))
+    assert exc.value.status_code == 413
+    assert not dest.exists()
+
+
+def test_async_ingest_returns_202_and_can_be_polled(upload_dir, sample_pdf):
+    import time
+
+    # keep one event loop alive across requests so the background parse can finish
+    with TestClient(app) as live, open(sample_pdf, "rb") as f:
+        response = live.post(
+            "/api/ingest",
+            files={"file": ("paper.pdf", f, "application/pdf")},
+            data={"async_parse": "true"},
+        )
+        assert response.status_code == 202
+        job_id = response.json()["job_id"]
+
+        for _ in range(100):
+            status = live.get(f"/api/ingest/{job_id}").json()
+            if status["status"] in ("done", "error"):
+                break
+            time.sleep(0.05)
+    assert status["status"] == "done"
+    assert status["result"]["total_pages"] == 6
+
+
+def test_finished_async_parses_keep_no_document_and_expire(upload_dir, sample_pdf, monkeypatch):
+    import routers.ingest as ingest
+
+    with TestClient(app) as live, open(sample_pdf, "rb") as f:
+        job_id = live.post(
+            "/api/ingest",
+            files={"file": ("paper.pdf", f, "application/pdf")},
+            data={"async_parse": "true"},
+        ).json()["job_id"]
+        for task in list(ingest._PARSE_TASKS):
+            live.portal.call(lambda: task)          # wait for the background parse
+
+        assert ingest._PARSE_JOBS[job_id].result.sections        # a summary, not the document
+        misses = pc.get_parse_cache().stats()["misses"]
+        hits   = pc.get_parse_cache().stats()["hits"]
+        for _ in range(3):
+            result = live.get(f"/api/ingest/{job_id}").json()["result"]
+            assert result["total_pages"] == 6 and "raw_text" not in result
+        assert (pc.get_parse_cache().stats()["hits"], pc.get_parse_cache().stats()["misses"]) == (hits, misses)
+
+        monkeypatch.setattr(ingest, "_PARSE_JOB_TTL_S", -1)
+        ingest._prune_parse_jobs()
+        assert live.get(f"/api/ingest/{job_id}").status_code == 404
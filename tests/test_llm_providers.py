@@ -0,0 +1,79 @@
+import asyncio
+
+import pytest
+
+from services.llm_providers import Completion, LLMProvider, LLMRouter
+
+
+class FakeProvider(LLMProvider):
+    def __init__(self, name, delay, fail=False, configured=True):
+        super().__init__(window=20)
+        self.name        = name
+        self.delay       = delay
+        self.fail        = fail
+        self._configured = configured
+        self.started     = 0
+        self.cancelled   = 0
+
+    @property
+    def configured(self):
+        return self._configured
+
+    async def generate(self, prompt, config, context=None):
+        self.started += 1
+        try:
+            await asyncio.sleep(self.delay)
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        if self.fail:
+            raise RuntimeError(f"{self.name} down")
+        return Completion(self.name, self.name)
+
+
+def test_router_prefers_the_fastest_measured_provider():
+    slow, fast = FakeProvider("slow", 0), FakeProvider("fast", 0)
+    for _ in range(5):
+        slow.record_success(2.0)
+        fast.record_success(0.5)
+    router = LLMRouter([slow, fast, FakeProvider("off", 0, configured=False)], hedging=False)
+
+    assert [p.name for p in router.ranked()] == ["fast", "slow"]
+    assert asyncio.run(router.generate("q", {})).text == "fast"
+
+
+def test_slow_primary_is_hedged_and_the_loser_cancelled():
+    primary, backup = FakeProvider("primary", 1.0), FakeProvider("backup", 0.01)
+    router = LLMRouter([primary, backup], hedging=True, hedge_after_s=0.05)
+
+    assert asyncio.run(router.generate("q", {})).text == "backup"
+    assert router.hedges == 1 and router.hedge_wins == 1
+    assert primary.cancelled == 1 and router.hedges_in_flight == 0
+
+
+def test_failed_provider_falls_over_and_cools_down():
+    broken, ok = FakeProvider("broken", 0, fail=True), FakeProvider("ok", 0)
+    router = LLMRouter([broken, ok], hedging=False)
+
+    assert asyncio.run(router.generate("q", {})).text == "ok"
+    assert not broken.healthy() and broken.failures == 1
+    assert [p.name for p in router.ranked()] == ["ok"]
+
+
+def test_router_without_providers_raises():
+    with pytest.raises(RuntimeError):
+        asyncio.run(LLMRouter([FakeProvider("off", 0, configured=False)]).generate("q", {}))
+
+
+def test_openai_compatible_requests_send_only_object_root_schemas():
+    import services.script_generator as sg
+    from services.llm_providers import OpenAICompatibleProvider
+
+    provider = OpenAICompatibleProvider("openai", "https://api.example", "openai_api_key", "openai_model", 20)
+
+    _, _, body = provider._request("plan", sg._generation_config(sg._response_schema(sg._CHAPTERS)))
+    assert body["response_format"]["type"] == "json_schema"
+    assert body["response_format"]["json_schema"]["schema"]["type"] == "object"
+
+    _, _, body = provider._request("dialogue", sg._generation_config(sg._response_schema(sg._DIALOGUE)))
+    assert "response_format" not in body and body["temperature"] == 0.7
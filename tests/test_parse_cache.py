@@ -0,0 +1,190 @@
+import services.parse_cache as pc
+from models.schemas import ParseMode
+from services.disk_cache import DiskCache
+from services.parse_cache import ParseCache, file_sha256, load_or_parse
+
+
+def test_disk_cache_evicts_least_recently_used(tmp_path):
+    cache = DiskCache(tmp_path, max_bytes=250)
+    cache.write_bytes("a", b"x" * 100)
+    cache.write_bytes("b", b"x" * 100)
+    assert cache.read_bytes("a") is not None      # a is now the most recent
+    cache.write_bytes("c", b"x" * 100)
+
+    assert cache.contains("a") and cache.contains("c")
+    assert not cache.contains("b")
+    assert cache.stats()["evictions"] == 1
+
+
+def test_full_disk_cache_is_not_rescanned_on_every_write(tmp_path, monkeypatch):
+    import services.disk_cache as dc
+
+    cache = DiskCache(tmp_path, max_bytes=100_000)
+    for i in range(100):
+        cache.write_bytes(f"warm{i}", b"x" * 1000)
+
+    scans     = []
+    real_scan = dc.os.scandir
+    monkeypatch.setattr(dc.os, "scandir", lambda path: scans.append(path) or real_scan(path))
+    for i in range(200):
+        cache.write_bytes(f"new{i}", b"x" * 1000)
+
+    assert len(scans) <= 20                              # one rescan per ~10% of the budget
+    assert cache.stats()["bytes"] <= cache.max_bytes
+    cache.write_bytes("new0", b"x" * 1000)               # overwrites are not counted twice
+    assert cache.stats()["bytes"] == sum(p.stat().st_size for p in tmp_path.iterdir())
+
+
+def test_same_pdf_is_parsed_once_across_jobs(tmp_path, monkeypatch, make_pdf):
+    cache = ParseCache(tmp_path / "cache", max_bytes=10 * 1024 * 1024)
+    monkeypatch.setattr(pc, "get_parse_cache", lambda: cache)
+    calls = []
+    real_parse = pc.parse_pdf
+    monkeypatch.setattr(pc, "parse_pdf", lambda *a, **kw: calls.append(1) or real_parse(*a, **kw))
+
+    first  = make_pdf(tmp_path / "job1.pdf")
+    second = tmp_path / "job2.pdf"
+    second.write_bytes(first.read_bytes())
+
+    doc1, hit1 = load_or_parse(first, "job1", ParseMode.DEEP)
+    doc2, hit2 = load_or_parse(second, "job2", ParseMode.STANDARD)   # deep entry satisfies standard
+
+    assert (hit1, hit2) == (False, True)
+    assert len(calls) == 1
+    assert doc2.job_id == "job2" and doc2.filename == "job2.pdf"
+    assert doc2.sections == doc1.sections
+    assert file_sha256(second) == file_sha256(first)
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 1
+
+
+def test_table_index_is_stored_beside_the_parse(tmp_path, monkeypatch):
+    import fitz
+
+    pdf = fitz.open()
+    page = pdf.new_page()
+    page.insert_text((72, 60), "Table 1: Results", fontsize=10)
+    for r in range(3):
+        for c in range(2):
+            page.draw_rect(fitz.Rect(72 + c * 100, 80 + r * 20, 172 + c * 100, 100 + r * 20))
+            page.insert_text((76 + c * 100, 94 + r * 20), f"r{r}c{c}", fontsize=9)
+    path = tmp_path / "table.pdf"
+    pdf.save(str(path))
+
+    cache = ParseCache(tmp_path / "cache", max_bytes=10 * 1024 * 1024)
+    monkeypatch.setattr(pc, "get_parse_cache", lambda: cache)
+
+    load_or_parse(path, "job1", ParseMode.STANDARD)
+    doc, hit = load_or_parse(path, "job2", ParseMode.STANDARD)
+    assert hit and doc.tables == {}      # index is not part of the document JSON
+
+    tables = pc.get_tables(doc, [1, 2])
+    assert list(tables) == [1]
+    assert tables[1][0].rows == 3 and tables[1][0].cols == 2
+    assert "| r0c0 | r0c1 |" in tables[1][0].markdown
+
+
+def test_cache_hits_keep_the_side_indexes_as_recent_as_the_document(tmp_path, monkeypatch, sample_pdf):
+    import os
+
+    cache = ParseCache(tmp_path / "cache", max_bytes=10 * 1024 * 1024)
+    monkeypatch.setattr(pc, "get_parse_cache", lambda: cache)
+    load_or_parse(sample_pdf, "job1", ParseMode.STANDARD)
+    for entry in (tmp_path / "cache").iterdir():     # age every file equally
+        os.utime(entry, ns=(1, 1))
+
+    doc, hit = load_or_parse(sample_pdf, "job2", ParseMode.STANDARD)
+    assert hit
+    assert all(entry.stat().st_mtime_ns > 1 for entry in (tmp_path / "cache").iterdir())
+    assert pc.get_retrieval_index(doc).passages
+
+
+def test_budgeted_parse_is_partial_and_completes_on_demand(tmp_path, monkeypatch, make_pdf):
+    from config import get_settings
+
+    cache = ParseCache(tmp_path / "cache", max_bytes=10 * 1024 * 1024)
+    monkeypatch.setattr(pc, "get_parse_cache", lambda: cache)
+    monkeypatch.setattr(get_settings(), "upload_dir", tmp_path)
+    pdf = make_pdf(tmp_path / "job1.pdf", pages=6)
+
+    doc, _ = load_or_parse(pdf, "job1", ParseMode.STANDARD, word_budget=100)
+    assert doc.is_partial and doc.pages_parsed < doc.total_pages
+
+    full = pc.ensure_complete(doc)
+    assert full is doc and not doc.is_partial
+    assert doc.sections[-1].page_end == 6
+    assert doc.job_id == "job1"
+
+
+def test_tables_past_a_budget_are_completed_off_the_event_loop(tmp_path, monkeypatch, make_pdf):
+    import asyncio
+    import threading
+    from config import get_settings
+    from services.parse_jobs import document_tables
+
+    cache = ParseCache(tmp_path / "cache", max_bytes=10 * 1024 * 1024)
+    monkeypatch.setattr(pc, "get_parse_cache", lambda: cache)
+    monkeypatch.setattr(get_settings(), "upload_dir", tmp_path)
+    pdf = make_pdf(tmp_path / "job1.pdf", pages=6)
+    doc, _ = load_or_parse(pdf, "job1", ParseMode.STANDARD, word_budget=100)
+
+    # The synchronous lookup never parses: it only sees the pages already indexed
+    pc.get_tables(doc, [6])
+    assert doc.is_partial
+
+    parsed_on = []
+    real_parse = pc.parse_pdf
+    monkeypatch.setattr(pc, "parse_pdf", lambda *a, **kw: parsed_on.append(threading.current_thread()) or real_parse(*a, **kw))
+
+    asyncio.run(document_tables(doc, [6]))
+    assert not doc.is_partial
+    assert parsed_on and threading.main_thread() not in parsed_on
+
+
+def test_decoded_document_equals_the_original_before_raw_text_is_read(sample_pdf):
+    from services.doc_codec import decode_document, encode_document
+    from services.pdf_parser import parse_pdf
+
+    doc = parse_pdf(sample_pdf, job_id="job1", mode=ParseMode.STANDARD)
+    assert decode_document(encode_document(doc)) == doc
+    assert doc == decode_document(encode_document(doc))
+    other = decode_document(encode_document(doc.model_copy(update={"job_id": "job2"})))
+    assert decode_document(encode_document(doc)) != other
+
+
+def test_compact_format_round_trips_and_reads_legacy_json(tmp_path, monkeypatch, sample_pdf):
+    from services.doc_codec import decode_document, encode_document
+    from services.pdf_parser import parse_pdf
+
+    doc = parse_pdf(sample_pdf, job_id="job1", mode=ParseMode.STANDARD)
+    for compress in (True, False):
+        loaded = decode_document(encode_document(doc, compress=compress))
+        assert "raw_text" not in loaded.__dict__       # derived on first access
+        assert loaded.raw_text == doc.raw_text
+        assert loaded == doc
+
+    # Entries written as JSON by older versions are still served
+    cache = ParseCache(tmp_path / "cache", max_bytes=10 * 1024 * 1024)
+    monkeypatch.setattr(pc, "get_parse_cache", lambda: cache)
+    sha = file_sha256(sample_pdf)
+    cache.store.write_bytes(f"{pc.content_key(sha, ParseMode.STANDARD)}.parsed.json", doc.model_dump_json().encode())
+    cached, hit = load_or_parse(sample_pdf, "job2", ParseMode.STANDARD)
+    assert hit and cached.sections == doc.sections
+
+
+def test_retrieval_index_is_loaded_off_the_event_loop(monkeypatch, sample_pdf):
+    import asyncio
+    import threading
+    from services.parse_jobs import retrieval_index
+    from services.pdf_parser import parse_pdf
+    from services.retrieval import PassageIndex
+
+    doc = parse_pdf(sample_pdf, job_id="job1", mode=ParseMode.STANDARD)
+    assert doc.retrieval is None
+    built_on   = []
+    real_build = PassageIndex.build
+    monkeypatch.setattr(PassageIndex, "build", lambda *a: built_on.append(threading.current_thread()) or real_build(*a))
+
+    index = asyncio.run(retrieval_index(doc))
+    assert index.passages and doc.retrieval is index
+    assert built_on and threading.main_thread() not in built_on
+    assert asyncio.run(retrieval_index(doc)) is index and len(built_on) == 1
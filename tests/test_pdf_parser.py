@@ -0,0 +1,138 @@
+import pytest
+
+from config import get_settings
+from models.schemas import ParseMode
+from services.pdf_parser import mode_satisfies, parse_pdf
+
+
+def test_parse_pdf_extracts_sections(sample_pdf):
+    doc = parse_pdf(sample_pdf, job_id="t1")
+    assert doc.total_pages == 6
+    assert [s.title for s in doc.sections][:3] == ["Introduction", "Methods", "Results"]
+    assert doc.word_count == len(doc.raw_text.split())
+
+
+def test_parallel_parse_matches_serial(sample_pdf, monkeypatch):
+    settings = get_settings()
+    monkeypatch.setattr(settings, "parse_parallel_min_pages", 10_000)
+    serial = parse_pdf(sample_pdf, job_id="t2")
+
+    monkeypatch.setattr(settings, "parse_parallel_min_pages", 2)
+    monkeypatch.setattr(settings, "parse_workers", 2)
+    parallel = parse_pdf(sample_pdf, job_id="t2")
+
+    assert parallel == serial
+
+
+@pytest.mark.parametrize("mode", list(ParseMode))
+def test_parse_modes_record_mode_and_keep_sections(sample_pdf, mode):
+    deep = parse_pdf(sample_pdf, job_id="t3", mode=ParseMode.DEEP)
+    doc  = parse_pdf(sample_pdf, job_id="t3", mode=mode)
+    assert doc.parse_mode == mode
+    assert [s.title for s in doc.sections] == [s.title for s in deep.sections]
+    assert doc.raw_text == deep.raw_text
+
+
+def test_mode_satisfies_ordering():
+    assert mode_satisfies(ParseMode.DEEP, ParseMode.FAST)
+    assert mode_satisfies(ParseMode.STANDARD, ParseMode.STANDARD)
+    assert not mode_satisfies(ParseMode.FAST, ParseMode.STANDARD)
+
+
+def test_parse_mode_setting_is_validated_at_startup(monkeypatch):
+    from pydantic import ValidationError
+    from config import Settings
+
+    assert Settings().parse_mode is ParseMode.DEEP
+    monkeypatch.setenv("PARSE_MODE", "standard")
+    assert Settings().parse_mode is ParseMode.STANDARD
+    monkeypatch.setenv("PARSE_MODE", "stadnard")
+    with pytest.raises(ValidationError):
+        Settings()
+
+
+def test_segment_sections_on_block_store_ranges():
+    from services.block_store import BlockStore
+    from services.pdf_parser import _classify_headings, _segment_sections
+
+    store = BlockStore.from_pages([
+        (1, (["Paper Title", "Preamble text"], [20.0, 10.0], [False, False], [0.3, 0.5])),
+        (2, (["Introduction", "Methods", "body a", "body b"], [10.0] * 4, [False] * 4, [0.5] * 4)),
+        (3, (["more body", "Results", "final"], [10.0] * 3, [False] * 3, [0.5] * 3)),
+    ])
+    _classify_headings(store)
+    assert store.is_heading.tolist() == [True, False, True, True, False, False, False, True, False]
+    assert store.join(3, 5) == "Methods body a"
+
+    sections = _segment_sections(store, table_pages={3}, eq_pages=set())
+    assert [(s.title, s.body, s.page_start, s.page_end, s.has_tables) for s in sections] == [
+        ("Paper Title", "Preamble text", 1, 2, False),
+        ("Methods", "body a body b more body", 2, 3, True),
+        ("Results", "final", 3, 3, True),
+    ]
+
+
+def test_running_headers_and_references_are_stripped(tmp_path):
+    import fitz
+
+    doc = fitz.open()
+    for i in range(5):
+        page = doc.new_page()
+        page.insert_text((72, 40), "Journal of Testing, Vol. 12", fontsize=8)
+        if i == 0:
+            page.insert_text((72, 100), "Introduction", fontsize=16)
+        if i == 3:
+            page.insert_text((72, 100), "References", fontsize=16)
+        for j in range(6):
+            page.insert_text((72, 140 + j * 30), f"Body line {j} on page {i + 1}", fontsize=10)
+        page.insert_text((300, 770), str(i + 1), fontsize=8)
+    path = tmp_path / "running.pdf"
+    doc.save(str(path))
+    doc.close()
+
+    kept = parse_pdf(path, job_id="t4", strip_references=False)
+    assert "Journal of Testing" not in kept.raw_text
+    assert kept.chars_removed["running_headers"] == 5 * len("Journal of Testing, Vol. 12")
+    assert kept.chars_removed["page_numbers"] == 5
+    assert "References" in [s.title for s in kept.sections]
+
+    stripped = parse_pdf(path, job_id="t4", strip_references=True)
+    assert "References" not in [s.title for s in stripped.sections]
+    assert "page 4" not in stripped.raw_text and "page 3" in stripped.raw_text
+    assert stripped.chars_removed["references"] > 0
+
+
+def test_concurrent_parses_share_one_pool_and_a_broken_pool_is_only_discarded(monkeypatch):
+    import threading
+    import time
+
+    import services.pdf_parser as pp
+
+    created = []
+
+    class FakePool:
+        def __init__(self, max_workers, mp_context=None):
+            time.sleep(0.01)              # widen the window for a creation race
+            created.append(self)
+            self.shutdowns = []
+
+        def shutdown(self, wait=True, cancel_futures=False):
+            self.shutdowns.append(cancel_futures)
+
+    monkeypatch.setattr(pp, "ProcessPoolExecutor", FakePool)
+    monkeypatch.setattr(pp, "_POOL", None)
+    monkeypatch.setattr(pp, "_POOL_SIZE", 0)
+
+    pools   = []
+    threads = [threading.Thread(target=lambda: pools.append(pp._get_pool(4))) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(created) == 1 and all(p is created[0] for p in pools)
+
+    pp._discard_pool(created[0])
+    assert created[0].shutdowns == [False]          # running work elsewhere is not cancelled
+    assert pp._get_pool(4) is not created[0]
+    pp._discard_pool(created[0])                    # a stale pool never replaces the current one
+    assert pp._POOL is created[1]
@@ -0,0 +1,60 @@
+import asyncio
+import time
+
+from services.rate_limiter import AdaptiveLimiter, TokenBucket, retry_delay_from
+
+
+def test_limiter_caps_concurrency_and_adapts_to_429s():
+    limiter = AdaptiveLimiter(rpm=10_000, tpm=10_000_000, max_concurrency=4)
+    limiter.limit = 2
+    peak = 0
+
+    async def call(throttle: bool = False):
+        nonlocal peak
+        async with limiter.slot(10) as slot:
+            peak = max(peak, limiter.in_flight)
+            await asyncio.sleep(0.01)
+            if throttle:
+                slot.rate_limited(retry_after=0.2)
+            else:
+                slot.succeeded()
+
+    async def scenario():
+        await asyncio.gather(*(call() for _ in range(6)))
+        grown = limiter.limit
+        await call(throttle=True)
+        start = time.monotonic()
+        await call()                            # waits out the server-provided delay
+        return grown, time.monotonic() - start
+
+    grown, waited = asyncio.run(scenario())
+    assert peak == 2
+    assert grown > 2
+    assert limiter.throttles == 1 and limiter.limit < grown
+    assert waited >= 0.2
+    assert limiter.stats()["in_flight"] == 0 and limiter.stats()["queued"] == 0
+
+
+def test_token_bucket_and_retry_delay_parsing():
+    bucket = TokenBucket(per_minute=60)
+    assert bucket.wait_time(60) == 0
+    bucket.take(60)
+    assert 0.9 < bucket.wait_time(1) <= 1.0
+
+    err = Exception("429 RESOURCE_EXHAUSTED {'details': [{'retryDelay': '37s'}]}")
+    assert retry_delay_from(err) == 37.0
+    assert retry_delay_from(Exception("500 INTERNAL")) is None
+
+
+def test_aimd_controller_backs_off_with_its_own_constants():
+    from services.rate_limiter import AIMDController
+
+    aimd = AIMDController("Test", 8, 1, initial_limit=8, latency_target_s=1.0, backoff_base=0.5, backoff_max=1.5, decrease_gap=0.0)
+    delays = []
+    for _ in range(4):
+        aimd._on_throttle(None)
+        delays.append(round(aimd.cooldown_until - time.monotonic(), 1))
+    assert delays == [0.5, 1.0, 1.5, 1.5]
+    assert aimd.limit == 1 and aimd.throttles == 4
+    aimd._on_success(0.1)
+    assert aimd.limit == 2 and aimd.completed == 1
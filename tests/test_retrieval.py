@@ -0,0 +1,26 @@
+from models.schemas import ParsedSection
+from services.retrieval import PassageIndex
+
+sections = [
+    ParsedSection(title="Intro", body="We study protein folding with graph networks.", page_start=1, page_end=1),
+    ParsedSection(title="Methods", body="Our transformer encoder uses sparse attention over residues. " * 3, page_start=2, page_end=2),
+    ParsedSection(title="Results", body="Accuracy improves on the CASP benchmark by four points.", page_start=3, page_end=3),
+]
+
+
+def test_bm25_selects_relevant_passages_within_budget():
+    index = PassageIndex.build(sections, passage_words=20)
+    assert len(index) == 4                       # Methods is split into two passages
+
+    chosen = index.select("sparse attention transformer", token_budget=1000)
+    assert {int(index.section[p]) for p in chosen} == {1}
+    assert index.select("CASP benchmark accuracy", token_budget=1000) == [3]
+    assert index.select("sparse attention transformer", token_budget=5) == []
+    assert index.select("unrelated words", token_budget=1000) == []
+
+
+def test_passage_index_round_trips_through_bytes():
+    index  = PassageIndex.build(sections, passage_words=20)
+    loaded = PassageIndex.from_bytes(index.to_bytes())
+    assert loaded.passages == index.passages
+    assert (loaded.scores("protein folding") == index.scores("protein folding")).all()
@@ -1,7 +1,7 @@
 import pytest
 
 from services.script_generator import generate_script
-from models.schemas import ParsedDocument, ParsedSection
+from models.schemas import LLMUsage, ParsedDocument, ParsedSection
 from config import get_settings
 
 # Create a minimal dummy doc for testing
@@ -19,7 +19,8 @@ dummy_doc = ParsedDocument(
 def test_generate_script_fails_without_any_key(monkeypatch):
     # ensure both keys are blank so the early config check fails
     settings = get_settings()
-    monkeypatch.setattr(settings, "google_api_key", "")
+    for key in ("google_api_key", "openai_api_key", "anthropic_api_key", "openrouter_api_key"):
+        monkeypatch.setattr(settings, key, "")
 
     with pytest.raises(Exception) as exc:
         # run synchronously
@@ -42,3 +43,215 @@ def test_generate_script_accepts_google_key(monkeypatch):
     result = asyncio.run(generate_script(dummy_doc))
     # should at least produce a PodcastScript object with dialogue (fallback empty)
     assert hasattr(result, "dialogue")
+
+
+def test_ask_serves_repeated_prompts_from_the_llm_cache(tmp_path, monkeypatch):
+    import asyncio
+    import threading
+    from types import SimpleNamespace
+
+    import services.script_generator as sg
+    from services.llm_cache import LLMCache
+
+    cache = LLMCache(tmp_path, max_bytes=1024 * 1024, ttl_seconds=3600)
+    monkeypatch.setattr(sg, "get_llm_cache", lambda: cache)
+    monkeypatch.setattr(get_settings(), "llm_cache_enabled", True)
+    monkeypatch.setattr(get_settings(), "google_api_key", "sk-test")
+
+    calls = []
+
+    async def generate_content(model, contents, config):
+        calls.append(contents)
+        return SimpleNamespace(text=f'{{"n": {len(calls)}}}')
+
+    client = SimpleNamespace(aio=SimpleNamespace(models=SimpleNamespace(generate_content=generate_content)))
+    monkeypatch.setattr(sg, "_get_client", lambda: client)
+
+    assert asyncio.run(sg._ask("same prompt")) == '{"n": 1}'
+    assert asyncio.run(sg._ask("same prompt")) == '{"n": 1}'
+    assert asyncio.run(sg._ask("same prompt", use_cache=False)) == '{"n": 2}'
+    assert len(calls) == 2
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 1
+
+    threads = []
+    for name in ("get", "put"):
+        real = getattr(cache, name)
+        monkeypatch.setattr(cache, name, lambda *a, real=real: threads.append(threading.current_thread()) or real(*a))
+    asyncio.run(sg._ask("other prompt"))
+    assert len(threads) == 2 and threading.main_thread() not in threads     # off the event loop
+
+    cache.ttl_seconds = -1       # everything is now expired
+    assert cache.get(sg.response_key(sg.MODEL, "same prompt", sg.GENERATION_CONFIG)) is None
+
+
+def test_incremental_array_parser_emits_objects_as_they_close():
+    from services.json_stream import IncrementalArrayParser
+
+    text   = '```json\n[ {"host": "A", "text": "Hi {there} \\"friend\\""}, {"host": "B", "text": "[ok]"}, {bad}, {"host": "A", "text": "end"} ]\n```'
+    parser = IncrementalArrayParser()
+    seen   = []
+    for i in range(0, len(text), 7):
+        seen.append(parser.feed(text[i:i + 7]))
+
+    items = [item for batch in seen for item in batch]
+    assert [i["text"] for i in items] == ['Hi {there} "friend"', "[ok]", "end"]
+    assert parser.done and parser.skipped == 1
+    assert len([b for b in seen if b]) == 3          # each object was emitted on its own
+
+
+def test_streaming_dialogue_yields_lines_before_the_response_finishes(monkeypatch):
+    import asyncio
+    from types import SimpleNamespace
+
+    import services.script_generator as sg
+
+    monkeypatch.setattr(get_settings(), "llm_cache_enabled", False)
+    monkeypatch.setattr(get_settings(), "google_api_key", "sk-test")
+    body   = '[{"host": "a", "text": "one"}, {"host": "b", "text": "two"}]'
+    events = []
+
+    async def chunks():
+        for i in range(0, len(body), 5):
+            await asyncio.sleep(0)                   # network wait between chunks
+            events.append("chunk")
+            yield SimpleNamespace(text=body[i:i + 5], usage_metadata=None)
+
+    async def generate_content_stream(model, contents, config):
+        return chunks()
+
+    client = SimpleNamespace(aio=SimpleNamespace(models=SimpleNamespace(generate_content_stream=generate_content_stream)))
+    monkeypatch.setattr(sg, "_get_client", lambda: client)
+
+    chapters = [{"id": 1, "title": "One"}, {"id": 2, "title": "Two"}]
+
+    async def run():
+        lines = []
+        async for line in sg.stream_dialogue(dummy_doc, chapters):
+            events.append("line")
+            lines.append(line)
+        return lines
+
+    lines = asyncio.run(run())
+    assert sorted((l.chapter_id, l.host, l.text) for l in lines) == [
+        (1, "A", "one"), (1, "B", "two"), (2, "A", "one"), (2, "B", "two"),
+    ]
+    # the first line is seen while later chunks are still to come
+    assert events.index("line") < len(events) - 1 - events[::-1].index("chunk")
+
+
+def test_stream_failing_before_its_first_chunk_falls_over_to_the_next_provider(monkeypatch):
+    import asyncio
+    from types import SimpleNamespace
+
+    import services.script_generator as sg
+    from services.llm_providers import Completion, GeminiProvider, LLMRouter, OpenAICompatibleProvider
+
+    settings = get_settings()
+    monkeypatch.setattr(settings, "llm_cache_enabled", False)
+    monkeypatch.setattr(settings, "google_api_key", "sk-test")
+    monkeypatch.setattr(settings, "openai_api_key", "sk-test")
+
+    async def generate_content_stream(model, contents, config):
+        raise RuntimeError("500 INTERNAL")
+
+    client = SimpleNamespace(aio=SimpleNamespace(models=SimpleNamespace(generate_content_stream=generate_content_stream)))
+    gemini = GeminiProvider(lambda: client, sg.MODEL, window=10)
+    openai = OpenAICompatibleProvider("openai", "https://api.openai.com/v1", "openai_api_key", "openai_model", 10)
+
+    async def openai_generate(prompt, config, context=None):
+        return Completion('[{"host": "A", "text": "hi"}]', "openai")
+
+    monkeypatch.setattr(openai, "generate", openai_generate)
+    router = LLMRouter([gemini, openai], hedging=False)
+    monkeypatch.setattr(sg, "get_llm_router", lambda: router)
+
+    async def run():
+        return [chunk async for chunk in sg._ask_stream("prompt", stage="dialogue")]
+
+    assert asyncio.run(run()) == ['[{"host": "A", "text": "hi"}]']
+    assert not gemini.healthy()
+
+
+def test_local_backend_generates_a_complete_script_offline(monkeypatch):
+    import asyncio
+
+    import services.script_generator as sg
+    from services.llm_providers import build_router
+
+    settings = get_settings()
+    for key in ("google_api_key", "openai_api_key", "anthropic_api_key", "openrouter_api_key"):
+        monkeypatch.setattr(settings, key, "")
+    monkeypatch.setattr(settings, "llm_providers", "local")
+    monkeypatch.setattr(settings, "llm_cache_enabled", False)
+    monkeypatch.setattr(settings, "local_llm_latency_s", 0.0)
+    monkeypatch.setattr(settings, "local_llm_jitter_s", 0.0)
+    router = build_router(sg._get_client, sg.MODEL)
+    monkeypatch.setattr(sg, "get_llm_router", lambda: router)
+
+    usage  = LLMUsage()
+    script = asyncio.run(generate_script(dummy_doc, usage=usage))
+
+    assert [c.id for c in script.chapters] == [1, 2, 3]
+    assert {l.chapter_id for l in script.dialogue} == {1, 2, 3}
+    assert len(script.dialogue) >= 36 and {l.host for l in script.dialogue} == {"A", "B"}
+    assert script.quiz_questions == [] and script.study_guide == ""    # generated separately
+    assert router.provider("local").calls == 4
+    assert sorted(c.stage for c in usage.calls) == ["chapters", "dialogue", "dialogue", "dialogue"]
+    assert all(c.provider == "local" and not c.estimated for c in usage.calls)
+    assert usage.prompt_tokens == sum(c.prompt_tokens for c in usage.calls) > 0
+
+    guide, quiz = asyncio.run(sg.generate_study_materials(dummy_doc, usage=usage))
+    assert len(quiz) == 6 and guide.startswith("# Research Summary")
+    assert usage.calls[-1].stage == "study"
+
+
+def test_fit_trims_context_to_the_token_budget_at_a_word_boundary():
+    from services.script_generator import _fit
+
+    text = "alpha beta gamma delta " * 50
+    assert _fit(text, 1000) == text
+    fitted = _fit(text, 10)
+    assert len(fitted) <= 43 and fitted.endswith("...") and fitted[:-3].split()[-1] in text.split()
+
+
+@pytest.mark.parametrize("streaming", [False, True])
+def test_invalid_chapter_dialogue_is_repaired_without_redoing_other_calls(monkeypatch, streaming):
+    import asyncio
+    import json
+
+    import services.local_llm as local_llm
+    import services.script_generator as sg
+    from services.llm_providers import build_router
+
+    settings = get_settings()
+    for key in ("google_api_key", "openai_api_key", "anthropic_api_key", "openrouter_api_key"):
+        monkeypatch.setattr(settings, key, "")
+    monkeypatch.setattr(settings, "llm_providers", "local")
+    monkeypatch.setattr(settings, "llm_cache_enabled", False)
+    monkeypatch.setattr(settings, "script_streaming", streaming)
+    monkeypatch.setattr(settings, "local_llm_latency_s", 0.0)
+    monkeypatch.setattr(settings, "local_llm_jitter_s", 0.0)
+    monkeypatch.setattr(sg, "_VALIDATION", sg.defaultdict(sg.Counter))
+    router = build_router(sg._get_client, sg.MODEL)
+    monkeypatch.setattr(sg, "get_llm_router", lambda: router)
+
+    answer = local_llm.local_answer
+
+    def middle_chapter_invalid(prompt, seed=0):
+        # the middle chapter answers with a host that does not exist until asked for a repair
+        if "Continue the conversation smoothly" in prompt and "End by teasing" in prompt and "Problems:" not in prompt:
+            return json.dumps([{"host": "C", "text": "Who am I?"}])
+        return answer(prompt, seed)
+    monkeypatch.setattr(local_llm, "local_answer", middle_chapter_invalid)
+
+    usage  = LLMUsage()
+    script = asyncio.run(generate_script(dummy_doc, usage=usage))
+
+    assert {l.chapter_id for l in script.dialogue} == {1, 2, 3}
+    assert {l.host for l in script.dialogue} == {"A", "B"}
+    stages = sorted(c.stage for c in usage.calls)
+    assert stages == ["chapters", "dialogue", "dialogue", "dialogue", "dialogue:repair"]
+    assert usage.invalid_responses == {"dialogue": 1}
+    assert sg.validation_stats()["dialogue"] == {
+        "responses": 4, "invalid": 1, "repaired": 1, "failed": 0, "failure_rate": 0.25,
+    }
@@ -0,0 +1,52 @@
+import asyncio
+import threading
+from types import SimpleNamespace
+
+from pydub import AudioSegment
+
+import services.tts_service as tts
+from config import get_settings
+from models.schemas import DialogueLine, TTSUsage
+from services.tts_cache import TTSCache, segment_key
+
+
+def test_segment_key_ignores_whitespace_but_not_voice_or_settings():
+    key = segment_key("voice", "model", {"stability": 0.5}, "Thanks for listening!")
+    assert segment_key("voice", "model", {"stability": 0.5}, "  Thanks  for\nlistening! ") == key
+    assert segment_key("other", "model", {"stability": 0.5}, "Thanks for listening!") != key
+    assert segment_key("voice", "model", {"stability": 0.6}, "Thanks for listening!") != key
+    assert segment_key("voice", "model", {"stability": 0.5}, "thanks for listening!") != key
+
+
+def test_repeated_lines_are_synthesised_once_and_counted_per_job(tmp_path, monkeypatch):
+    cache = TTSCache(tmp_path, max_bytes=1024 * 1024)
+    monkeypatch.setattr(tts, "get_tts_cache", lambda: cache)
+    monkeypatch.setattr(get_settings(), "elevenlabs_api_key", "xi-test")
+    monkeypatch.setattr(get_settings(), "tts_cache_enabled", True)
+    monkeypatch.setattr(tts, "_decode_mp3", lambda data: AudioSegment.silent(duration=len(data)))
+
+    posts = []
+
+    class FakeHTTP:
+        async def post(self, url, headers=None, json=None):
+            posts.append(json["text"])
+            await asyncio.sleep(0)
+            return SimpleNamespace(status_code=200, content=f"mp3:{json['text']}".encode(), text="")
+
+    monkeypatch.setattr(tts, "get_elevenlabs_http", lambda: FakeHTTP())
+    threads = []
+    for name in ("get", "put"):
+        real = getattr(cache, name)
+        monkeypatch.setattr(cache, name, lambda *a, real=real: threads.append(threading.current_thread()) or real(*a))
+    lines = [DialogueLine(host=h, text=t, chapter_id=1) for h, t in [("A", "Hi"), ("B", "Hi"), ("A", "Hi"), ("A", "Bye")]]
+
+    first, second = TTSUsage(), TTSUsage()
+    asyncio.run(tts.synthesise_lines(lines, usage=first))
+    segments = asyncio.run(tts.synthesise_lines(lines, usage=second))
+
+    assert len(posts) == 4                                   # all in flight before any was cached
+    assert (first.cache_hits, first.cache_misses, first.hit_rate) == (0, 4, 0.0)
+    assert (second.cache_hits, second.cache_misses, second.hit_rate) == (4, 0, 1.0)
+    assert [s.duration_ms for s in segments] == [len(b"mp3:Hi")] * 3 + [len(b"mp3:Bye")]
+    assert len(list(tmp_path.glob("*.mp3"))) == 3            # one entry per (voice, text)
+    assert threads and threading.main_thread() not in threads   # disk IO stays off the event loop
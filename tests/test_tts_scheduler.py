@@ -0,0 +1,60 @@
+import asyncio
+import time
+
+from services.tts_scheduler import FairScheduler
+
+
+def test_jobs_take_turns_and_each_job_gets_its_earliest_lines_first():
+    scheduler = FairScheduler(max_concurrency=1)
+    granted   = []
+    depth     = []
+
+    async def line(job, order):
+        async with scheduler.slot(job, (0, order)) as slot:
+            granted.append((job, order))
+            depth.append(scheduler.stats()["queued"])
+            await asyncio.sleep(0.001)
+            slot.succeeded()
+
+    async def scenario():
+        await scheduler.acquire("other")            # everything below queues behind this slot
+        tasks = [asyncio.create_task(line("long", i)) for i in reversed(range(6))]   # latest line first
+        tasks += [asyncio.create_task(line("short", i)) for i in range(2)]
+        await asyncio.sleep(0.01)
+        scheduler._release("other")
+        await asyncio.gather(*tasks)
+
+    asyncio.run(scenario())
+    assert granted[:5] == [("long", 0), ("short", 0), ("long", 1), ("short", 1), ("long", 2)]
+    assert [o for j, o in granted if j == "long"] == list(range(6))
+    assert depth[0] == 7 and depth[-1] == 0
+    stats = scheduler.stats()
+    assert stats["in_flight"] == 0 and stats["queued"] == 0 and stats["completed"] == 8 and stats["jobs"] == 0
+
+
+def test_a_429_halves_the_shared_limit_and_pauses_every_job():
+    scheduler = FairScheduler(max_concurrency=8)
+    scheduler.limit = 4
+    peak = 0
+
+    async def call(job, throttle=False):
+        nonlocal peak
+        async with scheduler.slot(job, (0, 0)) as slot:
+            peak = max(peak, scheduler.in_flight)
+            await asyncio.sleep(0.01)
+            if throttle:
+                slot.rate_limited(retry_after=0.2)
+            else:
+                slot.succeeded()
+
+    async def scenario():
+        await asyncio.gather(*(call(f"job{i % 3}") for i in range(12)))
+        await call("job0", throttle=True)
+        start = time.monotonic()
+        await call("job1")                      # a different job still waits out the cooldown
+        return time.monotonic() - start
+
+    waited = asyncio.run(scenario())
+    assert peak == 4
+    assert scheduler.throttles == 1 and scheduler.limit < 4
+    assert waited >= 0.2